@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from xgboost import XGBClassifier
+
+TRAINING_DIR = Path(__file__).resolve().parents[1] / "training"
+sys.path.append(str(TRAINING_DIR))
+
+from model_io import load_model, save_model  # noqa: E402
+
+"""
+This script compares the cold-start time of the joblib and native model formats.
+"""
+
+# Run in a fresh interpreter, so nothing is cached by a previous load
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.append({training_dir!r})
+from model_io import load_model
+imported = time.perf_counter()
+model = load_model({path!r})
+loaded = time.perf_counter()
+print(json.dumps({{"import_s": imported - start, "load_s": loaded - imported}}))
+"""
+
+
+def train_model(n_estimators: int, max_depth: int, seed: int = 7):
+    """
+    Train a classifier on synthetic data with the shape of the processed splits.
+
+    Args:
+        n_estimators (int): Number of boosting rounds.
+        max_depth (int): Maximum depth of the trees.
+        seed (int): Seed of the synthetic data.
+
+    Returns:
+        XGBClassifier: Trained classifier.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.random((5000, 10))
+    y = (X[:, 0] + rng.normal(0, 0.3, len(X)) > 0.5).astype(int)
+    model = XGBClassifier(n_estimators=n_estimators, max_depth=max_depth)
+    return model.fit(X, y)
+
+
+def cold_start(path: str, repeats: int):
+    """
+    Time loading a model in fresh interpreters.
+
+    Args:
+        path (str): Path of the saved model.
+        repeats (int): Number of interpreters to start.
+
+    Returns:
+        dict: Median import, load and total process time in seconds.
+    """
+    code = COLD_START.format(training_dir=str(TRAINING_DIR), path=path)
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run["total_s"] = time.perf_counter() - start
+        runs.append(run)
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def main():
+    """
+    Save one model in every format and report their size and cold-start time.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare the cold-start time of the model formats."
+    )
+    parser.add_argument("--model", help="joblib model to convert, trains one if unset")
+    parser.add_argument("--n-estimators", type=int, default=500)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.model:
+        model = load_model(args.model)
+    else:
+        model = train_model(args.n_estimators, args.max_depth)
+
+    with tempfile.TemporaryDirectory() as directory:
+        header = ("size_kb", "load_ms", "import_ms", "total_ms")
+        print(f"{'format':<8}" + "".join(f"{name:>11}" for name in header))
+        for model_format in ("joblib", "ubj", "json"):
+            path = os.path.join(directory, f"model_{model_format}")
+            save_model(model, path, model_format)
+            timing = cold_start(path, args.repeats)
+            print(
+                f"{model_format:<8}"
+                f"{os.path.getsize(path) / 1024:>11.0f}"
+                f"{timing['load_s'] * 1000:>11.1f}"
+                f"{timing['import_s'] * 1000:>11.1f}"
+                f"{timing['total_s'] * 1000:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from synthetic import get_config, write_data
+
+TRAINING_DIR = Path(__file__).resolve().parents[1] / "training"
+sys.path.append(str(TRAINING_DIR))
+
+from evaluate_model import predict  # noqa: E402
+from process import (  # noqa: E402
+    get_data,
+    get_deduplicator,
+    get_encoder,
+    get_features,
+    process_categorical,
+    process_clean,
+    process_dtypes,
+    process_duplicate,
+    process_null,
+    process_outliers,
+)
+from train_model import get_nthread, get_objective  # noqa: E402
+
+"""
+This script times and memory-profiles every pipeline stage on synthetic data.
+"""
+
+# Differences below these are noise whatever the ratio to the baseline
+MIN_TIME_DIFF_S = 0.005
+MIN_MEMORY_DIFF_MB = 1.0
+
+
+def measure(function, repeats: int = 1):
+    """
+    Time a step and measure its peak memory.
+
+    The memory is measured in a first run under `tracemalloc`, which sees the
+    allocations of Python, NumPy and pandas but not those of XGBoost. The
+    time is the median of `repeats` untraced runs.
+
+    Args:
+        function (Callable): Step to run, without arguments.
+        repeats (int): Number of timed runs.
+
+    Returns:
+        Tuple[object, dict]: Result of the step and its measures.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = function()
+            times.append(time.perf_counter() - start)
+    return result, {"time_s": statistics.median(times), "peak_mb": peak / 2**20}
+
+
+def get_trial_params(config):
+    """
+    Get fixed hyperparameters of one trial, the middle of each search range.
+
+    Args:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        dict: Hyperparameters of the trial.
+    """
+    names = (
+        "max_depth",
+        "gamma",
+        "reg_alpha",
+        "reg_lambda",
+        "colsample_bytree",
+        "min_child_weight",
+    )
+    params = {
+        name: (config.model[name].low + config.model[name].high) / 2 for name in names
+    }
+    params["n_estimators"] = config.model.n_estimators
+    params["seed"] = config.model.seed
+    params["n_jobs"] = get_nthread(config.model.search)
+    return params
+
+
+def run_benchmark(n_rows: int, config, directory: str, repeats: int = 1):
+    """
+    Run every stage of the pipeline on synthetic data of a given size.
+
+    Each step runs on the output of the previous one, as in `process_data`:
+    dtypes, then the chained null, duplicate and outlier steps, whose result
+    feeds the encoding, one search trial and the predictions. The fused
+    `process_clean` runs on the same input as the chained steps.
+
+    Args:
+        n_rows (int): Number of raw records.
+        config (DictConfig): Configuration object.
+        directory (str): Directory of the synthetic raw file.
+        repeats (int): Number of timed runs of each step.
+
+    Returns:
+        list: Measures of each step.
+    """
+    process = config.process
+    path = os.path.join(directory, f"raw_{n_rows}.csv")
+    if not os.path.exists(path):
+        write_data(path, n_rows, process)
+
+    results = []
+
+    def step(name, function, rows_in):
+        result, measures = measure(function, repeats)
+        # A search trial returns its result record, not rows
+        rows_out = rows_in if isinstance(result, dict) else len(result)
+        results.append(
+            {"step": name, "rows": n_rows, "rows_in": rows_in, "rows_out": rows_out}
+            | measures
+        )
+        print(
+            f"{n_rows:>10} {name:<20}{measures['time_s']:>10.3f}"
+            f"{measures['peak_mb']:>12.1f}{rows_out:>12}"
+        )
+        return result
+
+    data = step("get_data", lambda: get_data(path, process.sep), n_rows)
+    data = step(
+        "process_dtypes",
+        lambda: process_dtypes(data, process.dtypes, process.range_rules),
+        len(data),
+    )
+    step(
+        "process_clean",
+        lambda: process_clean(data, process.features, process.range_rules),
+        len(data),
+    )
+    data = step("process_null", lambda: process_null(data), len(data))
+    data = step(
+        "process_duplicate",
+        lambda: process_duplicate(data, get_deduplicator(process.deduplication)),
+        len(data),
+    )
+    data = step(
+        "process_outliers",
+        lambda: process_outliers(data, process.range_rules),
+        len(data),
+    )
+
+    y, X = get_features(process.target, process.features, data)
+    X = step(
+        "process_categorical",
+        lambda: process_categorical(
+            X,
+            process.categorical_features,
+            encoder=get_encoder(X, process.categorical_features),
+        ),
+        len(X),
+    )
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=7
+    )
+    params = get_trial_params(config)
+    trial = step(
+        "get_objective",
+        lambda: get_objective(X_train, y_train, X_test, y_test, config, params),
+        len(X_train),
+    )
+    step("predict", lambda: predict(trial["model"], X_test), len(X_test))
+    return results
+
+
+def compare(results: list, baseline: list, tolerance: float):
+    """
+    Find the steps that are slower or use more memory than in the baseline.
+
+    Args:
+        results (list): Measures of each step.
+        baseline (list): Measures of each step in the baseline.
+        tolerance (float): Allowed relative increase, e.g. 0.2 for 20%.
+
+    Returns:
+        list: Description of each regression.
+    """
+    baseline = {(r["step"], r["rows"]): r for r in baseline}
+    limits = {"time_s": MIN_TIME_DIFF_S, "peak_mb": MIN_MEMORY_DIFF_MB}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["step"], result["rows"]))
+        if previous is None:
+            continue
+        for key, min_diff in limits.items():
+            diff = result[key] - previous[key]
+            if diff > min_diff and diff > tolerance * previous[key]:
+                regressions.append(
+                    f"{result['step']} ({result['rows']} rows) {key}: "
+                    f"{previous[key]:.3f} -> {result[key]:.3f}"
+                )
+    return regressions
+
+
+def get_environment():
+    """
+    Describe the machine and library versions the benchmark ran with.
+
+    Returns:
+        dict: Platform, Python and library versions and the run date.
+    """
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgb.__version__,
+    }
+
+
+def main():
+    """
+    Benchmark the pipeline at each size and compare the results to a baseline.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile every pipeline stage."
+    )
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmarks/results/pipeline.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--data-dir", help="keep the synthetic raw files here")
+    parser.add_argument("overrides", nargs="*", help="Hydra configuration overrides")
+    args = parser.parse_args()
+
+    config = get_config(args.overrides)
+    print(f"{'rows':>10} {'step':<20}{'time_s':>10}{'peak_mb':>12}{'rows_out':>12}")
+    with contextlib.ExitStack() as stack:
+        directory = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        results = [
+            result
+            for n_rows in args.rows
+            for result in run_benchmark(n_rows, config, directory, args.repeats)
+        ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(
+            {"environment": get_environment(), "results": results}, file, indent=2
+        )
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
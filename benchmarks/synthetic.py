@@ -0,0 +1,154 @@
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from hydra import compose, initialize_config_dir
+from omegaconf import DictConfig
+
+"""
+This script generates synthetic raw clinical data with the configured schema.
+"""
+
+CONFIG_DIR = str(Path(__file__).resolve().parents[1] / "config")
+
+# Share of the generated values that are missing or outside their valid range
+NULL_RATE = 0.02
+OUTLIER_RATE = 0.01
+
+
+def get_config(overrides: list = None):
+    """
+    Compose the pipeline configuration without running a Hydra application.
+
+    Args:
+        overrides (list): Hydra overrides, e.g. ["process.dtypes.enabled=false"].
+
+    Returns:
+        DictConfig: Configuration object.
+    """
+    with initialize_config_dir(config_dir=CONFIG_DIR, version_base=None):
+        return compose(config_name="main", overrides=overrides or [])
+
+
+def get_rules(process: DictConfig):
+    """
+    Get the valid range of each numeric feature.
+
+    Args:
+        process (DictConfig): Process configuration.
+
+    Returns:
+        dict: Minimum and maximum of each feature with a range rule.
+    """
+    rules = process.range_rules
+    if isinstance(rules, DictConfig):
+        rules = [rules]
+    return {rule.name: (rule.min, rule.max) for rule in rules}
+
+
+def generate_data(
+    n_rows: int, process: DictConfig, seed: int = 0, duplicate_rate: float = 0.05
+):
+    """
+    Generate raw clinical records.
+
+    Numeric features with a range rule are integers within their range, except
+    the first one (age) that keeps two decimals so that rows stay mostly
+    unique at scale. Categorical features take Yes or No, the target depends
+    on the features, and nulls, outliers and exact duplicate rows are added
+    at fixed rates so that every cleaning step has work to do.
+
+    Args:
+        n_rows (int): Number of records.
+        process (DictConfig): Process configuration giving the schema.
+        seed (int): Seed of the random generator.
+        duplicate_rate (float): Share of the rows that repeat an earlier row.
+
+    Returns:
+        pd.DataFrame: Raw records with the features and the target.
+    """
+    rng = np.random.default_rng(seed)
+    rules = get_rules(process)
+    data, margin = {}, np.full(n_rows, -1.0)
+    for i, feature in enumerate(process.features):
+        if feature in process.categorical_features:
+            positive = rng.random(n_rows) < 0.5
+            data[feature] = np.where(positive, "Yes", "No").astype(object)
+            margin += np.where(positive, 0.5, -0.5)
+            continue
+        low, high = rules.get(feature, (0, 10))
+        if i == 0:
+            values = np.round(rng.uniform(max(low, 20), min(high, 90), n_rows), 2)
+        else:
+            values = rng.integers(low, high + 1, n_rows).astype(np.float64)
+        margin += (values - low) / max(high - low, 1) - 0.5
+        outliers = rng.random(n_rows) < OUTLIER_RATE
+        values[outliers] = high + rng.integers(1, 10, outliers.sum())
+        data[feature] = values
+
+    data = pd.DataFrame(data)
+    for feature in process.features:
+        data.loc[rng.random(n_rows) < NULL_RATE, feature] = np.nan
+    data[process.target] = (rng.random(n_rows) < 1 / (1 + np.exp(-margin))).astype(int)
+
+    # Replace some rows with a copy of an earlier row
+    rows = np.arange(n_rows)
+    duplicates = np.flatnonzero(rng.random(n_rows) < duplicate_rate)
+    rows[duplicates] = (rng.random(len(duplicates)) * duplicates).astype(int)
+    return data.iloc[rows].reset_index(drop=True)
+
+
+def write_data(
+    path: str,
+    n_rows: int,
+    process: DictConfig,
+    seed: int = 0,
+    chunksize: int = 1000000,
+):
+    """
+    Write synthetic raw records to a CSV file, one chunk at a time.
+
+    Args:
+        path (str): Path of the CSV file.
+        n_rows (int): Number of records.
+        process (DictConfig): Process configuration giving the schema.
+        seed (int): Seed of the first chunk, the next chunks increment it.
+        chunksize (int): Number of records generated at once.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    for i, start in enumerate(range(0, n_rows, chunksize)):
+        chunk = generate_data(min(chunksize, n_rows - start), process, seed + i)
+        chunk.to_csv(
+            path,
+            sep=process.sep,
+            index=False,
+            mode="w" if i == 0 else "a",
+            header=i == 0,
+        )
+
+
+def main():
+    """
+    Write a synthetic raw data file.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Generate synthetic raw data.")
+    parser.add_argument("path", help="path of the CSV file to write")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("overrides", nargs="*", help="Hydra configuration overrides")
+    args = parser.parse_args()
+
+    write_data(args.path, args.rows, get_config(args.overrides).process, args.seed)
+    print(f"Wrote {args.rows} rows to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
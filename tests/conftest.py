@@ -0,0 +1,11 @@
+import sys
+from pathlib import Path
+
+"""
+Make the training and benchmark scripts importable the same way they import
+each other.
+"""
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "training"))
+sys.path.append(str(ROOT / "benchmarks"))
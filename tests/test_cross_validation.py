@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from omegaconf import OmegaConf
+from sklearn.metrics import accuracy_score
+from synthetic import get_config
+
+from training.cross_validation import CrossValidator
+from training.train_model import (
+    check_search,
+    get_model,
+    get_objective_cv,
+    get_space,
+)
+
+
+@pytest.fixture
+def data():
+    """
+    Build a small training set with unbalanced labels.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Features and labels.
+    """
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=[f"x{i}" for i in range(4)])
+    y = pd.DataFrame({"pcr": (X["x0"] + rng.normal(size=len(X)) > 0.8).astype(int)})
+    return X, y
+
+
+def test_cv_objective_averages_stratified_folds(data):
+    """
+    Check that the folds are stratified and the score is their mean accuracy.
+
+    Args:
+        data (tuple): Features and labels.
+    """
+    X, y = data
+    config = get_config(["model.n_estimators=10", "model.search.nthread=1"])
+    space = dict(
+        get_space(config),
+        max_depth=3,
+        gamma=1.0,
+        reg_alpha=1,
+        reg_lambda=0.5,
+        colsample_bytree=1,
+        min_child_weight=1,
+    )
+
+    with CrossValidator(X, y, n_splits=3, n_workers=2, seed=0) as validator:
+        result = get_objective_cv(validator, config, space)
+        folds = validator.folds
+
+    labels = y["pcr"].to_numpy()
+    validation = np.concatenate([val_index for _, val_index in folds])
+    assert sorted(validation) == list(range(len(X)))
+    for _, val_index in folds:
+        assert abs(labels[val_index].mean() - labels.mean()) < 0.02
+
+    # Refit each fold in this process for as many rounds as it kept
+    params = get_model(config, result["params"]).get_xgb_params()
+    accuracies = []
+    for (train_index, val_index), best in zip(folds, result["best_iteration"]):
+        dtrain = xgb.QuantileDMatrix(X.iloc[train_index], labels[train_index])
+        dval = xgb.QuantileDMatrix(X.iloc[val_index], ref=dtrain)
+        booster = xgb.train(params, dtrain, num_boost_round=best + 1)
+        probability = booster.predict(dval)
+        accuracies.append(
+            accuracy_score(labels[val_index], (probability > 0.5).astype(int))
+        )
+    assert result["fold_accuracies"] == pytest.approx(accuracies)
+    assert result["accuracy"] == pytest.approx(np.mean(result["fold_accuracies"]))
+
+
+def test_cv_objective_needs_the_serial_mode():
+    """
+    Check that the cv objective is rejected with the parallel and halving modes.
+    """
+    for mode in ("parallel", "halving"):
+        with pytest.raises(ValueError):
+            check_search(OmegaConf.create({"objective": "cv", "mode": mode}))
+    check_search(OmegaConf.create({"objective": "cv", "mode": "serial"}))
+    check_search(OmegaConf.create({"objective": "holdout", "mode": "parallel"}))
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from training.dedup import HashDeduplicator, load_hashes, save_hashes
+
+
+@pytest.fixture
+def data():
+    """
+    Build a frame with many duplicate rows.
+
+    Returns:
+        pd.DataFrame: Data with duplicate rows.
+    """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "age": rng.integers(20, 90, 5000),
+            "erihc": rng.choice(["No", "Yes"], 5000),
+            "grade": rng.integers(1, 4, 5000).astype(float),
+        }
+    )
+
+
+def test_filter_full_frame_keeps_first(data):
+    """
+    Check that filtering a whole frame matches `drop_duplicates(keep="first")`.
+
+    Args:
+        data (pd.DataFrame): Data with duplicate rows.
+    """
+    deduplicator = HashDeduplicator()
+
+    pd.testing.assert_frame_equal(
+        deduplicator.filter(data), data.drop_duplicates(keep="first")
+    )
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_filter_across_chunks(tmp_path, data, spill):
+    """
+    Check that filtering chunk by chunk, with or without spilling, keeps the first rows.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        data (pd.DataFrame): Data with duplicate rows.
+        spill (bool): Whether hashes are spilled to sorted runs on disk.
+    """
+    deduplicator = HashDeduplicator(
+        max_memory_hashes=50,
+        spill_dir=str(tmp_path) if spill else None,
+        max_runs=2,
+        merge_block=16,
+    )
+
+    chunks = [deduplicator.filter(data.iloc[i : i + 400]) for i in range(0, 5000, 400)]
+
+    pd.testing.assert_frame_equal(pd.concat(chunks), data.drop_duplicates(keep="first"))
+    deduplicator.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_integer_and_float_chunks_hash_alike():
+    """
+    Check that a value read as int in one chunk and float in another is a duplicate.
+    """
+    deduplicator = HashDeduplicator()
+
+    deduplicator.filter(pd.DataFrame({"age": [45], "erihc": ["No"]}))
+    second = deduplicator.filter(pd.DataFrame({"age": [45.0], "erihc": ["No"]}))
+
+    assert second.empty
+
+
+def test_saved_hashes_drop_rows_of_later_runs(tmp_path, data):
+    """
+    Check that runs deduplicating against the saved hashes keep the first rows.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        data (pd.DataFrame): Data with duplicate rows.
+    """
+    chunks = []
+    for start in range(0, 5000, 500):
+        deduplicator = HashDeduplicator(seen=load_hashes(str(tmp_path)))
+        chunks.append(deduplicator.filter(data.iloc[start : start + 500]))
+        save_hashes(deduplicator.get_hashes(), str(tmp_path))
+
+    pd.testing.assert_frame_equal(pd.concat(chunks), data.drop_duplicates(keep="first"))
+    runs = load_hashes(str(tmp_path))
+    assert sum(map(len, runs)) == len(data.drop_duplicates())
+    assert len(runs) <= np.log2(len(data.drop_duplicates())) + 1
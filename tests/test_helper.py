@@ -0,0 +1,120 @@
+import mlflow
+import pytest
+from mlflow.tracking import MlflowClient
+
+from training.helper import BufferedLogger
+
+
+@pytest.fixture
+def tracking_uri(tmp_path, monkeypatch):
+    """
+    Point MLflow to a local file store.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        monkeypatch: Fixture used to allow the file store.
+
+    Returns:
+        str: Tracking URI of the store.
+    """
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    uri = (tmp_path / "mlruns").as_uri()
+    mlflow.set_tracking_uri(uri)
+    yield uri
+    mlflow.set_tracking_uri(None)
+
+
+def test_buffered_logger_flushes_on_exit(tracking_uri):
+    """
+    Check that buffered params and metrics are written when the context exits.
+
+    Args:
+        tracking_uri (str): Tracking URI of the store.
+    """
+    with mlflow.start_run() as run:
+        with BufferedLogger(flush_interval=60, dagshub=False) as logger:
+            for i in range(150):
+                logger.log_params({f"param_{i}": i})
+            for step in range(5):
+                logger.log_metrics({"loss": -step / 10, "fit_time": 0.1}, step=step)
+            assert not MlflowClient().get_run(run.info.run_id).data.params
+
+    client = MlflowClient()
+    data = client.get_run(run.info.run_id).data
+    assert len(data.params) == 150
+    assert data.params["param_7"] == "7"
+    history = client.get_metric_history(run.info.run_id, "loss")
+    assert [metric.step for metric in history] == list(range(5))
+    assert data.metrics["loss"] == -0.4
+
+
+def test_buffered_logger_flushes_on_exception(tracking_uri):
+    """
+    Check that the buffers are flushed when the logged code raises.
+
+    Args:
+        tracking_uri (str): Tracking URI of the store.
+    """
+    with pytest.raises(RuntimeError):
+        with mlflow.start_run() as run:
+            with BufferedLogger(flush_interval=60, dagshub=False) as logger:
+                logger.log_metrics({"accuracy": 0.9})
+                raise RuntimeError("Trial failed")
+
+    assert MlflowClient().get_run(run.info.run_id).data.metrics == {"accuracy": 0.9}
+
+
+def test_buffered_logger_needs_an_active_run(tracking_uri):
+    """
+    Check that logging outside a run raises instead of starting an orphan run.
+
+    Args:
+        tracking_uri (str): Tracking URI of the store.
+    """
+    with BufferedLogger(flush_interval=60, dagshub=False) as logger:
+        with pytest.raises(RuntimeError):
+            logger.log_metrics({"accuracy": 0.9})
+
+    assert mlflow.active_run() is None
+
+
+def test_buffered_logger_keeps_entries_of_a_failed_flush(tracking_uri, monkeypatch):
+    """
+    Check that a failed batch keeps its entries for the next flush and that a
+    failing close does not hide the exception of the logged code.
+
+    Args:
+        tracking_uri (str): Tracking URI of the store.
+        monkeypatch: Fixture used to make the batches fail.
+    """
+    with mlflow.start_run() as run:
+        logger = BufferedLogger(flush_interval=60, dagshub=False)
+        log_batch = logger.client.log_batch
+        failures = iter([ConnectionError("Connection reset")])
+
+        def flaky_log_batch(*args, **kwargs):
+            """Fail the first batch, then log."""
+            for error in failures:
+                raise error
+            log_batch(*args, **kwargs)
+
+        monkeypatch.setattr(logger.client, "log_batch", flaky_log_batch)
+        logger.log_params({"max_depth": 3})
+        logger.log_metrics({"accuracy": 0.9})
+        with pytest.raises(ConnectionError):
+            logger.flush()
+        logger.close()
+
+        def failing_log_batch(*args, **kwargs):
+            """Fail every batch."""
+            raise ConnectionError("Connection refused")
+
+        with pytest.raises(RuntimeError):
+            with BufferedLogger(flush_interval=60, dagshub=False) as failing:
+                monkeypatch.setattr(failing.client, "log_batch", failing_log_batch)
+                failing.log_metrics({"loss": 0.1})
+                raise RuntimeError("Trial failed")
+
+    data = MlflowClient().get_run(run.info.run_id).data
+    assert data.params == {"max_depth": "3"}
+    assert data.metrics == {"accuracy": 0.9}
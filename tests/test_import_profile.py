@@ -0,0 +1,29 @@
+import sys
+
+from training.import_profile import ImportProfiler
+
+
+def test_import_profiler_records_nested_imports(tmp_path, monkeypatch):
+    """
+    Check that a module and the modules it imports are timed.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        monkeypatch: Fixture used to extend the module search path.
+    """
+    (tmp_path / "profiled_outer.py").write_text("import profiled_inner\n")
+    (tmp_path / "profiled_inner.py").write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    with ImportProfiler() as profiler:
+        __import__("profiled_outer")
+    sys.modules.pop("profiled_outer")
+    sys.modules.pop("profiled_inner")
+
+    records = {record["module"]: record for record in profiler.records}
+    assert records["profiled_outer"]["depth"] == 0
+    assert records["profiled_inner"]["depth"] == 1
+    assert records["profiled_inner"]["self_s"] >= 0.05
+    assert records["profiled_outer"]["self_s"] < 0.05
+    assert records["profiled_outer"]["cumulative_s"] >= 0.05
+    assert "profiled_outer" in profiler.report()
@@ -0,0 +1,74 @@
+import json
+
+from synthetic import generate_data, get_config
+
+from training.model_io import get_train_state_path
+from training.process import load_split_state, process_data
+from training.train_model import continue_training, load_data, train
+
+
+def test_continue_training_only_on_appended_splits(tmp_path):
+    """
+    Check that appended rows continue the saved model and that rebuilt splits
+    with new columns run a new search.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    config = get_config(
+        [
+            f"raw.path={tmp_path / 'raw.csv'}",
+            f"processed.dir={tmp_path}",
+            f"model.dir={tmp_path}",
+            f"process.incremental.dir={tmp_path / 'incremental'}",
+            "process.incremental.enabled=true",
+            "model.incremental.enabled=true",
+            "model.incremental.max_degradation=1",
+            "model.trials.enabled=false",
+            "model.n_estimators=10",
+            "model.search.max_evals=2",
+            "model.search.nthread=1",
+            "pipeline.cache.enabled=false",
+        ]
+    )
+    process = config.process
+    generate_data(1000, process, seed=1).to_csv(
+        config.raw.path, sep=process.sep, index=False
+    )
+
+    def append(data):
+        """Append raw rows and process them."""
+        data.to_csv(
+            config.raw.path, sep=process.sep, index=False, header=False, mode="a"
+        )
+        process_data(config)
+
+    def get_train_state():
+        """Load the training state saved with the model."""
+        with open(get_train_state_path(config.model.path)) as file:
+            return json.load(file)
+
+    process_data(config)
+    train(config)
+    trained = get_train_state()
+    assert trained["splits"] == load_split_state(config.process.incremental.dir)
+
+    append(generate_data(300, process, seed=2))
+    X_train, X_test, y_train, y_test = load_data(config.processed)
+    assert len(X_train) > trained["train_rows"]
+    assert continue_training(X_train, y_train, X_test, y_test, config)
+    assert get_train_state()["train_rows"] == len(X_train)
+    assert get_train_state()["splits"] == trained["splits"]
+
+    # A new category rebuilds the splits with one more column
+    data = generate_data(300, process, seed=3)
+    data["erihc"] = data["erihc"].mask(data.index % 10 == 0, "Maybe")
+    append(data)
+    splits = load_split_state(config.process.incremental.dir)
+    assert splits["generation"] != trained["splits"]["generation"]
+    X_train, X_test, y_train, y_test = load_data(config.processed)
+    assert len(X_train.columns) == len(trained["splits"]["features"]) + 1
+    assert not continue_training(X_train, y_train, X_test, y_test, config)
+
+    train(config)
+    assert get_train_state()["splits"] == splits
@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from omegaconf import OmegaConf
+
+from training import instrument
+
+
+@instrument.step
+def drop_first(data: pd.DataFrame):
+    """
+    Drop the first row, a pipeline step to instrument.
+
+    Args:
+        data (pd.DataFrame): Input data.
+
+    Returns:
+        pd.DataFrame: Data without its first row.
+    """
+    return data.iloc[1:]
+
+
+def test_step_records_rows_and_time(tmp_path):
+    """
+    Check that an enabled step writes one record with its measures.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    path = tmp_path / "steps.jsonl"
+    instrument.configure(OmegaConf.create({"enabled": True, "path": str(path)}))
+    try:
+        result = drop_first(pd.DataFrame({"a": range(5)}))
+        instrument.record("trial", fit_s=0.5, best_iteration=3)
+    finally:
+        instrument.configure(OmegaConf.create({"enabled": False, "path": None}))
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(result) == 4
+    assert records[0]["step"] == "drop_first"
+    assert (records[0]["rows_in"], records[0]["rows_out"]) == (5, 4)
+    assert records[0]["wall_s"] >= 0 and records[0]["cpu_s"] >= 0
+    peak = records[0].get("peak_rss_mb", records[0].get("process_peak_rss_mb"))
+    assert peak > 0
+    assert records[1]["step"] == "trial" and records[1]["best_iteration"] == 3
+
+
+@instrument.step
+def allocate(n: int):
+    """
+    Fill an array, a pipeline step using memory.
+
+    Args:
+        n (int): Number of values.
+
+    Returns:
+        float: Sum of the values.
+    """
+    return float(np.ones(n).sum())
+
+
+@instrument.step
+def allocate_twice(n: int):
+    """
+    Run the allocating step, a pipeline step holding a nested one.
+
+    Args:
+        n (int): Number of values.
+
+    Returns:
+        float: Sum of the values.
+    """
+    return allocate(n)
+
+
+@pytest.mark.skipif(
+    not instrument.reset_peak_rss(), reason="The peak memory cannot be reset"
+)
+def test_step_records_its_own_peak_memory(tmp_path):
+    """
+    Check that the peak memory of a step excludes the earlier steps and
+    includes the nested ones.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    path = tmp_path / "steps.jsonl"
+    instrument.configure(OmegaConf.create({"enabled": True, "path": str(path)}))
+    try:
+        allocate_twice(25_000_000)
+        drop_first(pd.DataFrame({"a": range(5)}))
+    finally:
+        instrument.configure(OmegaConf.create({"enabled": False, "path": None}))
+
+    records = {
+        record["step"]: record
+        for record in map(json.loads, path.read_text().splitlines())
+    }
+    # 200 MB of float64
+    small = records["drop_first"]["peak_rss_mb"]
+    assert records["allocate"]["peak_rss_mb"] > small + 150
+    assert (
+        records["allocate_twice"]["peak_rss_mb"] >= records["allocate"]["peak_rss_mb"]
+    )
+
+
+def test_disabled_step_writes_nothing(tmp_path):
+    """
+    Check that a disabled step only calls the function.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    path = tmp_path / "steps.jsonl"
+    instrument.configure(OmegaConf.create({"enabled": False, "path": str(path)}))
+
+    assert len(drop_first(pd.DataFrame({"a": range(5)}))) == 4
+    instrument.record("trial", fit_s=0.5)
+    assert not path.exists()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score,
+    brier_score_loss,
+    confusion_matrix,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+
+from training.metrics import (
+    evaluate_metrics,
+    get_bootstrap_weights,
+    get_confusion,
+    get_metrics,
+)
+
+
+@pytest.fixture
+def predictions():
+    """
+    Build labels and rounded probabilities, so that some scores are tied.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: True labels, predicted
+            labels and probabilities.
+    """
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 400)
+    y_prob = np.round(np.clip(0.3 * y_true + rng.random(400) * 0.7, 0, 1), 2)
+    return y_true, (y_prob > 0.5).astype(int), y_prob
+
+
+def get_sklearn_metrics(y_true, y_pred, y_prob):
+    """
+    Compute the reference metrics with scikit-learn.
+
+    Args:
+        y_true (np.ndarray): True labels.
+        y_pred (np.ndarray): Predicted labels.
+        y_prob (np.ndarray): Predicted probabilities.
+
+    Returns:
+        dict: Metrics named as in the evaluation engine.
+    """
+    return {
+        "accuracy": accuracy_score(y_true, y_pred),
+        "f1": f1_score(y_true, y_pred),
+        "precision": precision_score(y_true, y_pred),
+        "sensitivity": recall_score(y_true, y_pred),
+        "specificity": recall_score(y_true, y_pred, pos_label=0),
+        "auc": roc_auc_score(y_true, y_prob),
+        "brier": brier_score_loss(y_true, y_prob),
+    }
+
+
+def test_metrics_match_sklearn(predictions):
+    """
+    Check the metrics of the full sample against scikit-learn.
+
+    Args:
+        predictions (tuple): True labels, predicted labels and probabilities.
+    """
+    y_true, y_pred, y_prob = predictions
+    weights = np.ones(len(y_true))
+
+    np.testing.assert_array_equal(
+        get_confusion(y_true, y_pred, weights), confusion_matrix(y_true, y_pred)
+    )
+    metrics = get_metrics(y_true, y_pred, y_prob, weights)
+    for name, expected in get_sklearn_metrics(y_true, y_pred, y_prob).items():
+        assert metrics[name] == pytest.approx(expected), name
+
+
+def test_bootstrap_replicates_match_sklearn(predictions):
+    """
+    Check batched replicates against scikit-learn on the materialized resamples.
+
+    Args:
+        predictions (tuple): True labels, predicted labels and probabilities.
+    """
+    y_true, y_pred, y_prob = predictions
+    weights = get_bootstrap_weights(len(y_true), 5, np.random.default_rng(1))
+
+    assert (weights.sum(axis=1) == len(y_true)).all()
+    metrics = get_metrics(y_true, y_pred, y_prob, weights)
+    for i, counts in enumerate(weights.astype(int)):
+        index = np.repeat(np.arange(len(y_true)), counts)
+        expected = get_sklearn_metrics(y_true[index], y_pred[index], y_prob[index])
+        for name, value in expected.items():
+            assert metrics[name][i] == pytest.approx(value), name
+
+
+def test_evaluate_metrics_intervals(predictions):
+    """
+    Check that the intervals contain the values and are reproducible.
+
+    Args:
+        predictions (tuple): True labels, predicted labels and probabilities.
+    """
+    results = evaluate_metrics(*predictions, n_replicates=2000, seed=3)
+
+    for name, result in results.items():
+        assert result["low"] <= result["value"] <= result["high"], name
+    assert results == evaluate_metrics(*predictions, n_replicates=2000, seed=3)
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from training.model_io import NativeModel, get_metadata_path, load_model, save_model
+
+
+@pytest.fixture
+def model_data():
+    """
+    Train a small classifier with early stopping.
+
+    Returns:
+        Tuple[XGBClassifier, np.ndarray]: Trained classifier and its features.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.random((400, 5))
+    y = (X[:, 0] + rng.normal(0, 0.3, 400) > 0.5).astype(int)
+    model = XGBClassifier(n_estimators=200, max_depth=3, early_stopping_rounds=5)
+    model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+    return model, X
+
+
+@pytest.mark.parametrize("model_format", ["ubj", "json"])
+def test_native_model_matches_classifier(tmp_path, model_data, model_format):
+    """
+    Check that a native model predicts like the classifier it was saved from.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        model_data (Tuple[XGBClassifier, np.ndarray]): Classifier and features.
+        model_format (str): Native format under test.
+    """
+    model, X = model_data
+    preprocessor_path = tmp_path / "preprocessor.json"
+    preprocessor_path.write_text("{}")
+    path = str(tmp_path / "xgboost")
+
+    save_model(model, path, model_format, str(preprocessor_path))
+    loaded = load_model(path)
+
+    assert isinstance(loaded, NativeModel)
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+    with open(get_metadata_path(path)) as file:
+        metadata = json.load(file)
+    assert metadata["best_iteration"] == model.best_iteration
+    assert metadata["preprocessor"]["path"] == "preprocessor.json"
+
+
+def test_joblib_model_round_trip(tmp_path, model_data):
+    """
+    Check that the joblib format keeps the scikit-learn classifier.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        model_data (Tuple[XGBClassifier, np.ndarray]): Classifier and features.
+    """
+    model, X = model_data
+    path = str(tmp_path / "xgboost")
+
+    save_model(model, path)
+    loaded = load_model(path)
+
+    assert isinstance(loaded, XGBClassifier)
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_configured_format_ignores_stale_metadata(tmp_path, model_data):
+    """
+    Check that a joblib model loads next to the metadata of an earlier native
+    model when its format is given.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        model_data (Tuple[XGBClassifier, np.ndarray]): Classifier and features.
+    """
+    model, X = model_data
+    preprocessor_path = tmp_path / "preprocessor.json"
+    preprocessor_path.write_text("{}")
+    path = str(tmp_path / "xgboost")
+    save_model(model, path, "ubj", str(preprocessor_path))
+    with open(get_metadata_path(path)) as file:
+        metadata = file.read()
+
+    save_model(model, path, "joblib")
+    with open(get_metadata_path(path), "w") as file:
+        file.write(metadata)
+    loaded = load_model(path, model_format="joblib")
+
+    assert isinstance(loaded, XGBClassifier)
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_native_model_checks_features(tmp_path, model_data):
+    """
+    Check that a native model rejects features other than the saved ones.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        model_data (Tuple[XGBClassifier, np.ndarray]): Classifier and features.
+    """
+    _, X = model_data
+    data = pd.DataFrame(X, columns=[f"x{i}" for i in range(X.shape[1])])
+    model = XGBClassifier(n_estimators=5, max_depth=2)
+    model.fit(data, (X[:, 0] > 0.5).astype(int))
+    path = str(tmp_path / "xgboost")
+
+    save_model(model, path, "ubj")
+    loaded = load_model(path)
+
+    np.testing.assert_allclose(loaded.predict_proba(data), model.predict_proba(data))
+    with pytest.raises(ValueError):
+        loaded.predict_proba(data[data.columns[::-1]])
+    with pytest.raises(ValueError):
+        loaded.predict_proba(X[:, :4])
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+from synthetic import generate_data, get_config
+from xgboost import XGBClassifier
+
+from training.preprocessor import Preprocessor
+from training.process import get_encoder, process_categorical, process_null
+from training.storage import to_csr
+
+FEATURES = ["age", "erihc", "prihc", "grade"]
+CATEGORICAL_FEATURES = ["erihc", "prihc"]
+FEATURES_RANGE = [{"name": "age", "min": 0, "max": 120}]
+
+
+@pytest.fixture
+def data():
+    """
+    Build raw features of a few patients.
+
+    Returns:
+        pd.DataFrame: Raw features.
+    """
+    return pd.DataFrame(
+        {
+            "age": [45, 50, 130, 38],
+            "erihc": ["No", "Yes", "Yes", "No"],
+            "prihc": ["Yes", "No", "Yes", "Yes"],
+            "grade": [1.0, 2.0, 3.0, 2.0],
+        }
+    )
+
+
+@pytest.fixture
+def preprocessor(data):
+    """
+    Fit the preprocessing on the raw features.
+
+    Args:
+        data (pd.DataFrame): Raw features.
+
+    Returns:
+        Preprocessor: Fitted preprocessing.
+    """
+    encoder = get_encoder(data, CATEGORICAL_FEATURES)
+    return Preprocessor.from_encoder(encoder, FEATURES, FEATURES_RANGE)
+
+
+def test_transform_matches_process_categorical(data, preprocessor):
+    """
+    Check that frames and records are encoded like the training data.
+
+    Args:
+        data (pd.DataFrame): Raw features.
+        preprocessor (Preprocessor): Fitted preprocessing.
+    """
+    expected = process_categorical(data, CATEGORICAL_FEATURES)
+
+    assert preprocessor.columns == list(expected.columns)
+    np.testing.assert_array_equal(preprocessor.transform(data), expected.to_numpy())
+    np.testing.assert_array_equal(
+        preprocessor.transform(data.to_dict("records")), expected.to_numpy()
+    )
+
+
+def test_unknown_and_missing_values(preprocessor):
+    """
+    Check that unknown categories and missing numeric values are tolerated.
+
+    Args:
+        preprocessor (Preprocessor): Fitted preprocessing.
+    """
+    records = [{"age": 45, "erihc": "Unknown", "prihc": "No"}]
+    X = preprocessor.transform(records)
+
+    assert np.isnan(X[0, preprocessor.columns.index("grade")])
+    assert X[0, preprocessor.columns.index("erihc_No")] == 0
+    assert X[0, preprocessor.columns.index("erihc_Yes")] == 0
+    assert X[0, preprocessor.columns.index("prihc_No")] == 1
+    np.testing.assert_array_equal(
+        preprocessor.transform(pd.DataFrame(records, columns=FEATURES)), X
+    )
+
+
+def test_save_load_round_trip(tmp_path, data, preprocessor):
+    """
+    Check that a saved preprocessing encodes and validates like the original.
+
+    Args:
+        tmp_path (Path): Temporary directory.
+        data (pd.DataFrame): Raw features.
+        preprocessor (Preprocessor): Fitted preprocessing.
+    """
+    path = str(tmp_path / "preprocessor.json")
+    preprocessor.save(path)
+    loaded = Preprocessor.load(path)
+
+    X = loaded.transform(data)
+    np.testing.assert_array_equal(X, preprocessor.transform(data))
+    np.testing.assert_array_equal(loaded.in_range(X), [True, True, False, True])
+
+
+def test_sparse_training_matches_dense_scoring():
+    """
+    Check that a model trained on sparse features scores raw records like its
+    training matrix, zeros of numeric and one-hot columns included.
+    """
+    process = get_config().process
+    data = process_null(generate_data(2000, process, seed=1))
+    raw = data[list(process.features)]
+    encoder = get_encoder(raw, process.categorical_features, sparse_output=True)
+    X = to_csr(process_categorical(raw, process.categorical_features, encoder=encoder))
+    model = XGBClassifier(n_estimators=30, max_depth=4).fit(X, data[process.target])
+    preprocessor = Preprocessor.from_encoder(encoder, process.features, [])
+
+    expected = model.predict_proba(X)
+    np.testing.assert_allclose(
+        model.predict_proba(preprocessor.transform(raw)), expected
+    )
+    np.testing.assert_allclose(
+        model.predict_proba(preprocessor.transform(raw.to_dict("records"))), expected
+    )
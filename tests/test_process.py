@@ -1,12 +1,24 @@
 import hydra
+import numpy as np
 import pandas as pd
 from hydra.core.global_hydra import GlobalHydra
+from omegaconf import OmegaConf
 from pandera import Check, Column, DataFrameSchema
 from pytest_steps import test_steps
+from synthetic import generate_data, get_config
 
-from training.process import (get_features, process_categorical,
-                              process_duplicate, process_null,
-                              process_outliers)
+from training.process import (
+    get_dtypes,
+    get_features,
+    process_categorical,
+    process_clean,
+    process_data,
+    process_dtypes,
+    process_duplicate,
+    process_null,
+    process_outliers,
+)
+from training.storage import load_frame
 
 
 # Define a test suite with specific steps
@@ -196,3 +208,164 @@ def process_categorical_step(steps_data):
     ).columns.tolist()
     data = process_categorical(data, categorical_columns)
     schema.validate(data)
+
+
+def test_process_dtypes():
+    """
+    Check that dtype compaction narrows the columns without changing values.
+    """
+    data = pd.DataFrame(
+        {
+            "age": [45, 50, 61, 38],
+            "tstage": [1.0, 2.0, None, 4.0],
+            "score": [0.1, 0.2, 0.3, 0.4],
+            "erihc": ["No", "Yes", "Yes", "No"],
+            "pcr": [0, 1, 1, 0],
+        }
+    )
+    dtypes = OmegaConf.create({"float": "float32", "max_categories": 2})
+    features_range = OmegaConf.create({"name": "age", "min": 0, "max": 300})
+
+    compacted = process_dtypes(data, dtypes, features_range)
+
+    assert compacted["age"].dtype == "uint16"
+    assert compacted["tstage"].dtype == "float32"
+    assert compacted["score"].dtype == "float64"
+    assert compacted["erihc"].dtype == "category"
+    assert compacted["pcr"].dtype == "uint8"
+    assert compacted.memory_usage(deep=True).sum() < data.memory_usage(deep=True).sum()
+    pd.testing.assert_frame_equal(compacted.astype(data.dtypes), data)
+
+
+def test_process_dtypes_checks_ranges(capsys):
+    """
+    Check that the compacted columns hold their declared ranges and that the
+    values outside them are reported per column.
+
+    Args:
+        capsys: Fixture capturing the printed output.
+    """
+    data = pd.DataFrame({"age": [45, 50, 310, 38], "score": [0.5, 0.25, 0.75, 1.0]})
+    dtypes = OmegaConf.create({"float": "float32", "max_categories": 2})
+    features_range = OmegaConf.create(
+        [
+            {"name": "age", "min": 0, "max": 300},
+            {"name": "score", "min": 0, "max": 1e300},
+        ]
+    )
+
+    compacted = process_dtypes(data, dtypes, features_range)
+
+    assert compacted["age"].dtype == "uint16"
+    assert compacted["score"].dtype == "float64"
+    assert (
+        "age: 1 values outside the declared range [0, 300]" in capsys.readouterr().out
+    )
+
+
+def test_get_dtypes_holds_every_chunk(tmp_path):
+    """
+    Check that the chunk dtypes are promoted to dtypes holding every chunk.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    raw_path = str(tmp_path / "raw.csv")
+    pd.DataFrame(
+        {
+            "age": [45, 50, 61, 38],
+            "size": [10, 20, 300, 40],
+            "score": [0.5, 1.5, 0.1, 0.2],
+        }
+    ).to_csv(raw_path, index=False)
+    dtypes = OmegaConf.create({"float": "float32", "max_categories": 2})
+    features_range = OmegaConf.create({"name": "age", "min": 0, "max": 120})
+
+    found = get_dtypes(
+        raw_path, ",", ["age", "size", "score"], dtypes, features_range, 2
+    )
+
+    # The first chunk alone would fit in uint8, uint8 and float32
+    assert found == {"age": "uint8", "size": "uint16", "score": "float64"}
+
+
+def test_process_clean_matches_chained_steps():
+    """
+    Check that fused cleaning drops the same rows as the chained steps.
+    """
+    data = pd.DataFrame(
+        {
+            "age": [45.0, None, 130.0, 61.0, 38.0, 50.0],
+            "tstage": [1.0, 2.0, 2.0, 5.0, 3.0, 2.0],
+            "grade": [1.0, 2.0, 3.0, 2.0, None, 3.0],
+            "pcr": [0, 1, 1, 0, 1, 0],
+        }
+    )
+    rules = OmegaConf.create(
+        [
+            {"name": "age", "min": 0, "max": 120},
+            {"name": "tstage", "min": 1, "max": 4},
+        ]
+    )
+
+    cleaned = process_clean(data, list(data.columns), rules)
+
+    pd.testing.assert_frame_equal(cleaned, process_outliers(process_null(data), rules))
+    assert list(cleaned.index) == [0, 5]
+
+
+def load_rows(config):
+    """
+    Load the rows of the processed splits, sorted.
+
+    Args:
+        config (DictConfig): Configuration of the processing run.
+
+    Returns:
+        np.ndarray: Features and label of every row, rounded to float32 precision.
+    """
+    X = pd.concat([load_frame(config.processed[s].path) for s in ("X_train", "X_test")])
+    y = pd.concat([load_frame(config.processed[s].path) for s in ("y_train", "y_test")])
+    rows = np.column_stack([X.to_numpy(dtype=float), y.to_numpy(dtype=float)])
+    rows = np.round(rows, 3)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def test_incremental_run_processes_appended_rows(tmp_path):
+    """
+    Check that processing appended rows gives the rows of a full run on the whole file.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    process = get_config().process
+    raw_path = tmp_path / "raw.csv"
+    generate_data(2000, process, seed=1).to_csv(raw_path, sep=process.sep, index=False)
+
+    def get_run_config(name, incremental):
+        """Configure a run writing to its own directory."""
+        (tmp_path / name).mkdir()
+        return get_config(
+            [
+                f"raw.path={raw_path}",
+                f"processed.dir={tmp_path / name}",
+                f"model.dir={tmp_path / name}",
+                f"process.incremental.enabled={incremental}",
+                f"process.incremental.dir={tmp_path / name / 'incremental'}",
+            ]
+        )
+
+    config = get_run_config("incremental", True)
+    process_data(config)
+    processed = len(load_rows(config))
+    appended = pd.concat(
+        [generate_data(500, process, seed=2), pd.read_csv(raw_path, sep=";")[:100]]
+    )
+    appended.to_csv(raw_path, sep=process.sep, index=False, header=False, mode="a")
+    process_data(config)
+    process_data(config)
+
+    full = get_run_config("full", False)
+    process_data(full)
+    np.testing.assert_array_equal(load_rows(config), load_rows(full))
+    assert len(load_rows(config)) > processed
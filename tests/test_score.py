@@ -0,0 +1,93 @@
+import joblib
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+
+from training.model_io import save_model
+from training.preprocessor import Preprocessor
+from training.score import score_file
+
+
+def test_score_file_keeps_input_order(tmp_path):
+    """
+    Check that chunks scored by several workers are written in input order.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "age": rng.integers(25, 90, 500).astype(float),
+            "erihc": rng.choice(["No", "Yes"], 500),
+            "grade": rng.integers(1, 4, 500).astype(float),
+        }
+    )
+    y = (data["erihc"] == "Yes").astype(int)
+
+    preprocessor = Preprocessor(
+        ["age", "erihc", "grade"],
+        ["erihc"],
+        [["No", "Yes"]],
+        [{"name": "age", "min": 0, "max": 80}],
+    )
+    X = pd.DataFrame(preprocessor.transform(data), columns=preprocessor.columns)
+    model = XGBClassifier(n_estimators=5, max_depth=2).fit(X, y)
+
+    model_path = str(tmp_path / "model")
+    preprocessor_path = str(tmp_path / "preprocessor.json")
+    input_path = str(tmp_path / "raw.csv")
+    output_path = str(tmp_path / "predictions.csv")
+    joblib.dump(model, model_path)
+    preprocessor.save(preprocessor_path)
+    data.to_csv(input_path, sep=";", index=False)
+
+    rows = score_file(
+        input_path,
+        output_path,
+        model_path,
+        preprocessor_path,
+        sep=";",
+        chunksize=60,
+        n_workers=2,
+    )
+    predictions = pd.read_csv(output_path)
+
+    assert rows == len(data)
+    np.testing.assert_allclose(
+        predictions["probability"], model.predict_proba(X)[:, 1], rtol=1e-6
+    )
+    np.testing.assert_array_equal(predictions["in_range"], data["age"] <= 80)
+
+
+def test_score_file_uses_saved_threshold(tmp_path):
+    """
+    Check that the labels use the decision threshold saved with the model.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {"age": rng.integers(25, 90, 200).astype(float), "erihc": ["No"] * 200}
+    )
+    y = (data["age"] + rng.normal(0, 20, 200) > 60).astype(int)
+
+    preprocessor = Preprocessor(["age", "erihc"], ["erihc"], [["No", "Yes"]], [])
+    X = pd.DataFrame(preprocessor.transform(data), columns=preprocessor.columns)
+    model = XGBClassifier(n_estimators=5, max_depth=2).fit(X, y)
+
+    model_path = str(tmp_path / "model")
+    preprocessor_path = str(tmp_path / "preprocessor.json")
+    input_path = str(tmp_path / "raw.csv")
+    output_path = str(tmp_path / "predictions.csv")
+    preprocessor.save(preprocessor_path)
+    save_model(model, model_path, "ubj", preprocessor_path, threshold=0.3)
+    data.to_csv(input_path, index=False)
+
+    score_file(input_path, output_path, model_path, preprocessor_path, n_workers=1)
+    predictions = pd.read_csv(output_path)
+
+    labels = (predictions["probability"] > 0.3).astype(int)
+    assert (labels != (predictions["probability"] > 0.5)).any()
+    np.testing.assert_array_equal(predictions["pcr"], labels)
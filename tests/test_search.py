@@ -0,0 +1,223 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+from hyperopt import Trials
+from synthetic import get_config
+
+from training.train_model import (
+    BestModelKeeper,
+    build_objective,
+    get_early_stop,
+    get_matrices,
+    get_space,
+    optimize,
+    optimize_parallel,
+    successive_halving,
+)
+from training.trial_store import TrialStore
+
+
+@pytest.fixture
+def config():
+    """
+    Compose a configuration with small trials.
+
+    Returns:
+        DictConfig: Configuration object.
+    """
+    return get_config(["model.n_estimators=20", "model.search.nthread=1"])
+
+
+@pytest.fixture
+def splits():
+    """
+    Build small train and test splits with a learnable label.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+            Training and testing features and labels.
+    """
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 5)), columns=[f"x{i}" for i in range(5)])
+    noise = rng.normal(scale=0.5, size=len(X))
+    y = pd.DataFrame({"pcr": (X["x0"] + X["x1"] + noise > 0).astype(int)})
+    return X[:300], X[300:], y[:300], y[300:]
+
+
+def get_params(trials):
+    """
+    Get the hyperparameters and loss of every trial.
+
+    Args:
+        trials (Trials): Trials of a search.
+
+    Returns:
+        list: Hyperparameters and loss of each trial, in trial order.
+    """
+    return [(result["params"], result["loss"]) for result in trials.results]
+
+
+def test_parallel_search_is_reproducible(config, splits):
+    """
+    Check that a seeded parallel search runs the requested trials reproducibly.
+
+    Args:
+        config (DictConfig): Configuration object.
+        splits (tuple): Training and testing features and labels.
+    """
+    X_train, X_test, y_train, y_test = splits
+    make_objective = partial(build_objective, X_train, y_train, X_test, y_test, config)
+    runs = []
+    for _ in range(2):
+        trials = Trials()
+        model = optimize_parallel(
+            make_objective, get_space(config), 5, 0, n_workers=2, trials=trials
+        )
+        runs.append(trials)
+
+    assert len(runs[0]) == 5
+    assert get_params(runs[0]) == get_params(runs[1])
+    assert model is not None
+
+
+def test_keeper_returns_the_best_model_only(config, splits):
+    """
+    Check that the trials hold no model and the best trial's model is returned.
+
+    Args:
+        config (DictConfig): Configuration object.
+        splits (tuple): Training and testing features and labels.
+    """
+    X_train, X_test, y_train, y_test = splits
+    objective = build_objective(X_train, y_train, X_test, y_test, config)
+    models = []
+
+    def record(space):
+        """Evaluate the objective, recording the model of the trial."""
+        result = objective(space)
+        models.append(result["model"])
+        return result
+
+    trials, keeper = Trials(), BestModelKeeper()
+    model = optimize(record, get_space(config), 5, 0, trials, keeper)
+
+    assert all("model" not in result for result in trials.results)
+    losses = [result["loss"] for result in trials.results]
+    assert model is keeper.model is models[int(np.argmin(losses))]
+    assert keeper.loss == min(losses)
+
+
+def test_dmatrix_objective_matches_fit(config, splits):
+    """
+    Check that training on prebuilt matrices predicts like the scikit-learn fit.
+
+    Args:
+        config (DictConfig): Configuration object.
+        splits (tuple): Training and testing features and labels.
+    """
+    X_train, X_test, y_train, y_test = splits
+    space = dict(
+        get_space(config),
+        max_depth=4,
+        gamma=1.0,
+        reg_alpha=1,
+        reg_lambda=0.5,
+        colsample_bytree=1,
+        min_child_weight=1,
+    )
+    results = {}
+    for dmatrix in (False, True):
+        config.model.search.dmatrix = dmatrix
+        results[dmatrix] = build_objective(X_train, y_train, X_test, y_test, config)(
+            space
+        )
+
+    fit, dmatrix = results[False], results[True]
+    assert dmatrix["best_iteration"] == fit["best_iteration"]
+    assert dmatrix["accuracy"] == fit["accuracy"]
+    np.testing.assert_allclose(
+        dmatrix["model"].predict_proba(X_test),
+        fit["model"].predict_proba(X_test),
+        rtol=1e-6,
+    )
+
+
+class Interrupted(Exception):
+    """Raised by the objective to interrupt a search."""
+
+
+def test_interrupted_search_resumes_from_store(tmp_path, config, splits):
+    """
+    Check that a resumed search suggests the same trials and refits none.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        config (DictConfig): Configuration object.
+        splits (tuple): Training and testing features and labels.
+    """
+    X_train, X_test, y_train, y_test = splits
+    objective = build_objective(X_train, y_train, X_test, y_test, config)
+    space = get_space(config)
+    fitted = []
+
+    def count(space):
+        """Evaluate the objective, interrupting the search at the fourth trial."""
+        if len(fitted) == 3:
+            raise Interrupted
+        fitted.append(space)
+        return objective(space)
+
+    def count_resumed(space):
+        """Evaluate the objective, recording the trials fitted after resuming."""
+        fitted.append(space)
+        return objective(space)
+
+    store = TrialStore(str(tmp_path), "search")
+    with pytest.raises(Interrupted):
+        optimize(count, space, 6, 0, store.load_trials(), BestModelKeeper(), store)
+    assert len(store.load_trials()) == 3
+
+    fitted.clear()
+    resumed = store.load_trials()
+    optimize(count_resumed, space, 6, 0, resumed, BestModelKeeper(), store)
+    uninterrupted = Trials()
+    optimize(objective, space, 6, 0, uninterrupted)
+
+    assert len(fitted) == 3
+    assert len(store.load_trials()) == 6
+    assert get_params(resumed) == get_params(uninterrupted)
+
+
+def test_successive_halving_rungs(config, splits, capsys):
+    """
+    Check the rung budgets and that the best iteration is where early stopping stops.
+
+    Args:
+        config (DictConfig): Configuration object.
+        splits (tuple): Training and testing features and labels.
+        capsys: Output capture provided by pytest.
+    """
+    X_train, X_test, y_train, y_test = splits
+    config.model.n_estimators = 18
+    config.model.search.halving = {"n_configs": 9, "min_rounds": 2, "eta": 3}
+    dtrain, dtest = get_matrices(X_train, y_train, X_test, y_test)
+
+    model = successive_halving(dtrain, dtest, y_test, config, get_space(config))
+
+    rungs = [
+        line.split(", best")[0]
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith("Rung")
+    ]
+    assert rungs == [
+        "Rung with 2 rounds: 9 configurations",
+        "Rung with 6 rounds: 3 configurations",
+        "Rung with 18 rounds: 1 configurations",
+    ]
+    booster = model.get_booster()
+    history = model.evals_result_["validation_1"][config.model.eval_metric]
+    best, _ = get_early_stop(history, config.model.early_stopping_rounds, True)
+    assert booster.best_iteration == best
+    assert booster.num_boosted_rounds() <= 18
@@ -0,0 +1,114 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from training.load_generator import run_load
+from training.preprocessor import Preprocessor
+from training.process import get_encoder
+from training.serve import MicroBatcher, make_app
+
+
+def test_micro_batcher_splits_batch_results():
+    """
+    Check that concurrent requests are scored together and get their own results.
+    """
+    batches = []
+
+    def predict_batch(X):
+        """
+        Score rows by echoing their age.
+
+        Args:
+            X (np.ndarray): Rows to score.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Labels and probabilities.
+        """
+        batches.append(len(X))
+        ages = X[:, 0]
+        return (ages > 50).astype(int), ages / 100
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(np.array([[age]])) for age in (30, 60, 45, 80)]
+    futures.append(batcher.submit(np.array([[90], [20]])))
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [result["pcr"] for result in results] == [[0], [1], [0], [1], [1, 0]]
+    assert results[-1]["probability"] == [0.9, 0.2]
+    assert sum(batches) == 6 and len(batches) < 6
+    assert batcher.stats()["requests"] == 5
+
+
+@pytest.fixture
+def app():
+    """
+    Create the scoring application with a model echoing the age.
+
+    Returns:
+        Callable: WSGI application.
+    """
+    data = pd.DataFrame({"age": [45, 60], "erihc": ["No", "Yes"]})
+    preprocessor = Preprocessor.from_encoder(
+        get_encoder(data, ["erihc"]),
+        ["age", "erihc"],
+        [{"name": "age", "min": 0, "max": 120}],
+    )
+
+    def predict_batch(X):
+        """Score rows by echoing their age."""
+        return (X[:, 0] > 50).astype(int), X[:, 0] / 100
+
+    return make_app(MicroBatcher(predict_batch, max_wait_ms=1), preprocessor)
+
+
+def post(app, body):
+    """
+    Send a prediction request to the application.
+
+    Args:
+        app (Callable): WSGI application.
+        body: JSON body of the request.
+
+    Returns:
+        Tuple[str, dict]: Status line and JSON body of the response.
+    """
+    payload = json.dumps(body).encode()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/predict",
+        "CONTENT_LENGTH": str(len(payload)),
+        "wsgi.input": io.BytesIO(payload),
+    }
+    status = []
+    response = app(environ, lambda line, headers: status.append(line))
+    return status[0], json.loads(b"".join(response))
+
+
+def test_invalid_records_get_their_own_response(app):
+    """
+    Check that invalid records are rejected per request and valid ones scored.
+
+    Args:
+        app (Callable): WSGI application.
+    """
+    for body in ({"age": "abc"}, [5], [], [{"age": 130}], [{"age": None}]):
+        status, response = post(app, body)
+        assert status == "400 Bad Request" and "error" in response
+
+    status, response = post(app, [{"age": 60, "erihc": "Yes"}, {"age": 30}])
+    assert status == "200 OK"
+    assert response["pcr"] == [1, 0]
+    assert response["probability"] == pytest.approx([0.6, 0.3])
+
+
+def test_run_load_with_only_failed_requests():
+    """
+    Check that the load report has no percentiles when every request fails.
+    """
+    report = run_load("http://127.0.0.1:9/predict", [{"age": 50}], 3, 2)
+
+    assert report["requests"] == 0 and report["errors"] == 3
+    assert report["p50_ms"] is None and report["p99_ms"] is None
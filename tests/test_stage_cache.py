@@ -0,0 +1,134 @@
+import os
+
+import pytest
+from synthetic import get_config
+
+from training.stage_cache import SPLITS, get_stage_io, run_stage
+
+
+@pytest.fixture
+def config(tmp_path):
+    """
+    Compose a configuration whose process stage reads and writes in a temporary
+    directory.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+
+    Returns:
+        DictConfig: Configuration object.
+    """
+    config = get_config()
+    config.raw.path = str(tmp_path / "raw.csv")
+    for split in SPLITS:
+        config.processed[split].path = str(tmp_path / f"{split}.csv")
+    config.model.preprocessor.path = str(tmp_path / "preprocessor.pkl")
+    config.pipeline.cache.dir = str(tmp_path / "cache")
+    config.pipeline.cache.max_entries = 2
+    return config
+
+
+def get_runner(runs):
+    """
+    Build a process stage that writes its outputs and records each run.
+
+    Args:
+        runs (list): Raw contents seen by each run.
+
+    Returns:
+        Callable: Stage function.
+    """
+
+    def run(config):
+        """Write outputs derived from the raw file."""
+        with open(config.raw.path) as file:
+            raw = file.read()
+        runs.append(raw)
+        _, _, outputs, _ = get_stage_io("process", config)
+        for path in outputs:
+            with open(path, "w") as file:
+                file.write(f"{os.path.basename(path)}:{raw}")
+
+    return run
+
+
+def test_cache_hit_restores_outputs(config):
+    """
+    Check that unchanged inputs skip the stage and restore its outputs.
+
+    Args:
+        config (DictConfig): Configuration object.
+    """
+    runs = []
+    run = get_runner(runs)
+    with open(config.raw.path, "w") as file:
+        file.write("a")
+    run_stage("process", run, config)
+    _, _, outputs, _ = get_stage_io("process", config)
+    for path in outputs:
+        os.remove(path)
+
+    run_stage("process", run, config)
+    assert runs == ["a"]
+    with open(config.processed.X_train.path) as file:
+        assert file.read() == "X_train.csv:a"
+
+    with open(config.raw.path, "w") as file:
+        file.write("b")
+    run_stage("process", run, config)
+    config.process.sep = ","
+    run_stage("process", run, config)
+    assert runs == ["a", "b", "b"]
+
+
+def test_cache_keeps_recently_used_runs(config):
+    """
+    Check that the least recently used runs are evicted beyond the cap.
+
+    Args:
+        config (DictConfig): Configuration object.
+    """
+    runs = []
+    run = get_runner(runs)
+    for raw in ("a", "b", "a", "c", "a", "b"):
+        with open(config.raw.path, "w") as file:
+            file.write(raw)
+        run_stage("process", run, config)
+
+    # "a" was used last when "c" was added, so "b" was evicted
+    assert runs == ["a", "b", "c", "b"]
+    assert len(os.listdir(os.path.join(config.pipeline.cache.dir, "process"))) == 2
+
+
+def test_cache_hit_removes_stale_metadata(config, tmp_path):
+    """
+    Check that restoring a joblib model removes the metadata of a native model
+    trained in between.
+
+    Args:
+        config (DictConfig): Configuration object.
+        tmp_path: Temporary directory provided by pytest.
+    """
+    config.model.path = str(tmp_path / "xgboost")
+    for split in SPLITS:
+        with open(config.processed[split].path, "w") as file:
+            file.write(split)
+
+    def run(config):
+        """Write the outputs of the configured model format."""
+        _, _, outputs, removed = get_stage_io("train", config)
+        for path in outputs:
+            with open(path, "w") as file:
+                file.write(config.model.format)
+        for path in removed:
+            if os.path.exists(path):
+                os.remove(path)
+
+    for model_format in ("ubj", "joblib", "ubj", "joblib"):
+        config.model.format = model_format
+        run_stage("train", run, config)
+
+    _, _, outputs, removed = get_stage_io("train", config)
+    with open(outputs[0]) as file:
+        assert file.read() == "joblib"
+    assert removed and not any(os.path.exists(path) for path in removed)
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from training.storage import (
+    FrameWriter,
+    append_frame,
+    is_sparse_frame,
+    load_frame,
+    save_frame,
+    to_csr,
+)
+
+
+@pytest.mark.parametrize("storage_format", ["parquet", "feather", "npy", "mmap", "csv"])
+def test_round_trip_keeps_dtypes(tmp_path, storage_format):
+    """
+    Check that saving and loading a frame keeps its dtypes and column order.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        storage_format (str): Storage format under test.
+    """
+    data = pd.DataFrame(
+        {
+            "age": pd.Series([45, 50, 61], dtype="int64"),
+            "tstage": [1.0, 2.0, 4.0],
+            "erihc_No": [1.0, 0.0, 1.0],
+            "erihc_Yes": [0.0, 1.0, 0.0],
+        }
+    )
+    path = tmp_path / f"X_train.{storage_format}"
+
+    save_frame(data, str(path))
+    loaded = load_frame(str(path))
+
+    pd.testing.assert_frame_equal(loaded, data)
+
+
+def test_missing_file_falls_back_to_csv(tmp_path):
+    """
+    Check that a missing file is read from the CSV file with the same name.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    y = pd.Series([0, 1, 1], name="pcr")
+    save_frame(y, str(tmp_path / "y_test.csv"))
+
+    loaded = load_frame(str(tmp_path / "y_test.parquet"))
+
+    pd.testing.assert_frame_equal(loaded, y.to_frame())
+
+
+@pytest.mark.parametrize("storage_format", ["parquet", "feather", "npy", "mmap", "csv"])
+def test_frame_writer_appends_chunks(tmp_path, storage_format):
+    """
+    Check that writing chunks incrementally gives the same data as one write.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        storage_format (str): Storage format under test.
+    """
+    data = pd.DataFrame({"age": [45.0, 50.0, 61.0, 38.0, 70.0], "pcr": [0, 1, 1, 0, 1]})
+    path = tmp_path / f"data.{storage_format}"
+
+    with FrameWriter(str(path)) as writer:
+        for start in range(0, len(data), 2):
+            writer.write(data.iloc[start : start + 2])
+
+    pd.testing.assert_frame_equal(load_frame(str(path)), data)
+
+
+@pytest.mark.parametrize("storage_format", ["parquet", "npz", "csv"])
+def test_frame_writer_replaces_earlier_output(tmp_path, storage_format):
+    """
+    Check that a split without rows does not keep the output of an earlier run.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        storage_format (str): Storage format under test.
+    """
+    data = pd.DataFrame({"age": [45.0, 50.0], "pcr": [0.0, 1.0]})
+    path = str(tmp_path / f"data.{storage_format}")
+    save_frame(data, path)
+
+    with FrameWriter(path) as writer:
+        writer.write(data.head(0))
+    loaded = load_frame(path)
+    assert len(loaded) == 0 and list(loaded.columns) == ["age", "pcr"]
+
+    save_frame(data, path)
+    with FrameWriter(path):
+        pass
+    assert not (tmp_path / f"data.{storage_format}").exists()
+
+
+@pytest.mark.parametrize("storage_format", ["parquet", "feather", "npy", "mmap", "csv"])
+def test_append_frame_extends_the_file(tmp_path, storage_format):
+    """
+    Check that appended rows are cast to the stored dtypes and column order.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+        storage_format (str): Storage format under test.
+    """
+    data = pd.DataFrame({"age": [45.0, 50.0, 61.0, 38.0, 70.0], "pcr": [0, 1, 1, 0, 1]})
+    path = str(tmp_path / f"data.{storage_format}")
+
+    save_frame(data.iloc[:2], path)
+    for start in range(2, len(data)):
+        rows = data.iloc[start : start + 1][["pcr", "age"]]
+        # CSV files store no dtypes, the text of the values is appended as is
+        append_frame(rows if storage_format == "csv" else rows.astype(float), path)
+
+    pd.testing.assert_frame_equal(load_frame(path), data)
+
+
+def test_npz_keeps_frames_sparse(tmp_path):
+    """
+    Check that sparse frames are saved and loaded as CSR without densifying.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    matrix = sparse.random(50, 20, density=0.05, format="csr", random_state=0)
+    data = pd.DataFrame.sparse.from_spmatrix(
+        matrix, columns=[f"code_{i}" for i in range(20)]
+    )
+    path = str(tmp_path / "X_train.npz")
+
+    save_frame(data, path)
+    loaded = load_frame(path)
+
+    assert is_sparse_frame(loaded)
+    assert list(loaded.columns) == list(data.columns)
+    assert (to_csr(loaded) != matrix).nnz == 0
+
+    with FrameWriter(str(tmp_path / "chunks.npz")) as writer:
+        for start in range(0, len(data), 15):
+            writer.write(data.iloc[start : start + 15])
+    assert (to_csr(load_frame(str(tmp_path / "chunks.npz"))) != matrix).nnz == 0
+
+
+def test_mmap_loads_views_of_the_file(tmp_path):
+    """
+    Check that mmap frames are loaded as read-only views of the mapped file.
+
+    Args:
+        tmp_path: Temporary directory provided by pytest.
+    """
+    data = pd.DataFrame(
+        {
+            "age": np.array([45.5, 50.0, 61.0], dtype="float32"),
+            "tstage": np.array([1, 2, 4], dtype="int8"),
+            "erihc_No": [1.0, 0.0, 1.0],
+            "erihc_Yes": [0.0, 1.0, 0.0],
+        }
+    )
+    path = str(tmp_path / "X_train.mmap")
+    save_frame(data, path)
+
+    loaded = load_frame(path)
+
+    pd.testing.assert_frame_equal(loaded, data)
+    for column in loaded.columns:
+        values, bases = loaded[column].to_numpy(), []
+        while isinstance(values, np.ndarray):
+            bases.append(values)
+            values = values.base
+        assert any(isinstance(base, np.memmap) for base in bases)
+        assert not loaded[column].to_numpy().flags.writeable
+    with pytest.raises(ValueError):
+        save_frame(pd.DataFrame({"her2": ["Yes", "No"]}), str(tmp_path / "bad.mmap"))
+
+    loaded = load_frame(path)
+    append_frame(data.iloc[:2], path)
+    pd.testing.assert_frame_equal(loaded, data)
+    pd.testing.assert_frame_equal(
+        load_frame(path), pd.concat([data, data.iloc[:2]], ignore_index=True)
+    )
@@ -0,0 +1,24 @@
+from synthetic import generate_data, get_config
+
+from training.process import get_features, process_clean
+
+
+def test_generate_data_matches_schema():
+    """
+    Check that synthetic records have the configured schema and dirty rows.
+    """
+    process = get_config().process
+    data = generate_data(10000, process, seed=1)
+
+    assert list(data.columns) == [*process.features, process.target]
+    assert set(data[process.target]) == {0, 1}
+    for feature in process.categorical_features:
+        assert set(data[feature].dropna()) == {"Yes", "No"}
+    assert data.isna().any(axis=1).any()
+    assert data.duplicated().any()
+
+    clean = process_clean(data, process.features, process.range_rules)
+    assert 0 < len(clean) < len(data)
+    y, X = get_features(process.target, process.features, clean)
+    assert len(X) == len(y)
+    assert data.equals(generate_data(10000, process, seed=1))
@@ -1,10 +1,10 @@
-import joblib
 import pandas as pd
 from deepchecks.tabular import Dataset
 from deepchecks.tabular.checks import TrainTestPerformance
 from hydra import compose, initialize
 from hydra.utils import to_absolute_path as abspath
 
+from training.model_io import load_model
 from training.train_model import load_data
 
 """
@@ -41,7 +41,7 @@ def test_xgboost():
         config = compose(config_name="main")
 
     model_path = abspath(config.model.path)
-    model = joblib.load(model_path)
+    model = load_model(model_path)
     X_train, X_test, y_train, y_test = load_data(config.processed)
     train_df = pd.concat([X_train, y_train], axis=1)
     test_df = pd.concat([X_test, y_test], axis=1)
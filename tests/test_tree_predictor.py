@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from xgboost import XGBClassifier
+
+from training.tree_predictor import TreePredictor
+
+
+@pytest.fixture
+def data():
+    """
+    Build features with missing values and a noisy label.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Features and labels.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.random((1000, 6)).astype(np.float32)
+    X[:, 1] = rng.integers(0, 2, 1000)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + X[:, 1] + rng.normal(0, 0.3, 1000) > 1).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("max_depth", [1, 3, 6])
+def test_predict_proba_matches_xgboost(data, max_depth):
+    """
+    Check that the NumPy predictor matches `predict_proba` of the classifier.
+
+    Args:
+        data (Tuple[np.ndarray, np.ndarray]): Features and labels.
+        max_depth (int): Maximum depth of the trees.
+    """
+    X, y = data
+    model = XGBClassifier(n_estimators=50, max_depth=max_depth).fit(X, y)
+
+    predictor = TreePredictor.from_booster(model.get_booster())
+
+    np.testing.assert_allclose(
+        predictor.predict_proba(X), model.predict_proba(X), atol=1e-5
+    )
+    np.testing.assert_allclose(
+        predictor.predict_proba(X[:1]), model.predict_proba(X[:1]), atol=1e-5
+    )
+
+
+def test_best_iteration_is_used(data):
+    """
+    Check that only the trees up to the best iteration are evaluated.
+
+    Args:
+        data (Tuple[np.ndarray, np.ndarray]): Features and labels.
+    """
+    X, y = data
+    model = XGBClassifier(n_estimators=300, early_stopping_rounds=5)
+    model.fit(X[:800], y[:800], eval_set=[(X[800:], y[800:])], verbose=False)
+
+    predictor = TreePredictor.from_booster(model.get_booster())
+
+    assert len(predictor.roots) == model.best_iteration + 1
+    np.testing.assert_allclose(
+        predictor.predict_proba(X), model.predict_proba(X), atol=1e-5
+    )
+
+
+def test_sparse_features_are_missing_when_absent(data):
+    """
+    Check that sparse features predict like XGBoost, absent entries missing.
+
+    Args:
+        data (Tuple[np.ndarray, np.ndarray]): Features and labels.
+    """
+    X, y = data
+    X = np.where(np.random.default_rng(1).random(X.shape) < 0.5, 0, X)
+    csr = sparse.csr_matrix(np.nan_to_num(X))
+    model = XGBClassifier(n_estimators=20, max_depth=3).fit(csr, y)
+
+    predictor = TreePredictor.from_booster(model.get_booster())
+
+    np.testing.assert_allclose(
+        predictor.predict_proba(csr), model.predict_proba(csr), atol=1e-5
+    )
+    assert predictor.get_params()["n_trees"] == 20
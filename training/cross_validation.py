@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+from storage import is_sparse_frame, to_csr
+
+"""
+This script evaluates hyperparameters with k-fold cross-validation in a process pool.
+"""
+
+# Data and fold matrices of a worker process
+_fold_data = {}
+
+
+def share_arrays(X: pd.DataFrame, y: pd.DataFrame, directory: str):
+    """
+    Write the features and labels as .npy files to be memory-mapped by workers.
+
+    Sparse features are written as a .npz CSR matrix instead, which each
+    worker loads with only its non-zeros.
+
+    Args:
+        X (pd.DataFrame): Features.
+        y (pd.DataFrame): Labels.
+        directory (str): Directory the arrays are written to.
+
+    Returns:
+        Tuple[str, str]: Paths of the features and labels arrays.
+    """
+    y_path = os.path.join(directory, "y.npy")
+    if is_sparse_frame(X):
+        X_path = os.path.join(directory, "X.npz")
+        sparse.save_npz(X_path, to_csr(X), compressed=False)
+    else:
+        X_path = os.path.join(directory, "X.npy")
+        np.save(X_path, np.ascontiguousarray(X.to_numpy()))
+    np.save(y_path, np.ascontiguousarray(y.to_numpy().ravel()))
+    return X_path, y_path
+
+
+def _init_fold_worker(X_path: str, y_path: str, feature_names: list, folds: list):
+    """
+    Memory-map the shared arrays in a worker process and build the matrices
+    of every fold.
+
+    Tasks go to whichever worker is idle, so each worker builds all the
+    folds when it starts instead of the first time it gets each one.
+
+    Args:
+        X_path (str): Path of the features array.
+        y_path (str): Path of the labels array.
+        feature_names (list): Names of the feature columns.
+        folds (list): Train and validation indices of each fold.
+
+    Returns:
+        None
+    """
+    if X_path.endswith(".npz"):
+        _fold_data["X"] = sparse.load_npz(X_path)
+    else:
+        _fold_data["X"] = np.load(X_path, mmap_mode="r")
+    _fold_data["y"] = np.load(y_path, mmap_mode="r")
+    _fold_data["feature_names"] = feature_names
+    _fold_data["folds"] = folds
+    _fold_data["matrices"] = {}
+    for fold in range(len(folds)):
+        _get_fold_matrices(fold)
+
+
+def _get_fold_matrices(fold: int):
+    """
+    Get the matrices of a fold, building them once per worker process.
+
+    Args:
+        fold (int): Index of the fold.
+
+    Returns:
+        Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix, np.ndarray]: Training
+            and validation matrices and the validation labels.
+    """
+    if fold not in _fold_data["matrices"]:
+        X, y = _fold_data["X"], _fold_data["y"]
+        train_index, val_index = _fold_data["folds"][fold]
+        names = _fold_data["feature_names"]
+        dtrain = xgb.QuantileDMatrix(
+            X[train_index], y[train_index], feature_names=names
+        )
+        dval = xgb.QuantileDMatrix(
+            X[val_index], y[val_index], feature_names=names, ref=dtrain
+        )
+        _fold_data["matrices"][fold] = (dtrain, dval, np.asarray(y[val_index]))
+    return _fold_data["matrices"][fold]
+
+
+def _fit_fold(
+    fold: int, params: dict, num_boost_round: int, early_stopping_rounds: int
+):
+    """
+    Train and score one fold.
+
+    Args:
+        fold (int): Index of the fold.
+        params (dict): XGBoost training parameters.
+        num_boost_round (int): Maximum number of boosting rounds.
+        early_stopping_rounds (int): Rounds without improvement before stopping.
+
+    Returns:
+        dict: Accuracy, best iteration and fit time of the fold.
+    """
+    dtrain, dval, y_val = _get_fold_matrices(fold)
+    start = time.perf_counter()
+    booster = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dtrain, "validation_0"), (dval, "validation_1")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False,
+    )
+    fit_time = time.perf_counter() - start
+    probability = booster.predict(dval, iteration_range=(0, booster.best_iteration + 1))
+    return {
+        "accuracy": accuracy_score(y_val, (probability > 0.5).astype(int)),
+        "best_iteration": booster.best_iteration,
+        "fit_time": fit_time,
+    }
+
+
+class CrossValidator:
+    """
+    Evaluate hyperparameters on stratified folds running in a process pool.
+
+    The features are written once to a memory-mapped file shared by all the
+    workers instead of being pickled to each of them, and each worker builds
+    the matrices of every fold once when it starts, for the whole search.
+    """
+
+    def __init__(
+        self,
+        X: pd.DataFrame,
+        y: pd.DataFrame,
+        n_splits: int = 5,
+        n_workers: int = 4,
+        seed: int = None,
+    ):
+        """
+        Split the data into folds and start the worker processes.
+
+        Args:
+            X (pd.DataFrame): Training features.
+            y (pd.DataFrame): Training labels.
+            n_splits (int): Number of folds.
+            n_workers (int): Number of worker processes.
+            seed (int): Seed of the fold shuffling.
+
+        Returns:
+            None
+        """
+        self.n_splits = n_splits
+        self.nthread = max(1, (os.cpu_count() or 1) // n_workers)
+        self._directory = tempfile.TemporaryDirectory()
+        X_path, y_path = share_arrays(X, y, self._directory.name)
+        self.folds = list(
+            StratifiedKFold(n_splits, shuffle=True, random_state=seed).split(
+                np.zeros(len(y)), y.to_numpy().ravel()
+            )
+        )
+        self._pool = ProcessPoolExecutor(
+            n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_fold_worker,
+            initargs=(X_path, y_path, list(X.columns), self.folds),
+        )
+
+    def evaluate(self, params: dict, num_boost_round: int, early_stopping_rounds: int):
+        """
+        Train and score every fold concurrently.
+
+        Args:
+            params (dict): XGBoost training parameters.
+            num_boost_round (int): Maximum number of boosting rounds.
+            early_stopping_rounds (int): Rounds without improvement before stopping.
+
+        Returns:
+            list: Accuracy, best iteration and fit time of each fold.
+        """
+        if params.get("n_jobs") is None:
+            params = dict(params, n_jobs=self.nthread)
+        futures = [
+            self._pool.submit(
+                _fit_fold, fold, params, num_boost_round, early_stopping_rounds
+            )
+            for fold in range(self.n_splits)
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Stop the worker processes and remove the shared arrays.
+
+        Returns:
+            None
+        """
+        self._pool.shutdown()
+        self._directory.cleanup()
+
+    def __enter__(self):
+        """
+        Enter the validator context.
+
+        Returns:
+            CrossValidator: This validator.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the validator when leaving the context.
+
+        Returns:
+            None
+        """
+        self.close()
@@ -0,0 +1,298 @@
+import glob
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+"""
+This script removes duplicate rows using 64-bit row hashes.
+"""
+
+
+def hash_rows(data: pd.DataFrame):
+    """
+    Compute a 64-bit hash of every row of a DataFrame.
+
+    Numeric and boolean columns are hashed as float64, so the same value gets
+    the same hash whether or not its chunk contained missing values or had
+    its dtype downcast.
+
+    Args:
+        data (pd.DataFrame): Input data.
+
+    Returns:
+        np.ndarray: Row hashes as uint64.
+    """
+    numeric = data.select_dtypes(include=["number", "bool"]).columns
+    numeric = [column for column in numeric if data[column].dtype != "float64"]
+    if len(numeric):
+        data = data.astype({column: "float64" for column in numeric})
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+def _isin_sorted(values: np.ndarray, sorted_values: np.ndarray):
+    """
+    Check which values are present in a sorted array.
+
+    Args:
+        values (np.ndarray): Values to look up.
+        sorted_values (np.ndarray): Sorted array, possibly memory-mapped.
+
+    Returns:
+        np.ndarray: Boolean mask of the values found.
+    """
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    position = np.searchsorted(sorted_values, values)
+    position[position == len(sorted_values)] = 0
+    return sorted_values[position] == values
+
+
+class HashDeduplicator:
+    """
+    Remove duplicate rows keeping the first occurrence, across any number of chunks.
+
+    Only a sorted array of 64-bit row hashes is kept. When a spill directory
+    is given and the array grows beyond `max_memory_hashes`, it is written to
+    disk as a sorted run and looked up through a memory map. Runs are merged
+    into one once there are more than `max_runs` of them. Two different rows
+    sharing a hash are treated as duplicates, which for 64-bit hashes is
+    negligible at tens of millions of rows.
+    """
+
+    def __init__(
+        self,
+        max_memory_hashes: int = 10_000_000,
+        spill_dir: str = None,
+        max_runs: int = 8,
+        merge_block: int = 1_000_000,
+        seen: list = None,
+    ):
+        """
+        Initialize an empty deduplicator.
+
+        Args:
+            max_memory_hashes (int): Number of hashes kept in memory before spilling.
+            spill_dir (str): Directory for the sorted runs, nothing is spilled if None.
+            max_runs (int): Number of runs on disk before they are merged.
+            merge_block (int): Number of hashes read from each run per merge step.
+            seen (list): Sorted hashes of rows deduplicated by previous runs,
+                see `load_hashes`. Their rows are dropped, but the hashes are
+                neither copied nor counted.
+
+        Returns:
+            None
+        """
+        self.max_memory_hashes = max_memory_hashes
+        self.spill_dir = spill_dir
+        self.max_runs = max_runs
+        self.merge_block = merge_block
+        self.memory = np.empty(0, dtype=np.uint64)
+        self.runs = []
+        self._run_paths = []
+        self.seen = list(seen or [])
+
+    def __len__(self):
+        """
+        Count the distinct rows seen so far, not counting the `seen` hashes.
+
+        Returns:
+            int: Number of stored hashes.
+        """
+        return len(self.memory) + sum(len(run) for run in self.runs)
+
+    def contains(self, hashes: np.ndarray):
+        """
+        Check which hashes have already been seen.
+
+        Args:
+            hashes (np.ndarray): Row hashes to look up.
+
+        Returns:
+            np.ndarray: Boolean mask of the hashes already seen.
+        """
+        seen = _isin_sorted(hashes, self.memory)
+        for run in [*self.runs, *self.seen]:
+            seen |= _isin_sorted(hashes, run)
+        return seen
+
+    def get_hashes(self):
+        """
+        Get the hashes stored since the deduplicator was created.
+
+        Returns:
+            np.ndarray: Sorted hashes, without those given as `seen`.
+        """
+        return np.sort(np.concatenate([self.memory, *self.runs]))
+
+    def add(self, hashes: np.ndarray):
+        """
+        Store new, distinct hashes.
+
+        Args:
+            hashes (np.ndarray): Row hashes not seen before.
+
+        Returns:
+            None
+        """
+        hashes = np.sort(hashes)
+        self.memory = np.insert(
+            self.memory, np.searchsorted(self.memory, hashes), hashes
+        )
+        if self.spill_dir is not None and len(self.memory) > self.max_memory_hashes:
+            self._spill()
+
+    def filter(self, data: pd.DataFrame):
+        """
+        Drop the rows of a chunk that were already seen, in it or in previous chunks.
+
+        Args:
+            data (pd.DataFrame): Input data.
+
+        Returns:
+            pd.DataFrame: Data with duplicate rows removed.
+        """
+        hashes = hash_rows(data)
+        keep = ~pd.Series(hashes).duplicated(keep="first").to_numpy()
+        keep &= ~self.contains(hashes)
+        self.add(hashes[keep])
+        return data[keep]
+
+    def _write_run(self, hashes: np.ndarray):
+        """
+        Write a sorted run to the spill directory.
+
+        Args:
+            hashes (np.ndarray): Sorted hashes, or None to create an empty run file.
+
+        Returns:
+            str: Path of the written run.
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        handle, path = tempfile.mkstemp(suffix=".npy", dir=self.spill_dir)
+        os.close(handle)
+        if hashes is not None:
+            np.save(path, hashes)
+        self._run_paths.append(path)
+        return path
+
+    def _spill(self):
+        """
+        Move the in-memory hashes to a sorted run on disk.
+
+        Returns:
+            None
+        """
+        path = self._write_run(self.memory)
+        self.runs.append(np.load(path, mmap_mode="r"))
+        self.memory = np.empty(0, dtype=np.uint64)
+        if len(self.runs) > self.max_runs:
+            self._merge_runs()
+
+    def _merge_runs(self):
+        """
+        Merge all sorted runs into one, reading `merge_block` hashes per run at a time.
+
+        Returns:
+            None
+        """
+        runs, paths = self.runs, list(self._run_paths)
+        path = self._write_run(None)
+        merged = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.uint64, shape=(sum(len(run) for run in runs),)
+        )
+        starts = [0] * len(runs)
+        written = 0
+        while any(start < len(run) for start, run in zip(starts, runs)):
+            blocks = {
+                i: run[start : start + self.merge_block]
+                for i, (start, run) in enumerate(zip(starts, runs))
+                if start < len(run)
+            }
+            # Hashes are distinct, so everything up to the smallest end of a
+            # partially read block is already in the blocks
+            open_ends = [
+                block[-1]
+                for i, block in blocks.items()
+                if starts[i] + len(block) < len(runs[i])
+            ]
+            parts = []
+            for i, block in blocks.items():
+                end = len(block)
+                if open_ends:
+                    end = np.searchsorted(block, min(open_ends), side="right")
+                parts.append(block[:end])
+                starts[i] += end
+            part = np.sort(np.concatenate(parts))
+            merged[written : written + len(part)] = part
+            written += len(part)
+        merged.flush()
+        del merged
+
+        self.runs = [np.load(path, mmap_mode="r")]
+        self._run_paths = [path]
+        for old_path in paths:
+            os.remove(old_path)
+
+    def close(self):
+        """
+        Remove the spilled runs from disk.
+
+        Returns:
+            None
+        """
+        self.runs = []
+        for path in self._run_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._run_paths = []
+
+
+def load_hashes(directory: str):
+    """
+    Load the hash runs saved with `save_hashes` as read-only memory maps.
+
+    Args:
+        directory (str): Directory of the runs.
+
+    Returns:
+        list: Sorted hash arrays, empty if nothing was saved.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "hashes-*.npy")))
+    return [np.load(path, mmap_mode="r") for path in paths]
+
+
+def save_hashes(hashes: np.ndarray, directory: str):
+    """
+    Save the hashes of newly deduplicated rows as a sorted run.
+
+    The hashes must not be in the saved runs already. While the previous run
+    is at most twice as large as the new one they are merged, so each run is
+    more than twice as large as the next: there are logarithmically many of
+    them and each hash is rewritten a logarithmic number of times.
+
+    Args:
+        hashes (np.ndarray): New row hashes.
+        directory (str): Directory of the runs.
+
+    Returns:
+        None
+    """
+    if len(hashes) == 0:
+        return
+    os.makedirs(directory, exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(directory, "hashes-*.npy")))
+    number = int(os.path.basename(paths[-1])[7:-4]) + 1 if paths else 0
+    run, merged = np.sort(np.asarray(hashes, dtype=np.uint64)), []
+    while paths and len(np.load(paths[-1], mmap_mode="r")) <= 2 * len(run):
+        merged.append(paths.pop())
+        run = np.sort(np.concatenate([np.load(merged[-1]), run]))
+
+    # The merged runs are removed once the new one is complete
+    path = os.path.join(directory, f"hashes-{number:06d}.npy")
+    with open(f"{path}.tmp", "wb") as file:
+        np.save(file, run)
+    os.replace(f"{path}.tmp", path)
+    for merged_path in merged:
+        os.remove(merged_path)
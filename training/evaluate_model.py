@@ -1,13 +1,18 @@
 import warnings
+from functools import lru_cache
 
 import hydra
-import joblib
+import instrument
 import mlflow
 import pandas as pd
-from helper import BaseLogger
+from helper import BaseLogger, get_logger
 from hydra.utils import to_absolute_path as abspath
+from metrics import evaluate_metrics, get_calibration_curve
+from model_io import NativeModel
+from model_io import load_model as load_saved_model
 from omegaconf import DictConfig
-from sklearn.metrics import accuracy_score, f1_score
+from storage import is_sparse_frame, load_frame, to_csr
+from tree_predictor import TreePredictor
 from xgboost import XGBClassifier
 
 warnings.filterwarnings(action="ignore")
@@ -16,12 +21,26 @@ warnings.filterwarnings(action="ignore")
 # os.environ['MLFLOW_TRACKING_USERNAME'] = 'GitHubAlejandroDR'
 # os.environ['MLFLOW_TRACKING_PASSWORD'] = '99f73425f37db3558a5a5f508d47e397f8348e04'
 # mlflow_tracking_ui: https://dagshub.com/GitHubAlejandroDR/cancer-clinical-test.mlflow
-logger = BaseLogger()
 
 
+@lru_cache(maxsize=None)
+def get_default_logger():
+    """
+    Create the module logger on first use.
+
+    The DAGsHub logger opens its output files when created, so importing
+    this module does not create them.
+
+    Returns:
+        BaseLogger: Synchronous logger shared by the logging functions.
+    """
+    return BaseLogger()
+
+
+@instrument.step
 def load_data(path: DictConfig):
     """
-    Load test data from CSV files.
+    Load test data from the processed data files.
 
     Args:
         path (DictConfig): Configuration specifying file paths.
@@ -29,28 +48,36 @@ def load_data(path: DictConfig):
     Returns:
         Tuple[pd.DataFrame, pd.Series]: A tuple containing the test features and labels.
     """
-    X_test = pd.read_csv(abspath(path.X_test.path))
-    y_test = pd.read_csv(abspath(path.y_test.path))
+    X_test = load_frame(abspath(path.X_test.path))
+    y_test = load_frame(abspath(path.y_test.path))
     return X_test, y_test
 
 
-def load_model(model_path: str):
+@instrument.step
+def load_model(model_path: str, engine: str = "xgboost", model_format: str = None):
     """
     Load a machine learning model from a file.
 
     Args:
         model_path (str): The path to the saved model.
+        engine (str): Inference engine, xgboost or numpy.
+        model_format (str): Format of the saved model, detected if None.
 
     Returns:
-        XGBClassifier: The loaded XGBoost classifier model.
+        XGBClassifier | NativeModel | TreePredictor: The loaded XGBoost
+            classifier model, its native booster if it was saved in the
+            native format, or its trees compiled to NumPy with the numpy engine.
     """
-    return joblib.load(model_path)
+    return load_saved_model(model_path, engine=engine, model_format=model_format)
 
 
+@instrument.step
 def predict(model: XGBClassifier, X_test: pd.DataFrame):
     """
     Make predictions using a trained XGBoost model.
 
+    Sparse features are passed as a CSR matrix, without densifying them.
+
     Args:
         model (XGBClassifier): The trained XGBoost classifier.
         X_test (pd.DataFrame): The test data for making predictions.
@@ -58,48 +85,72 @@ def predict(model: XGBClassifier, X_test: pd.DataFrame):
     Returns:
         pd.Series: Predicted labels.
     """
+    if is_sparse_frame(X_test):
+        return model.predict(to_csr(X_test))
     return model.predict(X_test)
 
 
-def log_params(model: XGBClassifier, features: list):
+@instrument.step
+def predict_proba(model: XGBClassifier, X_test: pd.DataFrame):
+    """
+    Predict the PCR probability using a trained XGBoost model.
+
+    Args:
+        model (XGBClassifier): The trained XGBoost classifier.
+        X_test (pd.DataFrame): The test data for making predictions.
+
+    Returns:
+        np.ndarray: Predicted probability of PCR.
+    """
+    if is_sparse_frame(X_test):
+        return model.predict_proba(to_csr(X_test))[:, 1]
+    return model.predict_proba(X_test)[:, 1]
+
+
+def log_params(model: XGBClassifier, features: list, run_logger: BaseLogger = None):
     """
     Log model parameters and feature information.
 
     Args:
         model (XGBClassifier): The trained XGBoost classifier.
         features (list): List of features used in the model.
+        run_logger (BaseLogger): Logger to use, the default logger if None.
 
     Returns:
         None
     """
-    logger.log_params({"model_class": type(model).__name__})
+    run_logger = run_logger or get_default_logger()
+    run_logger.log_params({"model_class": type(model).__name__})
     model_params = model.get_params()
     for arg, value in model_params.items():
-        logger.log_params({arg: value})
-    logger.log_params({"features": features})
+        run_logger.log_params({arg: value})
+    run_logger.log_params({"features": features})
 
 
-def log_metrics(**metrics: dict):
+def log_metrics(run_logger: BaseLogger = None, **metrics: dict):
     """
     Log evaluation metrics.
 
     Args:
+        run_logger (BaseLogger): Logger to use, the default logger if None.
         **metrics (dict): Named evaluation metrics and their values.
 
     Returns:
         None
     """
-    logger.log_metrics(metrics)
+    (run_logger or get_default_logger()).log_metrics(metrics)
 
 
 @hydra.main(version_base=None, config_path="../config", config_name="main")
+@instrument.stage
 def evaluate(config: DictConfig):
     """
     Evaluate the performance of a model using provided test data.
 
-    This function initializes the MLflow tracking URI and experiment, loads test data and the model,
-    generates predictions, calculates evaluation metrics (F1 score and accuracy), and logs the metrics
-    and model to MLflow.
+    This function initializes the MLflow tracking URI and experiment, loads test
+    data and the model, generates predictions, calculates evaluation metrics (F1
+    score, accuracy, AUC, sensitivity, specificity and calibration) with bootstrap
+    confidence intervals, and logs the metrics and model to MLflow.
 
     Args:
         config (DictConfig): The loaded configuration object.
@@ -110,28 +161,59 @@ def evaluate(config: DictConfig):
     mlflow.set_tracking_uri(config.mlflow_tracking_ui)
     mlflow.set_experiment("clinical-cancer")
 
-    with mlflow.start_run():
+    # The logger is closed first, so its buffers are flushed before the run ends
+    with mlflow.start_run(), get_logger(config.tracking) as run_logger:
         # Load data and model
         X_test, y_test = load_data(config.processed)
-        model = load_model(abspath(config.model.path))
+        model = load_model(
+            abspath(config.model.path), config.inference.engine, config.model.format
+        )
 
         # Get predictions
         prediction = predict(model, X_test)
+        probability = predict_proba(model, X_test)
 
         # Get metrics
-        f1 = f1_score(y_test, prediction)
+        results = evaluate_metrics(
+            y_test,
+            prediction,
+            probability,
+            config.evaluate.bootstrap,
+            config.evaluate.confidence,
+            config.evaluate.calibration_bins,
+            config.evaluate.seed,
+        )
+        f1, accuracy = results["f1"]["value"], results["accuracy"]["value"]
         print(f"F1 Score of this model is {f1}.")
-
-        accuracy = accuracy_score(y_test, prediction)
         print(f"Accuracy Score of this model is {accuracy}.")
-
-        # Log metrics
-        log_params(model, config.process.features)
-        log_metrics(f1_score=f1, accuracy_score=accuracy)
-
-        mlflow.sklearn.log_model(model, "model")
-        mlflow.log_metric("f1-score", f1)
-        mlflow.log_metric("accuracy", accuracy)
+        print(f"Metrics with {config.evaluate.confidence:.0%} confidence intervals:")
+        for name, result in results.items():
+            print(
+                f"  {name:<12} {result['value']:.4f} "
+                f"[{result['low']:.4f}, {result['high']:.4f}]"
+            )
+
+        # Log metrics, each with its confidence interval
+        metrics = {}
+        for name, result in results.items():
+            metrics[name] = result["value"]
+            metrics[f"{name}_low"] = result["low"]
+            metrics[f"{name}_high"] = result["high"]
+        log_params(model, config.process.features, run_logger)
+        log_metrics(run_logger, **metrics)
+        curve = get_calibration_curve(
+            y_test.values.ravel(), probability, config.evaluate.calibration_bins
+        )
+        mlflow.log_dict(
+            {key: value.tolist() for key, value in curve.items()}, "calibration.json"
+        )
+
+        if isinstance(model, NativeModel):
+            mlflow.xgboost.log_model(model.booster, "model")
+        elif isinstance(model, TreePredictor):
+            mlflow.log_artifact(abspath(config.model.path), "model")
+        else:
+            mlflow.sklearn.log_model(model, "model")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+import hashlib
+
+from omegaconf import DictConfig, OmegaConf
+
+"""
+This script computes content fingerprints of files and configurations.
+"""
+
+
+def file_digest(path: str, block_size: int = 1 << 20):
+    """
+    Compute the SHA-256 digest of a file's content.
+
+    Args:
+        path (str): Path to the file.
+        block_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_digest(config: DictConfig, exclude: tuple = ()):
+    """
+    Compute the SHA-256 digest of a resolved configuration.
+
+    Args:
+        config (DictConfig): Configuration to fingerprint.
+        exclude (tuple): Top-level keys left out of the fingerprint.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    container = OmegaConf.to_container(config, resolve=True)
+    container = {key: value for key, value in container.items() if key not in exclude}
+    text = OmegaConf.to_yaml(OmegaConf.create(container), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def fingerprint(*digests: str):
+    """
+    Combine several digests into a single fingerprint.
+
+    Args:
+        *digests (str): Digests to combine, order matters.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    return hashlib.sha256("\n".join(digests).encode()).hexdigest()
@@ -1,5 +1,16 @@
+import atexit
+import threading
+import time
+
 import mlflow
 from dagshub import DAGsHubLogger
+from mlflow.entities import Metric, Param
+from mlflow.tracking import MlflowClient
+from omegaconf import DictConfig
+
+# Limits of one MlflowClient.log_batch call
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_METRICS = 1000
 
 
 class BaseLogger:
@@ -21,19 +32,20 @@ class BaseLogger:
         """
         self.logger = DAGsHubLogger()
 
-    def log_metrics(self, metrics: dict):
+    def log_metrics(self, metrics: dict, step: int = None):
         """
         Log metrics using MLflow and DAGsHubLogger.
 
         Args:
             metrics (dict): A dictionary of named metrics and their values.
+            step (int): Step of the metrics, e.g. the trial of a search.
 
         Returns:
             None
         """
-        mlflow.log_metrics(metrics)
+        mlflow.log_metrics(metrics, step=step)
         print("Logging metrics...")
-        self.logger.log_metrics(metrics)
+        self.logger.log_metrics(metrics, step_num=step or 1)
 
     def log_params(self, params: dict):
         """
@@ -48,3 +60,229 @@ class BaseLogger:
         mlflow.log_params(params)
         print("Logging parameters...")
         self.logger.log_hyperparams(params)
+
+    def close(self):
+        """
+        Finish logging, every call is already written.
+
+        Returns:
+            None
+        """
+
+    def __enter__(self):
+        """
+        Enter the logger context.
+
+        Returns:
+            BaseLogger: This logger.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the logger when leaving the context.
+
+        Returns:
+            None
+        """
+        self.close()
+
+
+class BufferedLogger(BaseLogger):
+    """
+    Buffer metrics and parameters in memory and log them in batches.
+
+    Logging calls only append to the buffers. A background thread flushes
+    them every `flush_interval` seconds with one `MlflowClient.log_batch`
+    call per run, and they are flushed again when the logger is closed, when
+    its context exits, also on exceptions, and when the interpreter exits.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, dagshub: bool = True):
+        """
+        Initialize the logger and start its flushing thread.
+
+        Args:
+            flush_interval (float): Seconds between background flushes.
+            dagshub (bool): Whether to also write the DAGsHub metrics and
+                parameter files.
+
+        Returns:
+            None
+        """
+        self.logger = DAGsHubLogger(eager_logging=False) if dagshub else None
+        self.client = MlflowClient()
+        self.flush_interval = flush_interval
+        self.error = None
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _get_buffer(self):
+        """
+        Get the buffer of the active run.
+
+        Returns:
+            dict: Buffered parameters and metrics of the run.
+
+        Raises:
+            RuntimeError: If there is no active run to log to.
+        """
+        run = mlflow.active_run()
+        if run is None:
+            raise RuntimeError("No active MLflow run, start one before logging")
+        return self._buffers.setdefault(run.info.run_id, {"params": {}, "metrics": []})
+
+    def log_metrics(self, metrics: dict, step: int = None):
+        """
+        Buffer metrics of the active run.
+
+        Args:
+            metrics (dict): A dictionary of named metrics and their values.
+            step (int): Step of the metrics, e.g. the trial of a search.
+
+        Returns:
+            None
+        """
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            self._get_buffer()["metrics"].extend(
+                Metric(key, float(value), timestamp, step or 0)
+                for key, value in metrics.items()
+            )
+        if self.logger is not None:
+            self.logger.log_metrics(metrics, step_num=step or 1)
+
+    def log_params(self, params: dict):
+        """
+        Buffer parameters of the active run.
+
+        Args:
+            params (dict): A dictionary of named parameters and their values.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._get_buffer()["params"].update(params)
+        if self.logger is not None:
+            self.logger.log_hyperparams(params)
+
+    def flush(self):
+        """
+        Log the buffered metrics and parameters with the MLflow batch API.
+
+        Returns:
+            None
+        """
+        with self._flush_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+            try:
+                for run_id, buffer in buffers.items():
+                    params = buffer["params"]
+                    while params:
+                        keys = list(params)[:MAX_BATCH_PARAMS]
+                        self.client.log_batch(
+                            run_id,
+                            params=[Param(key, str(params[key])) for key in keys],
+                        )
+                        for key in keys:
+                            del params[key]
+                    metrics = buffer["metrics"]
+                    while metrics:
+                        self.client.log_batch(
+                            run_id, metrics=metrics[:MAX_BATCH_METRICS]
+                        )
+                        del metrics[:MAX_BATCH_METRICS]
+            finally:
+                self._requeue(buffers)
+            if self.logger is not None and buffers:
+                self.logger.save()
+
+    def _requeue(self, buffers: dict):
+        """
+        Put the entries a failed flush did not log back in the buffers.
+
+        Args:
+            buffers (dict): Buffers taken by the flush, without the logged
+                entries.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for run_id, buffer in buffers.items():
+                if not buffer["params"] and not buffer["metrics"]:
+                    continue
+                # Entries buffered during the flush are newer
+                newer = self._buffers.get(run_id, {"params": {}, "metrics": []})
+                buffer["params"].update(newer["params"])
+                buffer["metrics"].extend(newer["metrics"])
+                self._buffers[run_id] = buffer
+
+    def _run(self):
+        """
+        Flush the buffers periodically until the logger is closed.
+
+        Returns:
+            None
+        """
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as error:
+                # The entries stay buffered for the next flush
+                self.error = error
+
+    def close(self):
+        """
+        Stop the flushing thread and flush what is left in the buffers.
+
+        Returns:
+            None
+
+        Raises:
+            Exception: If the final flush fails, the entries it did not log
+                are kept in the buffers.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        atexit.unregister(self.close)
+        self.flush()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Close the logger when leaving the context, without hiding an exception
+        raised in it.
+
+        Returns:
+            None
+        """
+        try:
+            self.close()
+        except Exception as error:
+            if exc_type is None:
+                raise
+            print(f"Could not flush the buffered logs: {error!r}")
+
+
+def get_logger(tracking: DictConfig):
+    """
+    Create the experiment logger from the configuration.
+
+    Args:
+        tracking (DictConfig): Tracking configuration.
+
+    Returns:
+        BaseLogger: Buffered logger if enabled, otherwise a synchronous one.
+    """
+    if tracking.buffered:
+        return BufferedLogger(tracking.flush_interval)
+    return BaseLogger()
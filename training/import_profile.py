@@ -0,0 +1,106 @@
+import builtins
+import sys
+import time
+
+"""
+This script measures the time spent importing modules.
+"""
+
+
+class ImportProfiler:
+    """
+    Record the import time of every module first imported while active.
+
+    `builtins.__import__` is wrapped, so every import statement of the
+    imported modules is timed as well. The cumulative time of a module
+    includes its dependencies, its own time excludes the modules it imports.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty profile.
+
+        Returns:
+            None
+        """
+        self.records = []
+        self._stack = []
+        self._import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Import a module, timing it if it is not loaded yet.
+
+        Args:
+            name (str): Name of the module.
+            globals (dict): Globals of the importing module.
+            locals (dict): Locals of the importing module.
+            fromlist (tuple): Names imported from the module.
+            level (int): Level of a relative import.
+
+        Returns:
+            module: The imported module.
+        """
+        # Relative imports are counted in the module importing them
+        if level or name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += cumulative
+            self.records.append(
+                {
+                    "module": name,
+                    "self_s": cumulative - children,
+                    "cumulative_s": cumulative,
+                    "depth": len(self._stack),
+                }
+            )
+
+    def __enter__(self):
+        """
+        Start timing imports.
+
+        Returns:
+            ImportProfiler: This profiler.
+        """
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Stop timing imports.
+
+        Returns:
+            None
+        """
+        builtins.__import__ = self._import
+
+    def report(self, top: int = 15):
+        """
+        Format the modules with the largest cumulative import time.
+
+        Args:
+            top (int): Number of modules to report.
+
+        Returns:
+            str: Table of the self and cumulative time of each module.
+        """
+        total = sum(r["cumulative_s"] for r in self.records if r["depth"] == 0)
+        records = sorted(self.records, key=lambda r: r["cumulative_s"], reverse=True)
+        lines = [f"Imported {len(self.records)} modules in {total * 1000:.0f} ms"]
+        lines.append(f"{'module':<40}{'self_ms':>10}{'cumulative_ms':>15}")
+        for record in records[:top]:
+            lines.append(
+                f"{record['module']:<40}"
+                f"{record['self_s'] * 1000:>10.1f}"
+                f"{record['cumulative_s'] * 1000:>15.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,279 @@
+import functools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+from hydra.utils import to_absolute_path as abspath
+from omegaconf import DictConfig
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+"""
+This script records the time, memory and row counts of the pipeline steps.
+"""
+
+# Recorder of the process, None while instrumentation is disabled
+_recorder = None
+
+# Peak resident memory of the running steps, the innermost last
+_peaks = []
+
+
+def get_process_peak_rss():
+    """
+    Get the peak resident memory of the process since it started.
+
+    Returns:
+        float: Peak resident set size in MB, None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident memory of the process to its current usage.
+
+    Only Linux can reset it, through /proc/self/clear_refs.
+
+    Returns:
+        bool: Whether the peak was reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def get_peak_rss():
+    """
+    Get the peak resident memory of the process since it was last reset.
+
+    Returns:
+        float: Peak resident set size in MB, None where it is not available.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+def count_rows(value):
+    """
+    Count the rows of a step input or output.
+
+    Args:
+        value: Argument or result of a step, a tuple counts its first item.
+
+    Returns:
+        int: Number of rows, None if the value holds no rows.
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    return None
+
+
+class Recorder:
+    """
+    Write one JSON record per step to a file and log it to the active MLflow run.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize a recorder appending to the given file.
+
+        Args:
+            path (str): Path of the JSON lines file.
+
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.run = uuid4().hex
+        self.stages = []
+        self.counts = defaultdict(int)
+
+    def record(self, name: str, **values):
+        """
+        Write a record and log its numeric values as MLflow metrics.
+
+        Args:
+            name (str): Name of the step.
+            **values: Measures of the step.
+
+        Returns:
+            dict: The record.
+        """
+        record = {
+            "run": self.run,
+            "time": datetime.now(timezone.utc).isoformat(),
+            "stage": self.stages[-1] if self.stages else None,
+            "step": name,
+            **values,
+        }
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record, default=str) + "\n")
+
+        # A run can only be active if MLflow was imported by the stage
+        mlflow = sys.modules.get("mlflow")
+        if mlflow is not None and mlflow.active_run() is not None:
+            metrics = {
+                f"{name}.{key}": value
+                for key, value in values.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+            mlflow.log_metrics(metrics, step=self.counts[name])
+        self.counts[name] += 1
+        return record
+
+
+def configure(instrumentation: DictConfig):
+    """
+    Enable or disable the instrumentation from the configuration.
+
+    Args:
+        instrumentation (DictConfig): Instrumentation configuration.
+
+    Returns:
+        None
+    """
+    global _recorder
+    if not instrumentation.enabled:
+        _recorder = None
+    elif _recorder is None or _recorder.path != abspath(instrumentation.path):
+        _recorder = Recorder(abspath(instrumentation.path))
+
+
+def record(name: str, **values):
+    """
+    Record measures of a step, does nothing while disabled.
+
+    Args:
+        name (str): Name of the step.
+        **values: Measures of the step.
+
+    Returns:
+        None
+    """
+    if _recorder is not None:
+        _recorder.record(name, **values)
+
+
+def measure(name: str, function, args: tuple, kwargs: dict):
+    """
+    Run a step and record its wall and CPU time, peak memory and rows.
+
+    The peak memory of the step, `peak_rss_mb`, is measured by resetting the
+    peak of the process before it runs. Nested steps reset it again, so their
+    peaks are carried to the enclosing step. Where the peak cannot be reset,
+    the peak of the process since it started is recorded instead, as
+    `process_peak_rss_mb`.
+
+    Args:
+        name (str): Name of the step.
+        function (Callable): Function of the step.
+        args (tuple): Positional arguments, the first one holding rows counts
+            the rows in.
+        kwargs (dict): Keyword arguments.
+
+    Returns:
+        object: Result of the function.
+    """
+    rows_in = next((n for n in map(count_rows, args) if n is not None), None)
+    _peaks.append(0.0 if reset_peak_rss() else None)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = _peaks.pop()
+        if peak is not None:
+            peak = max(peak, get_peak_rss() or 0.0)
+            if _peaks and _peaks[-1] is not None:
+                _peaks[-1] = max(_peaks[-1], peak)
+    if peak is not None:
+        memory = {"peak_rss_mb": peak}
+    else:
+        memory = {"process_peak_rss_mb": get_process_peak_rss()}
+    _recorder.record(
+        name,
+        wall_s=wall,
+        cpu_s=cpu,
+        **memory,
+        rows_in=rows_in,
+        rows_out=count_rows(result),
+    )
+    return result
+
+
+def step(function):
+    """
+    Instrument a pipeline step.
+
+    While disabled the step is called directly, with no measure taken.
+
+    Args:
+        function (Callable): Function of the step.
+
+    Returns:
+        Callable: The instrumented function.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        """Call the step, measuring it while instrumentation is enabled."""
+        if _recorder is None:
+            return function(*args, **kwargs)
+        return measure(function.__name__, function, args, kwargs)
+
+    return wrapper
+
+
+def stage(function):
+    """
+    Instrument a pipeline stage taking the configuration as first argument.
+
+    The stage enables or disables the instrumentation from its configuration,
+    and its steps are recorded with the name of the stage.
+
+    Args:
+        function (Callable): Function of the stage.
+
+    Returns:
+        Callable: The instrumented function.
+    """
+
+    @functools.wraps(function)
+    def wrapper(config: DictConfig, *args, **kwargs):
+        """Configure the instrumentation and call the stage."""
+        configure(config.instrumentation)
+        if _recorder is None:
+            return function(config, *args, **kwargs)
+        _recorder.stages.append(function.__name__)
+        try:
+            return measure(function.__name__, function, (config, *args), kwargs)
+        finally:
+            _recorder.stages.pop()
+
+    return wrapper
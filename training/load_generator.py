@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+import urllib.request
+
+import hydra
+import numpy as np
+import pandas as pd
+from hydra.utils import to_absolute_path as abspath
+from omegaconf import DictConfig
+
+"""
+This script sends concurrent scoring requests to the local scoring service.
+"""
+
+
+def get_records(raw_path: str, sep: str, features: list, n_records: int):
+    """
+    Load raw clinical records to send to the service.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        sep (str): Delimiter used in the CSV file.
+        features (list): List of selected feature names.
+        n_records (int): Number of records to load.
+
+    Returns:
+        list: Records with the raw features of each patient.
+    """
+    data = pd.read_csv(raw_path, sep=sep, usecols=list(features), nrows=n_records)
+    data = data.dropna()
+    return json.loads(data.to_json(orient="records"))
+
+
+def send(url: str, record: dict):
+    """
+    Send one record to the scoring service.
+
+    Args:
+        url (str): URL of the predict endpoint.
+        record (dict): Raw features of a patient.
+
+    Returns:
+        float: Latency of the request in seconds.
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(record).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_load(url: str, records: list, n_requests: int, concurrency: int):
+    """
+    Send requests from concurrent clients, one record per request.
+
+    Args:
+        url (str): URL of the predict endpoint.
+        records (list): Records the requests cycle through.
+        n_requests (int): Total number of requests.
+        concurrency (int): Number of concurrent clients.
+
+    Returns:
+        dict: p50 and p99 latency in milliseconds, throughput and errors.
+    """
+    latencies, errors = [], []
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def client():
+        """
+        Send requests until the total is reached.
+
+        Returns:
+            None
+        """
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            try:
+                latency = send(url, records[i % len(records)])
+            except OSError as error:
+                errors.append(error)
+                continue
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="main")
+def load_test(config: DictConfig):
+    """
+    Measure the latency and throughput of the scoring service running on localhost.
+
+    Args:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        None
+    """
+    base_url = f"http://{config.serve.host}:{config.serve.port}"
+    records = get_records(
+        abspath(config.raw.path),
+        config.process.sep,
+        config.process.features,
+        config.serve.load_test.records,
+    )
+    client = run_load(
+        f"{base_url}/predict",
+        records,
+        config.serve.load_test.requests,
+        config.serve.load_test.concurrency,
+    )
+    print("Client:", json.dumps(client))
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        print("Server:", response.read().decode())
+
+
+if __name__ == "__main__":
+    load_test()
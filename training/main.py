@@ -1,10 +1,42 @@
 import hydra
-from evaluate_model import evaluate
-from process import process_data
-from train_model import train
+from import_profile import ImportProfiler
+from stage_cache import run_stage
 
 """Call the config file"""
 
+# Module and function of each stage, imported only when the stage runs, so a
+# stage does not pay for the dependencies of the others
+STAGES = {
+    "process": ("process", "process_data"),
+    "train": ("train_model", "train"),
+    "evaluate": ("evaluate_model", "evaluate"),
+    "score": ("score", "score"),
+}
+
+
+def get_stage(stage: str, import_report: bool = False):
+    """
+    Import the function running a stage.
+
+    Args:
+        stage (str): Name of the stage.
+        import_report (bool): Whether to print the modules the import took
+            the longest on.
+
+    Returns:
+        Callable: Function running the stage on the configuration.
+    """
+    module, function = STAGES[stage]
+    if not import_report:
+        return getattr(__import__(module), function)
+
+    # The profiler wraps __import__, so the stage module itself is timed too
+    with ImportProfiler() as profiler:
+        run = getattr(__import__(module), function)
+    print(f"Stage '{stage}' imports:")
+    print(profiler.report())
+    return run
+
 
 @hydra.main(version_base=None, config_path="../config", config_name="main")
 def main(config):
@@ -12,7 +44,9 @@ def main(config):
     Execute the main function using the specified configuration.
 
     This function is the entry point of the program. It uses the Hydra framework to load
-    the main configuration file and executes the 'process_data' function.
+    the main configuration file and executes the stages listed in 'pipeline.stages'.
+    Stages whose input files and configuration are unchanged since a previous run are
+    restored from the stage cache instead of being run again.
 
     Args:
         config: The loaded configuration object.
@@ -20,9 +54,8 @@ def main(config):
     Returns:
         None
     """
-    process_data(config)
-    # train(config)
-    # evaluate(config)
+    for stage in config.pipeline.stages:
+        run_stage(stage, get_stage(stage, config.pipeline.import_report), config)
 
 
 if __name__ == "__main__":
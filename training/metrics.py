@@ -0,0 +1,243 @@
+import numpy as np
+
+"""
+This script computes classification metrics and their bootstrap confidence intervals.
+"""
+
+
+def divide(numerator: np.ndarray, denominator: np.ndarray):
+    """
+    Divide element-wise, with NaN where the denominator is zero.
+
+    Args:
+        numerator (np.ndarray): Numerators.
+        denominator (np.ndarray): Denominators.
+
+    Returns:
+        np.ndarray: Ratios.
+    """
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=np.float64), denominator
+    )
+    out = np.full(numerator.shape, np.nan)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+
+def get_confusion(y_true: np.ndarray, y_pred: np.ndarray, weights: np.ndarray):
+    """
+    Compute weighted confusion matrices, one per row of weights.
+
+    Args:
+        y_true (np.ndarray): True labels, 0 or 1.
+        y_pred (np.ndarray): Predicted labels, 0 or 1.
+        weights (np.ndarray): Weight of each sample, of shape (n_samples,) or
+            (n_replicates, n_samples).
+
+    Returns:
+        np.ndarray: Confusion matrices [[tn, fp], [fn, tp]], of shape (2, 2)
+            or (n_replicates, 2, 2).
+    """
+    y_true, y_pred = y_true.astype(bool), y_pred.astype(bool)
+    cells = np.stack(
+        [~y_true & ~y_pred, ~y_true & y_pred, y_true & ~y_pred, y_true & y_pred],
+        axis=1,
+    )
+    return (weights @ cells).reshape(*weights.shape[:-1], 2, 2)
+
+
+def get_confusion_metrics(confusion: np.ndarray):
+    """
+    Derive the threshold metrics from confusion matrices.
+
+    Args:
+        confusion (np.ndarray): Confusion matrices [[tn, fp], [fn, tp]].
+
+    Returns:
+        dict: Accuracy, F1, precision, sensitivity and specificity of each
+            matrix.
+    """
+    tn, fp = confusion[..., 0, 0], confusion[..., 0, 1]
+    fn, tp = confusion[..., 1, 0], confusion[..., 1, 1]
+    return {
+        "accuracy": divide(tp + tn, tn + fp + fn + tp),
+        "f1": divide(2 * tp, 2 * tp + fp + fn),
+        "precision": divide(tp, tp + fp),
+        "sensitivity": divide(tp, tp + fn),
+        "specificity": divide(tn, tn + fp),
+    }
+
+
+def get_auc(y_true: np.ndarray, y_prob: np.ndarray, weights: np.ndarray):
+    """
+    Compute the weighted ROC AUC, one per row of weights.
+
+    The AUC is the probability that a positive scores above a negative, ties
+    counting half. Samples are sorted by score once, and the weights of the
+    positives and negatives are summed per distinct score.
+
+    Args:
+        y_true (np.ndarray): True labels, 0 or 1.
+        y_prob (np.ndarray): Predicted probabilities of the positive class.
+        weights (np.ndarray): Weight of each sample, of shape (n_samples,) or
+            (n_replicates, n_samples).
+
+    Returns:
+        np.ndarray: AUC of each row of weights, NaN without both classes.
+    """
+    order = np.argsort(y_prob, kind="stable")
+    scores, y_true = y_prob[order], y_true[order].astype(bool)
+    starts = np.flatnonzero(np.r_[True, scores[1:] != scores[:-1]])
+    weights = weights[..., order]
+    positives = np.add.reduceat(weights * y_true, starts, axis=-1)
+    negatives = np.add.reduceat(weights * ~y_true, starts, axis=-1)
+    below = np.cumsum(negatives, axis=-1) - negatives
+    pairs = positives.sum(axis=-1) * negatives.sum(axis=-1)
+    return divide((positives * (below + negatives / 2)).sum(axis=-1), pairs)
+
+
+def get_calibration(
+    y_true: np.ndarray, y_prob: np.ndarray, weights: np.ndarray, n_bins: int = 10
+):
+    """
+    Compute the Brier score and expected calibration error, one per row of weights.
+
+    Args:
+        y_true (np.ndarray): True labels, 0 or 1.
+        y_prob (np.ndarray): Predicted probabilities of the positive class.
+        weights (np.ndarray): Weight of each sample, of shape (n_samples,) or
+            (n_replicates, n_samples).
+        n_bins (int): Number of equal-width probability bins.
+
+    Returns:
+        dict: Brier score and expected calibration error (ECE).
+    """
+    total = weights.sum(axis=-1)
+    bins = np.minimum((y_prob * n_bins).astype(int), n_bins - 1)
+    one_hot = np.eye(n_bins)[bins]
+    gap = weights @ (one_hot * (y_prob - y_true)[:, None])
+    return {
+        "brier": divide(weights @ (y_prob - y_true) ** 2, total),
+        "ece": divide(np.abs(gap).sum(axis=-1), total),
+    }
+
+
+def get_calibration_curve(y_true: np.ndarray, y_prob: np.ndarray, n_bins: int = 10):
+    """
+    Compute the mean predicted and observed rate of each probability bin.
+
+    Args:
+        y_true (np.ndarray): True labels, 0 or 1.
+        y_prob (np.ndarray): Predicted probabilities of the positive class.
+        n_bins (int): Number of equal-width probability bins.
+
+    Returns:
+        dict: Number of samples, mean probability and positive rate per bin.
+    """
+    bins = np.minimum((y_prob * n_bins).astype(int), n_bins - 1)
+    count = np.bincount(bins, minlength=n_bins)
+    return {
+        "count": count,
+        "mean_probability": divide(np.bincount(bins, y_prob, n_bins), count),
+        "positive_rate": divide(np.bincount(bins, y_true, n_bins), count),
+    }
+
+
+def get_metrics(
+    y_true: np.ndarray,
+    y_pred: np.ndarray,
+    y_prob: np.ndarray,
+    weights: np.ndarray,
+    n_bins: int = 10,
+):
+    """
+    Compute every metric, one per row of weights.
+
+    Args:
+        y_true (np.ndarray): True labels, 0 or 1.
+        y_pred (np.ndarray): Predicted labels, 0 or 1.
+        y_prob (np.ndarray): Predicted probabilities of the positive class.
+        weights (np.ndarray): Weight of each sample, of shape (n_samples,) or
+            (n_replicates, n_samples).
+        n_bins (int): Number of calibration bins.
+
+    Returns:
+        dict: Confusion metrics, AUC, Brier score and ECE.
+    """
+    metrics = get_confusion_metrics(get_confusion(y_true, y_pred, weights))
+    metrics["auc"] = get_auc(y_true, y_prob, weights)
+    calibration = get_calibration(y_true, y_prob, weights, n_bins)
+    metrics["brier"], metrics["ece"] = calibration["brier"], calibration["ece"]
+    return metrics
+
+
+def get_bootstrap_weights(n_samples: int, n_replicates: int, rng: np.random.Generator):
+    """
+    Draw bootstrap resamples as the number of times each sample is drawn.
+
+    Args:
+        n_samples (int): Number of samples.
+        n_replicates (int): Number of resamples.
+        rng (np.random.Generator): Random generator.
+
+    Returns:
+        np.ndarray: Counts of shape (n_replicates, n_samples).
+    """
+    index = rng.integers(0, n_samples, (n_replicates, n_samples))
+    index += n_samples * np.arange(n_replicates)[:, None]
+    counts = np.bincount(index.ravel(), minlength=n_replicates * n_samples)
+    return counts.reshape(n_replicates, n_samples).astype(np.float64)
+
+
+def evaluate_metrics(
+    y_true,
+    y_pred,
+    y_prob,
+    n_replicates: int = 10000,
+    confidence: float = 0.95,
+    n_bins: int = 10,
+    seed: int = 0,
+    batch_size: int = 1000,
+):
+    """
+    Compute the metrics with percentile bootstrap confidence intervals.
+
+    Every resample is a row of sample counts, so a batch of resamples is
+    evaluated with matrix products instead of one call per resample.
+
+    Args:
+        y_true (array-like): True labels, 0 or 1.
+        y_pred (array-like): Predicted labels, 0 or 1.
+        y_prob (array-like): Predicted probabilities of the positive class.
+        n_replicates (int): Number of bootstrap resamples, 0 for none.
+        confidence (float): Coverage of the confidence intervals.
+        n_bins (int): Number of calibration bins.
+        seed (int): Seed of the resampling.
+        batch_size (int): Resamples evaluated at once, bounds the memory.
+
+    Returns:
+        dict: Value and lower and upper bounds of each metric.
+    """
+    y_true = np.asarray(y_true).ravel()
+    y_pred = np.asarray(y_pred).ravel()
+    y_prob = np.asarray(y_prob, dtype=np.float64).ravel()
+    values = get_metrics(y_true, y_pred, y_prob, np.ones(len(y_true)), n_bins)
+
+    rng = np.random.default_rng(seed)
+    replicates = {name: [] for name in values}
+    for start in range(0, n_replicates, batch_size):
+        weights = get_bootstrap_weights(
+            len(y_true), min(batch_size, n_replicates - start), rng
+        )
+        for name, value in get_metrics(y_true, y_pred, y_prob, weights, n_bins).items():
+            replicates[name].append(value)
+
+    alpha = (1 - confidence) / 2 * 100
+    results = {}
+    for name, value in values.items():
+        low = high = np.nan
+        if replicates[name]:
+            samples = np.concatenate(replicates[name])
+            if not np.isnan(samples).all():
+                low, high = np.nanpercentile(samples, [alpha, 100 - alpha])
+        results[name] = {"value": float(value), "low": float(low), "high": float(high)}
+    return results
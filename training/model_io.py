@@ -0,0 +1,295 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import xgboost as xgb
+from fingerprint import file_digest
+from tree_predictor import TreePredictor
+
+"""
+This script saves and loads models in the joblib or native XGBoost format.
+"""
+
+MODEL_FORMATS = ("joblib", "ubj", "json")
+
+ENGINES = ("xgboost", "numpy")
+
+
+def get_metadata_path(path: str):
+    """
+    Get the path of the metadata sidecar of a native model.
+
+    Args:
+        path (str): Path of the model.
+
+    Returns:
+        str: Path of the metadata file.
+    """
+    return f"{path}.meta.json"
+
+
+def get_train_state_path(path: str):
+    """
+    Get the path of the training state of a model, used to continue training it.
+
+    Args:
+        path (str): Path of the model.
+
+    Returns:
+        str: Path of the training state file.
+    """
+    return f"{path}.train.json"
+
+
+def save_model(
+    model,
+    path: str,
+    model_format: str = "joblib",
+    preprocessor_path: str = None,
+    threshold: float = 0.5,
+):
+    """
+    Save a trained classifier.
+
+    The joblib format pickles the whole scikit-learn wrapper. The native
+    formats save only the booster as UBJSON or JSON, independent of the
+    Python and XGBoost versions, with a metadata sidecar holding the feature
+    names, the decision threshold and a reference to the preprocessing.
+
+    Args:
+        model (XGBClassifier): Trained classifier.
+        path (str): Destination path.
+        model_format (str): One of `MODEL_FORMATS`.
+        preprocessor_path (str): Path of the preprocessing of the model.
+        threshold (float): Probability above which PCR is predicted.
+
+    Returns:
+        None
+    """
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(
+            f"Unsupported model format '{model_format}'. "
+            f"Expected one of {MODEL_FORMATS}."
+        )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    metadata_path = get_metadata_path(path)
+    if model_format == "joblib":
+        joblib.dump(model, path)
+        if os.path.exists(metadata_path):
+            os.remove(metadata_path)
+        return
+
+    booster = model.get_booster()
+    with open(path, "wb") as file:
+        file.write(booster.save_raw(raw_format=model_format))
+
+    metadata = {
+        "format": model_format,
+        "feature_names": booster.feature_names,
+        "threshold": threshold,
+        "best_iteration": (
+            booster.best_iteration if "best_iteration" in booster.attributes() else None
+        ),
+        "xgboost_version": xgb.__version__,
+        "params": {
+            key: value
+            for key, value in model.get_params().items()
+            if isinstance(value, (int, float, str, bool, type(None)))
+        },
+        "preprocessor": None,
+    }
+    if preprocessor_path is not None:
+        metadata["preprocessor"] = {
+            "path": os.path.relpath(preprocessor_path, os.path.dirname(path) or "."),
+            "sha256": file_digest(preprocessor_path),
+        }
+    with open(metadata_path, "w") as file:
+        json.dump(metadata, file, indent=2)
+
+
+def _load_booster(path: str):
+    """
+    Load a native booster.
+
+    Args:
+        path (str): Path of the native model.
+
+    Returns:
+        xgb.Booster: Loaded booster.
+    """
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+class NativeModel:
+    """
+    Predictor backed by a booster saved in the native XGBoost format.
+
+    It exposes the prediction interface of XGBClassifier used by evaluation,
+    scoring and serving, and predicts with `inplace_predict`, without
+    building a DMatrix.
+    """
+
+    def __init__(self, booster: xgb.Booster, metadata: dict):
+        """
+        Initialize the predictor.
+
+        Args:
+            booster (xgb.Booster): Trained booster.
+            metadata (dict): Metadata saved with the booster.
+
+        Returns:
+            None
+        """
+        self.booster = booster
+        self.metadata = metadata
+        self.threshold = metadata["threshold"]
+        self.feature_names_in_ = np.array(metadata["feature_names"])
+        self.classes_ = np.array([0, 1])
+        best_iteration = metadata["best_iteration"]
+        self.iteration_range = (
+            (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        )
+
+    def get_params(self):
+        """
+        Get the hyperparameters the model was trained with.
+
+        Returns:
+            dict: Hyperparameters.
+        """
+        return dict(self.metadata["params"])
+
+    def set_params(self, n_jobs: int = None):
+        """
+        Set the number of threads used for prediction.
+
+        Args:
+            n_jobs (int): Number of threads.
+
+        Returns:
+            NativeModel: This model.
+        """
+        if n_jobs is not None:
+            self.booster.set_param({"nthread": n_jobs})
+        return self
+
+    def check_features(self, X):
+        """
+        Check that the features are the ones the booster was trained on.
+
+        Frames must have the saved feature names in order, arrays the same
+        number of columns, since the booster does not validate them itself.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the features do not match the saved ones.
+        """
+        feature_names = self.metadata["feature_names"]
+        if hasattr(X, "columns") and feature_names is not None:
+            if list(X.columns) != list(feature_names):
+                raise ValueError(
+                    f"Features {list(X.columns)} do not match the model "
+                    f"features {feature_names}"
+                )
+        elif X.shape[1] != self.booster.num_features():
+            raise ValueError(
+                f"Expected {self.booster.num_features()} features, got {X.shape[1]}"
+            )
+
+    def predict_proba(self, X):
+        """
+        Predict the probability of each class.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features.
+
+        Returns:
+            np.ndarray: Probabilities of no PCR and PCR.
+        """
+        self.check_features(X)
+        probability = self.booster.inplace_predict(
+            X, iteration_range=self.iteration_range, validate_features=False
+        )
+        return np.column_stack([1 - probability, probability])
+
+    def predict(self, X):
+        """
+        Predict the PCR label.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features.
+
+        Returns:
+            np.ndarray: Predicted labels.
+        """
+        return (self.predict_proba(X)[:, 1] > self.threshold).astype(int)
+
+
+def get_decision_threshold(model):
+    """
+    Get the probability above which a loaded model predicts PCR.
+
+    Args:
+        model (XGBClassifier | NativeModel | TreePredictor): Loaded model.
+
+    Returns:
+        float: Decision threshold saved with the model, 0.5 for a classifier.
+    """
+    if isinstance(model, TreePredictor):
+        return model.decision_threshold
+    if isinstance(model, NativeModel):
+        return model.threshold
+    return 0.5
+
+
+def load_model(
+    path: str,
+    nthread: int = None,
+    engine: str = "xgboost",
+    model_format: str = None,
+):
+    """
+    Load a model saved with `save_model`.
+
+    Args:
+        path (str): Path of the model.
+        nthread (int): Number of prediction threads, unchanged if None.
+        engine (str): Inference engine, one of `ENGINES`. The numpy engine
+            compiles the trees into a `TreePredictor`.
+        model_format (str): One of `MODEL_FORMATS`, the native formats if
+            the metadata sidecar exists when None.
+
+    Returns:
+        XGBClassifier | NativeModel | TreePredictor: Loaded model.
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unsupported inference engine '{engine}'. Expected one of {ENGINES}."
+        )
+    metadata_path = get_metadata_path(path)
+    if model_format is None:
+        model_format = "ubj" if os.path.exists(metadata_path) else "joblib"
+    if model_format == "joblib":
+        model = joblib.load(path)
+    else:
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+        model = NativeModel(_load_booster(path), metadata)
+    if engine == "numpy":
+        if isinstance(model, NativeModel):
+            model = TreePredictor.from_booster(
+                model.booster, model.iteration_range, model.threshold
+            )
+        else:
+            model = TreePredictor.from_booster(model.get_booster())
+    if nthread is not None:
+        model.set_params(n_jobs=nthread)
+    return model
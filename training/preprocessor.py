@@ -0,0 +1,219 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+This script persists the fitted preprocessing and applies it to new patients.
+"""
+
+
+class Preprocessor:
+    """
+    Fitted preprocessing of the raw clinical features.
+
+    It holds the order of the model columns, the categories of the one-hot
+    encoded features and the valid ranges of the numeric features, and maps
+    raw records straight into a preallocated feature array through
+    precomputed category lookup tables.
+    """
+
+    def __init__(
+        self,
+        features: list,
+        categorical_features: list,
+        categories: list,
+        features_range: list,
+        sparse: bool = False,
+    ):
+        """
+        Initialize the preprocessing from its fitted state.
+
+        Args:
+            features (list): List of selected feature names, in input order.
+            categorical_features (list): List of categorical feature names.
+            categories (list): Categories of each categorical feature.
+            features_range (list): Valid range of numeric features, as
+                dictionaries with 'name', 'min' and 'max'.
+            sparse (bool): Whether the model was trained on sparse features,
+                where the one-hot zeros are absent, i.e. missing.
+
+        Returns:
+            None
+        """
+        self.features = list(features)
+        self.categorical_features = list(categorical_features)
+        self.categories = [list(values) for values in categories]
+        self.features_range = [dict(rule) for rule in features_range]
+        self.sparse = sparse
+        self.numeric_features = [
+            feature for feature in self.features if feature not in categorical_features
+        ]
+
+        # Same column order as process_categorical
+        self.columns = list(self.numeric_features)
+        self.lookup = {}
+        for feature, values in zip(self.categorical_features, self.categories):
+            self.lookup[feature] = {
+                value: len(self.columns) + i for i, value in enumerate(values)
+            }
+            self.columns.extend(f"{feature}_{value}" for value in values)
+        self.numeric_index = [self.columns.index(f) for f in self.numeric_features]
+        self.categorical_index = [
+            column for lookup in self.lookup.values() for column in lookup.values()
+        ]
+
+    @classmethod
+    def from_encoder(cls, encoder, features: list, features_range: list):
+        """
+        Build the preprocessing from a fitted one-hot encoder.
+
+        Args:
+            encoder (OneHotEncoder): Encoder fitted on the categorical features.
+            features (list): List of selected feature names.
+            features_range (list): Valid range of numeric features.
+
+        Returns:
+            Preprocessor: The fitted preprocessing.
+        """
+        return cls(
+            features,
+            list(encoder.feature_names_in_),
+            [values.tolist() for values in encoder.categories_],
+            features_range,
+            encoder.sparse_output,
+        )
+
+    def to_dict(self):
+        """
+        Serialize the fitted state.
+
+        Returns:
+            dict: JSON-serializable state.
+        """
+        return {
+            "features": self.features,
+            "categorical_features": self.categorical_features,
+            "categories": self.categories,
+            "features_range": self.features_range,
+            "columns": self.columns,
+            "sparse": self.sparse,
+        }
+
+    def save(self, path: str):
+        """
+        Save the fitted state as JSON.
+
+        Args:
+            path (str): Destination path.
+
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load a fitted state saved with `save`.
+
+        Args:
+            path (str): Path to the saved state.
+
+        Returns:
+            Preprocessor: The fitted preprocessing.
+        """
+        with open(path) as file:
+            state = json.load(file)
+        return cls(
+            state["features"],
+            state["categorical_features"],
+            state["categories"],
+            state["features_range"],
+            state.get("sparse", False),
+        )
+
+    def transform(self, data):
+        """
+        Encode raw features into a preallocated array in the model column order.
+
+        Missing numeric values become NaN and unknown categories leave all the
+        columns of their feature at zero. For sparse-trained models the
+        one-hot zeros are NaN instead, since XGBoost took the entries absent
+        from the CSR matrix as missing.
+
+        Args:
+            data (pd.DataFrame | list): Raw features, as a DataFrame or a list
+                of records.
+
+        Returns:
+            np.ndarray: Encoded features as float32.
+        """
+        if not isinstance(data, pd.DataFrame):
+            return self._transform_records(data)
+
+        X = self._allocate(len(data))
+        X[:, self.numeric_index] = data[self.numeric_features].to_numpy(
+            dtype=np.float32, na_value=np.nan
+        )
+        rows = np.arange(len(data))
+        for feature, values in zip(self.categorical_features, self.categories):
+            codes = pd.Categorical(data[feature], categories=values).codes
+            known = codes >= 0
+            X[rows[known], self.lookup[feature][values[0]] + codes[known]] = 1.0
+        return X
+
+    def _allocate(self, rows: int):
+        """
+        Allocate the encoded features of a batch, with no category set.
+
+        Args:
+            rows (int): Number of rows.
+
+        Returns:
+            np.ndarray: Encoded features as float32.
+        """
+        X = np.zeros((rows, len(self.columns)), dtype=np.float32)
+        if self.sparse:
+            X[:, self.categorical_index] = np.nan
+        return X
+
+    def _transform_records(self, records: list):
+        """
+        Encode a list of raw records, without building a DataFrame.
+
+        Args:
+            records (list): Records with the raw features of each patient.
+
+        Returns:
+            np.ndarray: Encoded features as float32.
+        """
+        X = self._allocate(len(records))
+        for i, record in enumerate(records):
+            for feature, column in zip(self.numeric_features, self.numeric_index):
+                value = record.get(feature)
+                X[i, column] = np.nan if value is None else value
+            for feature in self.categorical_features:
+                column = self.lookup[feature].get(record.get(feature))
+                if column is not None:
+                    X[i, column] = 1.0
+        return X
+
+    def in_range(self, X: np.ndarray):
+        """
+        Check the encoded rows against the valid ranges of the numeric features.
+
+        Args:
+            X (np.ndarray): Encoded features.
+
+        Returns:
+            np.ndarray: Boolean mask of the rows within every range.
+        """
+        valid = np.ones(len(X), dtype=bool)
+        for rule in self.features_range:
+            values = X[:, self.columns.index(rule["name"])]
+            valid &= (values >= rule["min"]) & (values <= rule["max"])
+        return valid
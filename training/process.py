@@ -1,15 +1,41 @@
+import glob
+import hashlib
+import io
+import json
+import os
+from contextlib import ExitStack
+from uuid import uuid4
+
 import hydra
+import instrument
+import numpy as np
 import pandas as pd
+from dedup import HashDeduplicator, hash_rows, load_hashes, save_hashes
 from hydra.utils import to_absolute_path as abspath
-from omegaconf import DictConfig
+from omegaconf import DictConfig, ListConfig, OmegaConf
+from preprocessor import Preprocessor
+from scipy import sparse
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder
+from storage import (
+    FrameWriter,
+    append_frame,
+    dense_to_csr,
+    get_format,
+    save_frame,
+)
 
 """
 This script processes raw data according to the provided configuration.
 """
 
+SPLITS = ("X_train", "X_test", "y_train", "y_test")
+
+# Bytes before the processed end of the raw file checked to detect rewrites
+TAIL_BYTES = 4096
 
+
+@instrument.step
 def get_data(raw_path: str, sep: str):
     """
     Load data from a CSV file.
@@ -25,6 +51,48 @@ def get_data(raw_path: str, sep: str):
     return data
 
 
+def get_data_chunks(raw_path: str, sep: str, chunksize: int):
+    """
+    Lazily load data from a CSV file in chunks.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        sep (str): Delimiter used in the CSV file.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        Iterator[pd.DataFrame]: Chunks of the loaded data.
+    """
+    return pd.read_csv(raw_path, sep=sep, chunksize=chunksize)
+
+
+def get_categories(raw_path: str, sep: str, categorical_features: list, chunksize: int):
+    """
+    Collect the sorted categories of each categorical feature in one pass.
+
+    Only the categorical columns are read, so memory is bounded by the chunk
+    size and the number of distinct categories.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        sep (str): Delimiter used in the CSV file.
+        categorical_features (list): List of categorical feature names.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        list: Sorted categories of each categorical feature.
+    """
+    categories = {feature: set() for feature in categorical_features}
+    chunks = pd.read_csv(
+        raw_path, sep=sep, usecols=list(categorical_features), chunksize=chunksize
+    )
+    for chunk in chunks:
+        for feature in categorical_features:
+            categories[feature].update(chunk[feature].dropna().unique())
+    return [sorted(categories[feature]) for feature in categorical_features]
+
+
+@instrument.step
 def process_null(data: pd.DataFrame):
     """
     Remove rows with null or missing values from the dataset.
@@ -38,19 +106,49 @@ def process_null(data: pd.DataFrame):
     return data.dropna(axis=0)
 
 
-def process_duplicate(data: pd.DataFrame):
+def get_deduplicator(deduplication: DictConfig, seen: list = None):
+    """
+    Create a hash-based deduplicator from the configuration.
+
+    Args:
+        deduplication (DictConfig): Configuration of the deduplication engine.
+        seen (list): Hashes of the rows processed by previous runs, see
+            `load_hashes`. Dropping their duplicates needs a hash-based
+            deduplicator, whatever the engine.
+
+    Returns:
+        HashDeduplicator: Deduplicator, or None for the pandas engine.
+    """
+    if deduplication.engine != "hash" and seen is None:
+        return None
+    spill_dir = deduplication.spill_dir
+    return HashDeduplicator(
+        max_memory_hashes=deduplication.max_memory_hashes,
+        spill_dir=abspath(spill_dir) if spill_dir else None,
+        max_runs=deduplication.max_runs,
+        seen=seen,
+    )
+
+
+@instrument.step
+def process_duplicate(data: pd.DataFrame, deduplicator: HashDeduplicator = None):
     """
     Remove duplicate rows from the dataset.
 
     Args:
         data (pd.DataFrame): Input data.
+        deduplicator (HashDeduplicator): Stateful deduplicator that also drops
+            rows seen in previous calls, `drop_duplicates` is used if None.
 
     Returns:
         pd.DataFrame: Data with duplicate rows removed.
     """
+    if deduplicator is not None:
+        return deduplicator.filter(data)
     return data.drop_duplicates(keep="first")
 
 
+@instrument.step
 def get_features(target: str, features: list, data: pd.DataFrame):
     """
     Extract target and selected features from the dataset.
@@ -68,59 +166,376 @@ def get_features(target: str, features: list, data: pd.DataFrame):
     return y, X
 
 
-def process_outliers(data: pd.DataFrame, features_range: DictConfig):
+def get_range_rules(features_range):
+    """
+    Normalize range rules to a list.
+
+    Args:
+        features_range (DictConfig | ListConfig | list): A single range rule
+            or a list of rules, each with 'name', 'min' and 'max'.
+
+    Returns:
+        list: List of range rules.
+    """
+    if features_range is None:
+        return []
+    if isinstance(features_range, (ListConfig, list)):
+        return list(features_range)
+    return [features_range]
+
+
+def get_range_mask(data: pd.DataFrame, rule: DictConfig):
+    """
+    Check which rows satisfy a range rule.
+
+    Args:
+        data (pd.DataFrame): Input data.
+        rule (DictConfig): Range rule with 'name', 'min' and 'max'.
+
+    Returns:
+        np.ndarray: Boolean mask of the rows within the range.
+    """
+    values = data[rule.name].to_numpy()
+    return (values >= rule.min) & (values <= rule.max)
+
+
+@instrument.step
+def process_outliers(data: pd.DataFrame, features_range):
     """
     Remove outliers from the dataset based on specified feature ranges.
 
     Args:
         data (pd.DataFrame): Input data.
-        features_range (DictConfig): Configuration for feature range checks.
+        features_range (DictConfig | ListConfig): Configuration for feature
+            range checks, a single rule or a list of rules.
 
     Returns:
         pd.DataFrame: Data with outliers removed.
     """
-    return data[
-        (data[features_range.name] <= features_range.max)
-        & (data[features_range.name] >= features_range.min)
-    ]
+    mask = np.ones(len(data), dtype=bool)
+    for rule in get_range_rules(features_range):
+        mask &= get_range_mask(data, rule)
+    return data[mask]
 
 
-def process_dtypes(X: pd.DataFrame):
+@instrument.step
+def process_clean(data: pd.DataFrame, columns: list, features_range):
     """
-    Process data types if needed (e.g., data type conversions).
+    Remove rows with nulls or out of range values with one combined mask.
+
+    The null and range checks are evaluated as boolean arrays and the data is
+    filtered once, instead of materializing a frame after each check. The
+    rows failing each check are reported.
+
+    Args:
+        data (pd.DataFrame): Input data.
+        columns (list): Columns that must not be null.
+        features_range (DictConfig | ListConfig): Range rules to check.
+
+    Returns:
+        pd.DataFrame: Clean data.
+    """
+    not_null = data[columns].notna().to_numpy().all(axis=1)
+    mask = not_null.copy()
+    dropped = [f"{len(data) - int(not_null.sum())} with nulls"]
+    for rule in get_range_rules(features_range):
+        in_range = get_range_mask(data, rule)
+        dropped.append(
+            f"{int((not_null & ~in_range).sum())} outside "
+            f"{rule.name} [{rule.min}, {rule.max}]"
+        )
+        mask &= in_range
+    print(f"Dropped {len(data) - int(mask.sum())} rows: {', '.join(dropped)}")
+    return data[mask]
+
+
+@instrument.step
+def process_cleaning(
+    data: pd.DataFrame, process: DictConfig, deduplicator: HashDeduplicator = None
+):
+    """
+    Remove null, out of range and duplicate rows with the configured engine.
+
+    The fused engine filters nulls in the selected columns and every range
+    rule with a single mask before deduplication, the chained engine runs
+    the null, duplicate and outlier steps one after the other.
+
+    Args:
+        data (pd.DataFrame): Input data.
+        process (DictConfig): Processing configuration.
+        deduplicator (HashDeduplicator): Stateful deduplicator, see
+            `process_duplicate`.
+
+    Returns:
+        pd.DataFrame: Clean data.
+    """
+    if process.cleaning.engine == "fused":
+        columns = [*process.features, process.target]
+        data = process_clean(data, columns, process.range_rules)
+        return process_duplicate(data, deduplicator)
+
+    data = process_null(data)
+
+    data = process_duplicate(data, deduplicator)
+
+    return process_outliers(data, process.range_rules)
+
+
+def get_memory_usage(data: pd.DataFrame):
+    """
+    Get the memory used by a DataFrame, including the strings it holds.
+
+    Args:
+        data (pd.DataFrame): Input data.
+
+    Returns:
+        int: Memory usage in bytes.
+    """
+    return int(data.memory_usage(deep=True).sum())
+
+
+def downcast_numeric(
+    values: pd.Series, float_dtype: str = "float32", value_range: tuple = None
+):
+    """
+    Downcast a numeric column to the narrowest dtype holding its values.
+
+    Integers are downcast to the smallest integer type that also holds the
+    declared range, so valid values seen later never overflow it. Floats are
+    only downcast when no value changes and the float dtype holds the range.
+
+    Args:
+        values (pd.Series): Numeric column.
+        float_dtype (str): Narrowest float dtype to downcast to.
+        value_range (tuple): Declared minimum and maximum of the column.
+
+    Returns:
+        pd.Series: Downcast column.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values
+    if pd.api.types.is_integer_dtype(values):
+        downcast = "unsigned" if values.min() >= 0 else "integer"
+        values = pd.to_numeric(values, downcast=downcast)
+        if value_range is not None:
+            dtype = np.result_type(values.dtype, *map(np.min_scalar_type, value_range))
+            values = values.astype(dtype)
+        return values
+    if value_range is not None and not holds_range(np.dtype(float_dtype), value_range):
+        return values
+    narrow = values.astype(float_dtype)
+    lossless = (narrow == values) | values.isna()
+    return narrow if lossless.all() else values
+
+
+def holds_range(dtype: np.dtype, value_range: tuple):
+    """
+    Check that a numeric dtype holds a declared range.
+
+    Args:
+        dtype (np.dtype): Numeric dtype.
+        value_range (tuple): Declared minimum and maximum.
+
+    Returns:
+        bool: Whether both bounds fit in the dtype.
+    """
+    limits = np.iinfo(dtype) if np.issubdtype(dtype, np.integer) else np.finfo(dtype)
+    return limits.min <= value_range[0] and value_range[1] <= limits.max
+
+
+def get_dtypes(
+    raw_path: str,
+    sep: str,
+    columns: list,
+    dtypes: DictConfig,
+    features_range,
+    chunksize: int,
+):
+    """
+    Find the compact dtype of each numeric column that holds all of its chunks.
+
+    Each chunk is downcast like `process_dtypes` and the dtypes of the chunks
+    are promoted to a common one, so casting any chunk to it is lossless.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        sep (str): Delimiter used in the CSV file.
+        columns (list): Names of the numeric columns.
+        dtypes (DictConfig): Configuration of the dtype compaction.
+        features_range (DictConfig | ListConfig): Declared ranges of the
+            numeric features, a single rule or a list of rules.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        dict: Compact dtype of each numeric column.
+    """
+    ranges = {
+        rule.name: (rule.min, rule.max) for rule in get_range_rules(features_range)
+    }
+    found = {}
+    chunks = pd.read_csv(raw_path, sep=sep, usecols=list(columns), chunksize=chunksize)
+    for chunk in chunks:
+        for column in columns:
+            values = chunk[column]
+            dtype = downcast_numeric(values, dtypes.float, ranges.get(column)).dtype
+            found[column] = np.result_type(found.get(column, dtype), dtype)
+    return found
+
+
+@instrument.step
+def process_dtypes(X: pd.DataFrame, dtypes: DictConfig, features_range=None):
+    """
+    Compact the data types of the data to reduce its memory usage.
+
+    Numeric columns are downcast to the narrowest dtype that keeps their
+    values and declared range, and string columns with few distinct values
+    are converted to categories. The compacted columns are then checked
+    against their declared ranges, the values outside them are reported per
+    column and left to the cleaning.
 
     Args:
         X (pd.DataFrame): Input features data.
+        dtypes (DictConfig): Configuration of the dtype compaction.
+        features_range (DictConfig | ListConfig): Declared ranges of the
+            numeric features, a single rule or a list of rules.
 
     Returns:
         pd.DataFrame: Processed feature data.
+
+    Raises:
+        ValueError: If a compacted column cannot hold its declared range.
     """
+    ranges = {
+        rule.name: (rule.min, rule.max) for rule in get_range_rules(features_range)
+    }
+
+    before = get_memory_usage(X)
+    X = X.copy()
+    for column in X.columns:
+        values = X[column]
+        if pd.api.types.is_numeric_dtype(values):
+            X[column] = downcast_numeric(values, dtypes.float, ranges.get(column))
+        elif pd.api.types.is_object_dtype(values):
+            if values.nunique() <= dtypes.max_categories:
+                X[column] = values.astype("category")
+    for rule in get_range_rules(features_range):
+        values = X.get(rule.name)
+        if (
+            values is None
+            or not pd.api.types.is_numeric_dtype(values)
+            or pd.api.types.is_bool_dtype(values)
+        ):
+            continue
+        if not holds_range(values.dtype, (rule.min, rule.max)):
+            raise ValueError(
+                f"Column '{rule.name}' compacted to {values.dtype} cannot hold "
+                f"its declared range [{rule.min}, {rule.max}]"
+            )
+        outside = int((values.notna() & ~get_range_mask(X, rule)).sum())
+        if outside:
+            print(
+                f"{rule.name}: {outside} values outside the declared range "
+                f"[{rule.min}, {rule.max}]"
+            )
+    after = get_memory_usage(X)
+    print(f"Memory usage: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
     return X
 
 
-def process_categorical(X: pd.DataFrame, categorical_features: list):
+def get_encoder(
+    X: pd.DataFrame,
+    categorical_features: list,
+    categories: list = None,
+    sparse_output: bool = False,
+):
+    """
+    Fit a one-hot encoder on the categorical features.
+
+    Args:
+        X (pd.DataFrame): Input features data.
+        categorical_features (list): List of categorical feature names.
+        categories (list): Categories of each categorical feature, inferred
+            from the data if not given.
+        sparse_output (bool): Whether the encoder outputs a CSR matrix.
+
+    Returns:
+        OneHotEncoder: Fitted encoder.
+    """
+    encoder = OneHotEncoder(
+        categories=categories or "auto", sparse_output=sparse_output
+    )
+    if not sparse_output:
+        encoder.set_output(transform="pandas")
+    return encoder.fit(X[categorical_features])
+
+
+def get_category_encoder(
+    categorical_features: list, categories: list, sparse_output: bool = False
+):
+    """
+    Fit a one-hot encoder on categories known up front.
+
+    Args:
+        categorical_features (list): List of categorical feature names.
+        categories (list): Categories of each categorical feature.
+        sparse_output (bool): Whether the encoder outputs a CSR matrix.
+
+    Returns:
+        OneHotEncoder: Fitted encoder.
+    """
+    # A single row is enough to fit on
+    X = pd.DataFrame(
+        [[values[0] for values in categories]], columns=list(categorical_features)
+    )
+    return get_encoder(X, categorical_features, categories, sparse_output)
+
+
+@instrument.step
+def process_categorical(
+    X: pd.DataFrame,
+    categorical_features: list,
+    categories: list = None,
+    encoder: OneHotEncoder = None,
+):
     """
     Encode categorical features using one-hot encoding.
 
+    With a sparse encoder the whole result stays sparse: the features are
+    returned as a DataFrame of sparse columns built from a CSR matrix. XGBoost
+    takes the entries absent from it as missing, so every numeric value is
+    stored, zeros included, and only the one-hot zeros are left out.
+
     Args:
         X (pd.DataFrame): Input features data.
         categorical_features (list): List of categorical feature names.
+        categories (list): Categories of each categorical feature, inferred
+            from the data if not given.
+        encoder (OneHotEncoder): Fitted encoder, fitted on X if not given.
 
     Returns:
         pd.DataFrame: Data with one-hot encoded categorical features.
     """
-    encoder = OneHotEncoder(sparse_output=False).set_output(transform="pandas")
-    categorical_encoded = encoder.fit_transform(X[categorical_features])
-    X = pd.concat(
-        [X.iloc[:, ~X.columns.isin(categorical_features)], categorical_encoded], axis=1
-    )
+    if encoder is None:
+        encoder = get_encoder(X, categorical_features, categories)
+    categorical_encoded = encoder.transform(X[categorical_features])
+    numeric = X.iloc[:, ~X.columns.isin(categorical_features)]
+    if encoder.sparse_output:
+        matrix = sparse.hstack(
+            [dense_to_csr(numeric.to_numpy(dtype=float)), categorical_encoded],
+            format="csr",
+        )
+        return pd.DataFrame.sparse.from_spmatrix(
+            matrix,
+            index=X.index,
+            columns=[*numeric.columns, *encoder.get_feature_names_out()],
+        )
+    X = pd.concat([numeric, categorical_encoded], axis=1)
     return X
 
 
-@hydra.main(version_base=None, config_path="../config", config_name="main")
-def process_data(config: DictConfig):
+def check_sparse_format(config: DictConfig):
     """
-    Process the raw data as per the configuration provided.
+    Check that sparse features are saved in a sparse-aware format.
 
     Args:
         config (DictConfig): Configuration parameters.
@@ -128,29 +543,436 @@ def process_data(config: DictConfig):
     Returns:
         None
     """
-    data = get_data(abspath(config.raw.path), config.process.sep)
+    for split in ("X_train", "X_test"):
+        path = config.processed[split].path
+        if config.process.sparse and get_format(path) != "npz":
+            raise ValueError(
+                f"Sparse features must be saved as npz, got {path}. "
+                "Set processed.features_format=npz."
+            )
 
-    data = process_null(data)
 
-    data = process_duplicate(data)
+def save_preprocessor(encoder: OneHotEncoder, config: DictConfig):
+    """
+    Persist the fitted preprocessing used at inference time.
+
+    Args:
+        encoder (OneHotEncoder): Encoder fitted on the categorical features.
+        config (DictConfig): Configuration parameters.
 
-    data = process_outliers(data, config.process.features_range)
+    Returns:
+        Preprocessor: The saved preprocessing.
+    """
+    range_rules = OmegaConf.to_container(config.process.range_rules, resolve=True)
+    preprocessor = Preprocessor.from_encoder(
+        encoder, list(config.process.features), range_rules
+    )
+    preprocessor.save(abspath(config.model.preprocessor.path))
+    return preprocessor
+
+
+def get_tail_digest(raw_path: str, offset: int):
+    """
+    Hash the end of the part of the raw file processed so far.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        offset (int): Number of bytes processed.
+
+    Returns:
+        str: SHA-256 of the `TAIL_BYTES` bytes before the offset.
+    """
+    start = max(0, offset - TAIL_BYTES)
+    with open(raw_path, "rb") as file:
+        file.seek(start)
+        return hashlib.sha256(file.read(offset - start)).hexdigest()
+
+
+def clear_incremental_state(directory: str):
+    """
+    Forget the rows processed by previous runs.
+
+    Args:
+        directory (str): Directory of the incremental state.
+
+    Returns:
+        None
+    """
+    paths = glob.glob(os.path.join(directory, "hashes-*.npy"))
+    for path in [os.path.join(directory, "state.json"), *paths]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def save_incremental_state(
+    directory: str,
+    raw_path: str,
+    offset: int,
+    columns: list,
+    hashes: np.ndarray,
+    generation: str,
+    features: list,
+):
+    """
+    Record the rows processed so far, for the next run to process only new ones.
+
+    The hashes of the new rows are saved first, the state is written last so
+    that an interrupted run leaves the previous state in place. The
+    generation identifies the splits, it changes whenever they are rebuilt
+    rather than appended to, so that training can tell which rows are new.
+
+    Args:
+        directory (str): Directory of the incremental state.
+        raw_path (str): Path to the raw data file.
+        offset (int): Number of bytes of the raw file processed.
+        columns (list): Columns of the raw file.
+        hashes (np.ndarray): Hashes of the rows kept by the run.
+        generation (str): Identifier of the splits.
+        features (list): Columns of the processed features.
+
+    Returns:
+        None
+    """
+    os.makedirs(directory, exist_ok=True)
+    save_hashes(hashes, directory)
+    state = {
+        "offset": offset,
+        "tail": get_tail_digest(raw_path, offset),
+        "columns": [str(column) for column in columns],
+        "generation": generation,
+        "features": [str(feature) for feature in features],
+    }
+    with open(os.path.join(directory, "state.json"), "w") as file:
+        json.dump(state, file, indent=2)
+
+
+def load_incremental_state(directory: str, raw_path: str):
+    """
+    Load the incremental state if the raw file was only appended to since.
+
+    Args:
+        directory (str): Directory of the incremental state.
+        raw_path (str): Path to the raw data file.
+
+    Returns:
+        dict: Offset, tail digest and columns of the processed part of the
+            raw file, generation and feature columns of the splits, None if
+            there is no valid state.
+    """
+    path = os.path.join(directory, "state.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        state = json.load(file)
+    # States written before the splits had a generation
+    if "generation" not in state:
+        return None
+    if os.path.getsize(raw_path) < state["offset"]:
+        return None
+    if get_tail_digest(raw_path, state["offset"]) != state["tail"]:
+        return None
+    return state
+
+
+def load_split_state(directory: str):
+    """
+    Load the generation and feature columns of the processed splits.
+
+    Args:
+        directory (str): Directory of the incremental state.
+
+    Returns:
+        dict: Generation and feature columns of the splits, None if they were
+            not processed incrementally.
+    """
+    path = os.path.join(directory, "state.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        state = json.load(file)
+    if "generation" not in state:
+        return None
+    return {"generation": state["generation"], "features": state["features"]}
+
+
+@instrument.step
+def get_appended_data(raw_path: str, sep: str, columns: list, offset: int):
+    """
+    Load the rows appended to a CSV file after an offset.
+
+    A last row without its line end is still being written, it is left for
+    the next run.
+
+    Args:
+        raw_path (str): Path to the raw data file.
+        sep (str): Delimiter used in the CSV file.
+        columns (list): Columns of the raw file.
+        offset (int): Number of bytes already processed.
+
+    Returns:
+        Tuple[pd.DataFrame, int]: Appended rows and the new offset.
+    """
+    with open(raw_path, "rb") as file:
+        file.seek(offset)
+        content = file.read()
+    end = content.rfind(b"\n") + 1
+    if end == 0:
+        return pd.DataFrame(columns=columns), offset
+    data = pd.read_csv(io.BytesIO(content[:end]), sep=sep, header=None, names=columns)
+    return data, offset + end
+
+
+def process_data_streaming(config: DictConfig):
+    """
+    Process the raw data chunk by chunk, writing the splits incrementally.
+
+    Null, outlier and duplicate removal, dtype compaction, feature selection
+    and encoding are applied to each chunk, and each row is assigned to the
+    test split with probability 0.2. Duplicates are removed across chunks
+    with a hash-based deduplicator. The numeric columns are compacted to
+    dtypes found in a first pass, so that every chunk is written with the
+    same lossless dtypes.
+
+    Args:
+        config (DictConfig): Configuration parameters.
+
+    Returns:
+        None
+    """
+    check_sparse_format(config)
+    raw_path = abspath(config.raw.path)
+    offset = os.path.getsize(raw_path)
+    chunksize = config.process.streaming.chunksize
+    categories = get_categories(
+        raw_path, config.process.sep, config.process.categorical_features, chunksize
+    )
+    encoder = get_category_encoder(
+        config.process.categorical_features, categories, config.process.sparse
+    )
+    column_dtypes = {}
+    if config.process.dtypes.enabled:
+        numeric = [
+            feature
+            for feature in config.process.features
+            if feature not in config.process.categorical_features
+        ]
+        column_dtypes = get_dtypes(
+            raw_path,
+            config.process.sep,
+            [*numeric, config.process.target],
+            config.process.dtypes,
+            config.process.range_rules,
+            chunksize,
+        )
+    rng = np.random.default_rng(7)
+    deduplicator = get_deduplicator(config.process.deduplication)
+    if deduplicator is None:
+        deduplicator = HashDeduplicator()
+
+    with ExitStack() as stack:
+        stack.callback(deduplicator.close)
+        writers = {
+            split: stack.enter_context(
+                FrameWriter(abspath(config.processed[split].path))
+            )
+            for split in SPLITS
+        }
+        for data in get_data_chunks(raw_path, config.process.sep, chunksize):
+            data = process_cleaning(data, config.process, deduplicator)
+            data = data.astype(column_dtypes)
+
+            y, X = get_features(config.process.target, config.process.features, data)
+
+            X = process_categorical(
+                X, config.process.categorical_features, encoder=encoder
+            )
+
+            is_test = rng.random(len(X)) < 0.2
+            writers["X_train"].write(X[~is_test])
+            writers["X_test"].write(X[is_test])
+            writers["y_train"].write(y[~is_test])
+            writers["y_test"].write(y[is_test])
+        hashes = deduplicator.get_hashes()
+
+    preprocessor = save_preprocessor(encoder, config)
+    if config.process.incremental.enabled:
+        columns = pd.read_csv(raw_path, sep=config.process.sep, nrows=0).columns
+        save_incremental_state(
+            abspath(config.process.incremental.dir),
+            raw_path,
+            offset,
+            columns,
+            hashes,
+            uuid4().hex,
+            preprocessor.columns,
+        )
+    print(f"Processed {writers['X_train'].rows + writers['X_test'].rows} rows")
+
+
+def process_data_incremental(config: DictConfig):
+    """
+    Process the rows appended to the raw data since the last run and append
+    them to the splits.
+
+    Rows already processed are dropped through the hashes saved by previous
+    runs, which are looked up through memory maps, and the new rows are
+    encoded with the saved preprocessing. Each row is assigned to the test
+    split with probability 0.2, so the cost of a run is proportional to the
+    number of appended rows.
+
+    Args:
+        config (DictConfig): Configuration parameters.
+
+    Returns:
+        bool: Whether the splits are up to date, False if the whole raw file
+            must be processed because there is no state, the raw file was
+            rewritten or new categories appeared.
+    """
+    check_sparse_format(config)
+    raw_path = abspath(config.raw.path)
+    directory = abspath(config.process.incremental.dir)
+    state = load_incremental_state(directory, raw_path)
+    if state is None:
+        print("No incremental state for the raw data, processing all of it")
+        return False
+
+    data, offset = get_appended_data(
+        raw_path, config.process.sep, state["columns"], state["offset"]
+    )
+    if data.empty:
+        print("No new rows to process")
+        return True
+
+    if config.process.dtypes.enabled:
+        data = process_dtypes(data, config.process.dtypes, config.process.range_rules)
+
+    deduplicator = get_deduplicator(
+        config.process.deduplication, load_hashes(directory)
+    )
+    data = process_cleaning(data, config.process, deduplicator)
+    hashes = deduplicator.get_hashes()
+    deduplicator.close()
+    if data.empty:
+        save_incremental_state(
+            directory,
+            raw_path,
+            offset,
+            state["columns"],
+            hashes,
+            state["generation"],
+            state["features"],
+        )
+        print("No new rows left after cleaning")
+        return True
+
+    y, X = get_features(config.process.target, config.process.features, data)
+
+    preprocessor = Preprocessor.load(abspath(config.model.preprocessor.path))
+    for feature, values in zip(
+        preprocessor.categorical_features, preprocessor.categories
+    ):
+        if not X[feature].isin(values).all():
+            print(f"New categories of {feature}, processing all the raw data")
+            return False
+    encoder = get_category_encoder(
+        preprocessor.categorical_features,
+        preprocessor.categories,
+        config.process.sparse,
+    )
+    X = process_categorical(X, config.process.categorical_features, encoder=encoder)
+
+    # Seeded by the offset, so that a run repeated on the same rows gives the
+    # same splits
+    is_test = np.random.default_rng(state["offset"]).random(len(X)) < 0.2
+    append_frame(X[~is_test], abspath(config.processed.X_train.path))
+    append_frame(X[is_test], abspath(config.processed.X_test.path))
+    append_frame(y[~is_test], abspath(config.processed.y_train.path))
+    append_frame(y[is_test], abspath(config.processed.y_test.path))
+
+    save_incremental_state(
+        directory,
+        raw_path,
+        offset,
+        state["columns"],
+        hashes,
+        state["generation"],
+        state["features"],
+    )
+    print(f"Processed {len(X)} new rows")
+    return True
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="main")
+@instrument.stage
+def process_data(config: DictConfig):
+    """
+    Process the raw data as per the configuration provided.
+
+    Args:
+        config (DictConfig): Configuration parameters.
+
+    Returns:
+        None
+    """
+    incremental = config.process.incremental
+    if incremental.enabled and process_data_incremental(config):
+        return
+    clear_incremental_state(abspath(incremental.dir))
+
+    if config.process.streaming.enabled:
+        process_data_streaming(config)
+        return
+
+    check_sparse_format(config)
+    raw_path = abspath(config.raw.path)
+    offset = os.path.getsize(raw_path)
+    data = get_data(raw_path, config.process.sep)
+    columns = list(data.columns)
+
+    if config.process.dtypes.enabled:
+        data = process_dtypes(data, config.process.dtypes, config.process.range_rules)
+
+    deduplicator = get_deduplicator(config.process.deduplication)
+    data = process_cleaning(data, config.process, deduplicator)
+    if incremental.enabled:
+        # Hashes of the rows kept, later runs drop their duplicates
+        if deduplicator is not None:
+            hashes = deduplicator.get_hashes()
+        else:
+            hashes = np.unique(hash_rows(data))
+    if deduplicator is not None:
+        deduplicator.close()
 
     print(data)
 
     y, X = get_features(config.process.target, config.process.features, data)
 
-    X = process_categorical(X, config.process.categorical_features)
+    encoder = get_encoder(
+        X, config.process.categorical_features, sparse_output=config.process.sparse
+    )
+    X = process_categorical(X, config.process.categorical_features, encoder=encoder)
+    preprocessor = save_preprocessor(encoder, config)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=7
     )
 
     # Save data
-    X_train.to_csv(abspath(config.processed.X_train.path), index=False)
-    X_test.to_csv(abspath(config.processed.X_test.path), index=False)
-    y_train.to_csv(abspath(config.processed.y_train.path), index=False)
-    y_test.to_csv(abspath(config.processed.y_test.path), index=False)
+    save_frame(X_train, abspath(config.processed.X_train.path))
+    save_frame(X_test, abspath(config.processed.X_test.path))
+    save_frame(y_train, abspath(config.processed.y_train.path))
+    save_frame(y_test, abspath(config.processed.y_test.path))
+
+    if incremental.enabled:
+        save_incremental_state(
+            abspath(incremental.dir),
+            raw_path,
+            offset,
+            columns,
+            hashes,
+            uuid4().hex,
+            preprocessor.columns,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import hydra
+import instrument
+import pandas as pd
+from hydra.utils import to_absolute_path as abspath
+from omegaconf import DictConfig
+from preprocessor import Preprocessor
+from storage import FrameWriter
+
+"""
+This script scores large raw clinical files in chunks across a pool of processes.
+"""
+
+# Model and preprocessing of a worker process
+_scorer = {}
+
+
+def get_chunks(path: str, sep: str, columns: list, chunksize: int):
+    """
+    Lazily read the selected columns of a CSV or Parquet file in chunks.
+
+    Args:
+        path (str): Path to the raw data file.
+        sep (str): Delimiter used in CSV files.
+        columns (list): Columns to read.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        Iterator[pd.DataFrame]: Chunks of the file.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunksize, columns=list(columns)
+        )
+        return (batch.to_pandas() for batch in batches)
+    return pd.read_csv(path, sep=sep, usecols=list(columns), chunksize=chunksize)
+
+
+def _init_score_worker(
+    model_path: str,
+    preprocessor_path: str,
+    nthread: int,
+    engine: str,
+    model_format: str,
+):
+    """
+    Load the model and preprocessing once in a worker process.
+
+    Args:
+        model_path (str): Path of the saved model.
+        preprocessor_path (str): Path of the saved preprocessing.
+        nthread (int): Number of threads of the model.
+        engine (str): Inference engine, xgboost or numpy.
+        model_format (str): Format of the saved model.
+
+    Returns:
+        None
+    """
+    # Imported here, only the workers need XGBoost
+    from model_io import get_decision_threshold, load_model
+
+    _scorer["model"] = load_model(model_path, nthread, engine, model_format)
+    _scorer["threshold"] = get_decision_threshold(_scorer["model"])
+    _scorer["preprocessor"] = Preprocessor.load(preprocessor_path)
+
+
+def _score_chunk(chunk: pd.DataFrame):
+    """
+    Score a chunk of raw records in a worker process.
+
+    Args:
+        chunk (pd.DataFrame): Raw features.
+
+    Returns:
+        pd.DataFrame: Predicted label, PCR probability and whether the
+            features are within their valid ranges, for each record.
+    """
+    X = _scorer["preprocessor"].transform(chunk)
+    probability = _scorer["model"].predict_proba(X)[:, 1]
+    return pd.DataFrame(
+        {
+            "pcr": (probability > _scorer["threshold"]).astype(int),
+            "probability": probability,
+            "in_range": _scorer["preprocessor"].in_range(X),
+        }
+    )
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    model_path: str,
+    preprocessor_path: str,
+    sep: str = ",",
+    chunksize: int = 100000,
+    n_workers: int = 4,
+    engine: str = "xgboost",
+    model_format: str = None,
+):
+    """
+    Score a raw clinical file, writing the predictions in input order.
+
+    Chunks are scored concurrently by worker processes that each hold one
+    loaded model. At most two chunks per worker are in flight, so memory is
+    bounded by the chunk size whatever the size of the file.
+
+    Args:
+        input_path (str): Path to the raw CSV or Parquet file.
+        output_path (str): Path of the predictions, its extension selects
+            the format.
+        model_path (str): Path of the saved model.
+        preprocessor_path (str): Path of the saved preprocessing.
+        sep (str): Delimiter used in CSV files.
+        chunksize (int): Number of rows per chunk.
+        n_workers (int): Number of worker processes.
+        engine (str): Inference engine, xgboost or numpy.
+        model_format (str): Format of the saved model, detected if None.
+
+    Returns:
+        int: Number of scored rows.
+    """
+    features = Preprocessor.load(preprocessor_path).features
+    nthread = max(1, (os.cpu_count() or 1) // n_workers)
+    pending = deque()
+    with ProcessPoolExecutor(
+        n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_score_worker,
+        initargs=(model_path, preprocessor_path, nthread, engine, model_format),
+    ) as pool, FrameWriter(output_path) as writer:
+        for chunk in get_chunks(input_path, sep, features, chunksize):
+            pending.append(pool.submit(_score_chunk, chunk))
+            if len(pending) >= 2 * n_workers:
+                writer.write(pending.popleft().result())
+        while pending:
+            writer.write(pending.popleft().result())
+    return writer.rows
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="main")
+@instrument.stage
+def score(config: DictConfig):
+    """
+    Score a raw clinical file with the saved model and preprocessing.
+
+    Args:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        None
+    """
+    output_path = abspath(config.score.output)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    start = time.perf_counter()
+    rows = score_file(
+        abspath(config.score.input),
+        output_path,
+        abspath(config.model.path),
+        abspath(config.model.preprocessor.path),
+        config.process.sep,
+        config.score.chunksize,
+        config.score.n_workers,
+        config.inference.engine,
+        config.model.format,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)")
+    print(f"Predictions saved to {output_path}")
+
+
+if __name__ == "__main__":
+    score()
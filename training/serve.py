@@ -0,0 +1,319 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+import hydra
+import numpy as np
+from hydra.utils import to_absolute_path as abspath
+from model_io import get_decision_threshold, load_model
+from omegaconf import DictConfig
+from preprocessor import Preprocessor
+from waitress import serve as waitress_serve
+
+"""
+This script serves PCR predictions over HTTP, batching concurrent requests together.
+"""
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent scoring requests into batches for one vectorized call.
+
+    Requests wait in a queue until `max_batch_size` rows are collected or
+    the first of them has waited `max_wait_ms`, then the whole batch is
+    scored at once by a background thread. Requests hold encoded features,
+    so a batch only fails when the model itself fails.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        window: int = 10000,
+    ):
+        """
+        Initialize the batcher and start its scoring thread.
+
+        Args:
+            predict_batch (Callable): Function scoring an array of encoded rows.
+            max_batch_size (int): Maximum number of rows in a batch.
+            max_wait_ms (float): Maximum time a request waits for a batch to fill.
+            window (int): Number of recent requests kept for the statistics.
+
+        Returns:
+            None
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.started = time.perf_counter()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, X: np.ndarray):
+        """
+        Queue encoded rows for scoring.
+
+        Args:
+            X (np.ndarray): Encoded features of each patient.
+
+        Returns:
+            Future: Future resolved with the predictions of the rows.
+        """
+        future = Future()
+        self._queue.put((X, future, time.perf_counter()))
+        return future
+
+    def predict(self, X: np.ndarray):
+        """
+        Score encoded rows, waiting for the batch they are part of.
+
+        Args:
+            X (np.ndarray): Encoded features of each patient.
+
+        Returns:
+            dict: Predicted labels and probabilities of the rows.
+        """
+        return self.submit(X).result()
+
+    def _collect(self):
+        """
+        Wait for a request and gather the requests that arrive within the batch window.
+
+        Returns:
+            list: Queued requests forming the next batch.
+        """
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        """
+        Score batches of requests until the process exits.
+
+        Returns:
+            None
+        """
+        while True:
+            batch = self._collect()
+            X = np.concatenate([request[0] for request in batch])
+            try:
+                labels, probabilities = self.predict_batch(X)
+            except Exception as error:
+                for _, future, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            start = 0
+            now = time.perf_counter()
+            with self._lock:
+                self.batch_sizes.append(len(X))
+                for request, future, submitted in batch:
+                    end = start + len(request)
+                    future.set_result(
+                        {
+                            "pcr": labels[start:end].tolist(),
+                            "probability": probabilities[start:end].tolist(),
+                        }
+                    )
+                    self.latencies.append(now - submitted)
+                    self.requests += 1
+                    start = end
+
+    def stats(self):
+        """
+        Summarize the latency and throughput of the recent requests.
+
+        Returns:
+            dict: p50 and p99 latency in milliseconds, mean batch size,
+                number of requests and requests per second.
+        """
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = list(self.batch_sizes)
+            requests = self.requests
+        elapsed = time.perf_counter() - self.started
+        return {
+            "requests": requests,
+            "throughput_rps": requests / elapsed if elapsed else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "mean_batch_size": float(np.mean(batch_sizes)) if batch_sizes else None,
+        }
+
+
+def encode_records(preprocessor: Preprocessor, records: list):
+    """
+    Encode the records of a request, rejecting the ones that cannot be scored.
+
+    Records must be objects whose numeric features are numbers within their
+    valid ranges, as in the training data.
+
+    Args:
+        preprocessor (Preprocessor): Fitted preprocessing.
+        records (list): Records with the raw features of each patient.
+
+    Returns:
+        np.ndarray: Encoded features as float32.
+
+    Raises:
+        ValueError: If a record is not an object, has a non-numeric feature
+            or a value outside its valid range.
+    """
+    if not records:
+        raise ValueError("No records to score")
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {i} is not an object")
+        for feature in preprocessor.numeric_features:
+            value = record.get(feature)
+            if value is not None and not isinstance(value, (int, float)):
+                raise ValueError(f"Record {i} has a non-numeric {feature}")
+    X = preprocessor.transform(records)
+    invalid = np.flatnonzero(~preprocessor.in_range(X))
+    if len(invalid):
+        raise ValueError(f"Records {invalid.tolist()} are outside the valid ranges")
+    return X
+
+
+def make_app(batcher: MicroBatcher, preprocessor: Preprocessor):
+    """
+    Create the WSGI application of the scoring service.
+
+    `POST /predict` takes a record or a list of records with the raw
+    features, `GET /stats` returns the latency and throughput statistics
+    and `GET /health` checks that the service is up. Records are encoded
+    by the request thread, so an invalid request gets its own 400 response
+    before reaching a batch.
+
+    Args:
+        batcher (MicroBatcher): Batcher scoring the requests.
+        preprocessor (Preprocessor): Fitted preprocessing.
+
+    Returns:
+        Callable: WSGI application.
+    """
+
+    def respond(start_response, status: str, body: dict):
+        """
+        Send a JSON response.
+
+        Args:
+            start_response (Callable): WSGI response starter.
+            status (str): HTTP status line.
+            body (dict): JSON body.
+
+        Returns:
+            list: Encoded response body.
+        """
+        payload = json.dumps(body).encode()
+        start_response(
+            status,
+            [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(payload))),
+            ],
+        )
+        return [payload]
+
+    def app(environ: dict, start_response: Callable):
+        """
+        Handle one HTTP request.
+
+        Args:
+            environ (dict): WSGI request environment.
+            start_response (Callable): WSGI response starter.
+
+        Returns:
+            list: Encoded response body.
+        """
+        method, path = environ["REQUEST_METHOD"], environ["PATH_INFO"]
+        if method == "GET" and path == "/health":
+            return respond(start_response, "200 OK", {"status": "ok"})
+        if method == "GET" and path == "/stats":
+            return respond(start_response, "200 OK", batcher.stats())
+        if method != "POST" or path != "/predict":
+            return respond(start_response, "404 Not Found", {"error": "not found"})
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            body = json.loads(environ["wsgi.input"].read(length))
+            records = body if isinstance(body, list) else [body]
+            X = encode_records(preprocessor, records)
+        except ValueError as error:
+            return respond(start_response, "400 Bad Request", {"error": str(error)})
+        return respond(start_response, "200 OK", batcher.predict(X))
+
+    return app
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="main")
+def serve(config: DictConfig):
+    """
+    Load the model once and serve predictions over HTTP.
+
+    Args:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        None
+    """
+    model = load_model(
+        abspath(config.model.path),
+        engine=config.inference.engine,
+        model_format=config.model.format,
+    )
+    preprocessor = Preprocessor.load(abspath(config.model.preprocessor.path))
+    if preprocessor.columns != list(model.feature_names_in_):
+        raise ValueError("The preprocessor does not match the model columns")
+
+    threshold = get_decision_threshold(model)
+
+    def predict_batch(X: np.ndarray):
+        """
+        Score a batch of encoded rows with one vectorized call.
+
+        Args:
+            X (np.ndarray): Encoded features of each patient.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Predicted labels and PCR probabilities.
+        """
+        probabilities = model.predict_proba(X)[:, 1]
+        return (probabilities > threshold).astype(int), probabilities
+
+    batcher = MicroBatcher(
+        predict_batch, config.serve.max_batch_size, config.serve.max_wait_ms
+    )
+    print(f"Serving on http://{config.serve.host}:{config.serve.port}/predict")
+    waitress_serve(
+        make_app(batcher, preprocessor),
+        host=config.serve.host,
+        port=config.serve.port,
+        threads=config.serve.threads,
+    )
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,209 @@
+import logging
+import os
+import shutil
+from typing import Callable
+
+from fingerprint import config_digest, file_digest, fingerprint
+from hydra.utils import to_absolute_path as abspath
+from omegaconf import DictConfig
+
+"""
+This script skips pipeline stages whose inputs did not change since their last run.
+"""
+
+log = logging.getLogger(__name__)
+
+SPLITS = ("X_train", "X_test", "y_train", "y_test")
+
+
+def get_stage_io(stage: str, config: DictConfig):
+    """
+    Get the input files, configuration and output files of a pipeline stage.
+
+    Args:
+        stage (str): Name of the stage.
+        config (DictConfig): Configuration object.
+
+    Returns:
+        Tuple[list, list, list, list]: Input paths, configuration sections,
+            output paths and paths the stage removes, e.g. the metadata of a
+            native model when it saves a joblib one. Stages with no outputs
+            are never cached.
+    """
+    processed = [abspath(config.processed[split].path) for split in SPLITS]
+    # Incremental stages extend their previous outputs, restoring cached ones
+    # would undo that
+    if stage == "process" and not config.process.incremental.enabled:
+        outputs = processed + [abspath(config.model.preprocessor.path)]
+        inputs = [abspath(config.raw.path)]
+        return inputs, [config.process, config.processed], outputs, []
+    if stage == "train" and not config.model.incremental.enabled:
+        # Imported here, model_io loads XGBoost that the other stages do not need
+        from model_io import get_metadata_path, get_train_state_path
+
+        path = abspath(config.model.path)
+        outputs, removed = [path], []
+        if config.model.format != "joblib":
+            outputs.append(get_metadata_path(path))
+        else:
+            removed.append(get_metadata_path(path))
+        outputs.append(get_train_state_path(path))
+        return processed, [config.model], outputs, removed
+    return [], [], [], []
+
+
+class StageCache:
+    """
+    Store the outputs of pipeline stages keyed by a fingerprint of their inputs.
+
+    The fingerprint combines the content of the input files with the resolved
+    configuration sections of the stage. Only the most recently used runs of
+    each stage are kept.
+    """
+
+    def __init__(self, directory: str, max_entries: int = None):
+        """
+        Initialize a cache in the given directory.
+
+        Args:
+            directory (str): Directory holding the cached outputs.
+            max_entries (int): Runs kept per stage, all of them if None.
+
+        Returns:
+            None
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def get_key(self, stage: str, inputs: list, configs: list):
+        """
+        Fingerprint the inputs of a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            inputs (list): Paths of the input files.
+            configs (list): Configuration sections used by the stage.
+
+        Returns:
+            str: Key of the stage run.
+        """
+        return fingerprint(
+            stage,
+            *[file_digest(path) for path in inputs],
+            *[config_digest(section) for section in configs],
+        )
+
+    def _entry(self, stage: str, key: str, index: int, path: str):
+        """
+        Get the cached copy of an output file.
+
+        Args:
+            stage (str): Name of the stage.
+            key (str): Key of the stage run.
+            index (int): Position of the output in the stage outputs.
+            path (str): Path of the output file.
+
+        Returns:
+            str: Path of the cached copy.
+        """
+        name = f"{index}_{os.path.basename(path)}"
+        return os.path.join(self.directory, stage, key, name)
+
+    def restore(self, stage: str, key: str, outputs: list, removed: list = ()):
+        """
+        Copy the cached outputs of a stage run back to their paths.
+
+        Args:
+            stage (str): Name of the stage.
+            key (str): Key of the stage run.
+            outputs (list): Paths of the output files.
+            removed (list): Paths the stage removes, left by runs with other
+                outputs.
+
+        Returns:
+            bool: Whether every output was found in the cache.
+        """
+        entries = [
+            self._entry(stage, key, index, path) for index, path in enumerate(outputs)
+        ]
+        if not all(os.path.exists(entry) for entry in entries):
+            return False
+        for entry, path in zip(entries, outputs):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copy2(entry, path)
+        for path in removed:
+            if os.path.exists(path):
+                os.remove(path)
+        # Mark the run as recently used
+        os.utime(os.path.join(self.directory, stage, key))
+        return True
+
+    def save(self, stage: str, key: str, outputs: list):
+        """
+        Copy the outputs of a stage run into the cache.
+
+        Args:
+            stage (str): Name of the stage.
+            key (str): Key of the stage run.
+            outputs (list): Paths of the output files.
+
+        Returns:
+            None
+        """
+        for index, path in enumerate(outputs):
+            entry = self._entry(stage, key, index, path)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            shutil.copy2(path, entry)
+        self.prune(stage)
+
+    def prune(self, stage: str):
+        """
+        Remove the least recently used runs of a stage beyond `max_entries`.
+
+        Args:
+            stage (str): Name of the stage.
+
+        Returns:
+            None
+        """
+        directory = os.path.join(self.directory, stage)
+        if self.max_entries is None or not os.path.isdir(directory):
+            return
+        runs = sorted(
+            (os.path.join(directory, key) for key in os.listdir(directory)),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for run in runs[self.max_entries :]:
+            shutil.rmtree(run)
+
+
+def run_stage(stage: str, run: Callable, config: DictConfig):
+    """
+    Run a pipeline stage, restoring its outputs from the cache when its inputs are
+    unchanged.
+
+    Args:
+        stage (str): Name of the stage.
+        run (Callable): Function running the stage on the configuration.
+        config (DictConfig): Configuration object.
+
+    Returns:
+        None
+    """
+    inputs, configs, outputs, removed = get_stage_io(stage, config)
+    if not config.pipeline.cache.enabled or not outputs:
+        run(config)
+        return
+
+    cache = StageCache(
+        abspath(config.pipeline.cache.dir), config.pipeline.cache.max_entries
+    )
+    key = cache.get_key(stage, inputs, configs)
+    if cache.restore(stage, key, outputs, removed):
+        log.info(f"Cache hit for stage '{stage}' ({key[:12]}), outputs restored")
+        return
+
+    log.info(f"Cache miss for stage '{stage}' ({key[:12]}), running it")
+    run(config)
+    cache.save(stage, key, outputs)
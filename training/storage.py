@@ -0,0 +1,734 @@
+import json
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+"""
+This script saves and loads the processed data splits in a configurable format.
+"""
+
+FORMATS = ("parquet", "feather", "npy", "npz", "mmap", "csv")
+
+# Reserved length of the .npy header, large enough for any row count
+NPY_MAX_ROWS = 10**18
+
+# Start of .mmap files, followed by the length of their JSON schema header
+MMAP_MAGIC = b"FSTORE\x01\x00"
+MMAP_ALIGNMENT = 64
+
+
+def get_format(path: str):
+    """
+    Infer the storage format from the file extension.
+
+    Args:
+        path (str): Path to the data file.
+
+    Returns:
+        str: One of the supported storage formats.
+    """
+    storage_format = Path(path).suffix.lstrip(".").lower()
+    if storage_format not in FORMATS:
+        raise ValueError(
+            f"Unsupported storage format '{storage_format}' for {path}. "
+            f"Expected one of {FORMATS}."
+        )
+    return storage_format
+
+
+def is_sparse_frame(data: pd.DataFrame):
+    """
+    Check whether every column of a DataFrame is sparse.
+
+    Args:
+        data (pd.DataFrame): Data to check.
+
+    Returns:
+        bool: Whether the frame can be converted to a sparse matrix.
+    """
+    return len(data.columns) > 0 and all(
+        isinstance(dtype, pd.SparseDtype) for dtype in data.dtypes
+    )
+
+
+def dense_to_csr(values: np.ndarray):
+    """
+    Convert a dense array to a CSR matrix storing every entry, zeros included.
+
+    XGBoost takes the entries absent from a CSR matrix as missing, so zeros
+    must be stored to keep their value.
+
+    Args:
+        values (np.ndarray): Two-dimensional array.
+
+    Returns:
+        sparse.csr_matrix: Data as a CSR matrix.
+    """
+    rows, columns = values.shape
+    return sparse.csr_matrix(
+        (
+            values.ravel(),
+            np.tile(np.arange(columns), rows),
+            np.arange(0, rows * columns + 1, columns),
+        ),
+        shape=values.shape,
+    )
+
+
+def to_csr(data: pd.DataFrame):
+    """
+    Convert a DataFrame to a CSR matrix, without densifying sparse frames.
+
+    Args:
+        data (pd.DataFrame): Data to convert.
+
+    Returns:
+        sparse.csr_matrix: Data as a CSR matrix.
+    """
+    if is_sparse_frame(data):
+        return data.sparse.to_coo().tocsr()
+    return dense_to_csr(data.to_numpy(dtype=float))
+
+
+def _save_npz(matrix: sparse.csr_matrix, columns: list, path: str):
+    """
+    Save a CSR matrix and its column names to a single .npz file.
+
+    Args:
+        matrix (sparse.csr_matrix): Data to save.
+        columns (list): Column names of the matrix.
+        path (str): Destination path.
+
+    Returns:
+        None
+    """
+    with open(path, "wb") as file:
+        np.savez(
+            file,
+            data=matrix.data,
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+            shape=np.array(matrix.shape),
+            columns=np.array(columns, dtype=str),
+        )
+
+
+def _load_npz(path: str):
+    """
+    Load a sparse DataFrame saved with `_save_npz`.
+
+    Args:
+        path (str): Path to the data file.
+
+    Returns:
+        pd.DataFrame: Loaded data with sparse columns.
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        matrix = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(arrays["shape"]),
+        )
+        columns = arrays["columns"].tolist()
+    return pd.DataFrame.sparse.from_spmatrix(matrix, columns=columns)
+
+
+def _align(offset: int):
+    """
+    Round an offset up to the alignment of the .mmap column blocks.
+
+    Args:
+        offset (int): Offset in bytes.
+
+    Returns:
+        int: Smallest aligned offset not below the given one.
+    """
+    return -(-offset // MMAP_ALIGNMENT) * MMAP_ALIGNMENT
+
+
+def get_mmap_blocks(dtypes: pd.Series):
+    """
+    Group consecutive columns of the same dtype into blocks.
+
+    Args:
+        dtypes (pd.Series): Dtype of each column.
+
+    Returns:
+        list: Dtype and number of columns of each block, in column order.
+    """
+    blocks = []
+    for dtype in dtypes:
+        if not (pd.api.types.is_numeric_dtype(dtype) and isinstance(dtype, np.dtype)):
+            raise ValueError(
+                f"The mmap format stores numeric columns only, got {dtype}"
+            )
+        if blocks and blocks[-1][0] == dtype:
+            blocks[-1][1] += 1
+        else:
+            blocks.append([dtype, 1])
+    return blocks
+
+
+def _mmap_header(columns: list, blocks: list, rows: int, capacity: int = None):
+    """
+    Build the schema header of a .mmap file and the offset of its blocks.
+
+    Args:
+        columns (list): Column names.
+        blocks (list): Dtype and number of columns of each block.
+        rows (int): Number of rows.
+        capacity (int): Number of rows each column has room for, so that
+            rows can be appended in place. Defaults to the number of rows.
+
+    Returns:
+        Tuple[bytes, list]: Encoded header including the magic string and
+            the offset of each block.
+    """
+    capacity = rows if capacity is None else max(capacity, rows)
+    data_start = 0
+    while True:
+        offsets, offset = [], data_start
+        for dtype, n_columns in blocks:
+            offsets.append(offset)
+            offset = _align(offset + dtype.itemsize * n_columns * capacity)
+        schema = {
+            "rows": rows,
+            "capacity": capacity,
+            "columns": [str(column) for column in columns],
+            "blocks": [
+                {"dtype": dtype.str, "columns": n_columns, "offset": offset}
+                for (dtype, n_columns), offset in zip(blocks, offsets)
+            ],
+        }
+        header = json.dumps(schema).encode()
+        header = MMAP_MAGIC + struct.pack("<Q", len(header)) + header
+        # Longer offsets can push the header past the blocks, move them then
+        if len(header) <= data_start:
+            return header, offsets
+        data_start = _align(len(header))
+
+
+def _write_mmap_rows(
+    file, data: pd.DataFrame, blocks: list, offsets: list, capacity: int, row: int
+):
+    """
+    Write rows into the column blocks of an open .mmap file.
+
+    Args:
+        file (BinaryIO): File opened for writing.
+        data (pd.DataFrame): Rows to write, with the columns of the file.
+        blocks (list): Dtype and number of columns of each block.
+        offsets (list): Offset of each block.
+        capacity (int): Number of rows each column has room for.
+        row (int): Position of the first row written.
+
+    Returns:
+        None
+    """
+    start = 0
+    for (dtype, n_columns), offset in zip(blocks, offsets):
+        values = data.iloc[:, start : start + n_columns].to_numpy(dtype=dtype)
+        for i in range(n_columns):
+            file.seek(offset + (i * capacity + row) * dtype.itemsize)
+            np.ascontiguousarray(values[:, i]).tofile(file)
+        start += n_columns
+
+
+def _save_mmap(data: pd.DataFrame, path: str, capacity: int = None):
+    """
+    Save a DataFrame as contiguous column blocks behind a schema header.
+
+    Each block holds consecutive columns of one dtype, column after column,
+    which is the memory layout of a pandas block, so that the file can be
+    loaded as a DataFrame without copying.
+
+    Args:
+        data (pd.DataFrame): Numeric data to save.
+        path (str): Destination path.
+        capacity (int): Number of rows each column has room for, see
+            `_mmap_header`.
+
+    Returns:
+        None
+    """
+    blocks = get_mmap_blocks(data.dtypes)
+    capacity = len(data) if capacity is None else max(capacity, len(data))
+    header, offsets = _mmap_header(list(data.columns), blocks, len(data), capacity)
+    with open(path, "wb") as file:
+        file.write(header)
+        _write_mmap_rows(file, data, blocks, offsets, capacity, 0)
+        if blocks:
+            dtype, n_columns = blocks[-1]
+            file.truncate(offsets[-1] + dtype.itemsize * n_columns * capacity)
+        else:
+            file.truncate()
+
+
+def _read_mmap_schema(path: str):
+    """
+    Read the schema header of a .mmap file.
+
+    Args:
+        path (str): Path to the data file.
+
+    Returns:
+        dict: Rows, capacity, columns and blocks of the file.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MMAP_MAGIC)) != MMAP_MAGIC:
+            raise ValueError(f"{path} is not a memory-mapped feature store file")
+        (length,) = struct.unpack("<Q", file.read(8))
+        schema = json.loads(file.read(length))
+    schema.setdefault("capacity", schema["rows"])
+    return schema
+
+
+def _load_mmap(path: str):
+    """
+    Load a DataFrame saved with `_save_mmap` as read-only views of the file.
+
+    The pages of the file are shared by every process that maps it, so the
+    data is held in memory once whatever the number of readers.
+
+    Args:
+        path (str): Path to the data file.
+
+    Returns:
+        pd.DataFrame: Loaded data backed by the memory-mapped file.
+    """
+    schema = _read_mmap_schema(path)
+    rows, capacity, columns = schema["rows"], schema["capacity"], schema["columns"]
+    if not schema["blocks"]:
+        return pd.DataFrame(index=range(rows))
+
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    frames, start = [], 0
+    for block in schema["blocks"]:
+        dtype, n_columns = np.dtype(block["dtype"]), block["columns"]
+        end = block["offset"] + dtype.itemsize * n_columns * capacity
+        values = buffer[block["offset"] : end].view(dtype)
+        values = values.reshape(n_columns, capacity)[:, :rows]
+        frames.append(
+            pd.DataFrame(
+                values.T, columns=columns[start : start + n_columns], copy=False
+            )
+        )
+        start += n_columns
+    return pd.concat(frames, axis=1, copy=False)
+
+
+def _append_mmap(data: pd.DataFrame, path: str):
+    """
+    Append rows to a .mmap file, in place while its columns have room for them.
+
+    Otherwise the file is rewritten with twice its capacity, so that the
+    cost of appending is proportional to the appended rows on average.
+    Readers that mapped the file keep seeing the rows it had when loaded.
+
+    Args:
+        data (pd.DataFrame): Rows to append, with the columns of the file.
+        path (str): Path to the data file.
+
+    Returns:
+        None
+    """
+    schema = _read_mmap_schema(path)
+    rows, capacity = schema["rows"], schema["capacity"]
+    blocks = [
+        [np.dtype(block["dtype"]), block["columns"]] for block in schema["blocks"]
+    ]
+    offsets = [block["offset"] for block in schema["blocks"]]
+    data = data[schema["columns"]]
+    if rows + len(data) <= capacity:
+        header, new_offsets = _mmap_header(
+            schema["columns"], blocks, rows + len(data), capacity
+        )
+        if new_offsets == offsets:
+            with open(path, "r+b") as file:
+                _write_mmap_rows(file, data, blocks, offsets, capacity, rows)
+                file.seek(0)
+                file.write(header)
+            return
+
+    # Write a new file next to the old one, readers keep the old pages
+    stored = _load_mmap(path)
+    data = pd.concat([stored, data.astype(stored.dtypes)], ignore_index=True)
+    temporary = f"{path}.tmp"
+    _save_mmap(data, temporary, max(2 * capacity, len(data)))
+    os.replace(temporary, path)
+
+
+def _append_npy(data: pd.DataFrame, path: str):
+    """
+    Append records to a .npy file and update the length in its header.
+
+    Files written by `save_frame` reserve room in the header for any length,
+    others are rewritten when the new length does not fit.
+
+    Args:
+        data (pd.DataFrame): Rows to append, with the columns of the file.
+        path (str): Path to the data file.
+
+    Returns:
+        None
+    """
+    with open(path, "r+b") as file:
+        version = np.lib.format.read_magic(file)
+        if version == (2, 0):
+            (length,), _, dtype = np.lib.format.read_array_header_2_0(file)
+        else:
+            (length,), _, dtype = np.lib.format.read_array_header_1_0(file)
+        header_len = file.tell()
+        data = data[list(dtype.names)]
+        header = _npy_header(dtype, length + len(data), header_len)
+        if version == (2, 0) and len(header) == header_len:
+            file.seek(0, os.SEEK_END)
+            file.write(data.to_records(index=False).astype(dtype).tobytes())
+            file.seek(0)
+            file.write(header)
+            return
+    stored = load_frame(path)
+    save_frame(pd.concat([stored, data.astype(stored.dtypes)], ignore_index=True), path)
+
+
+def save_frame(data, path: str):
+    """
+    Save a DataFrame or Series keeping its dtypes and column order.
+
+    The npz format stores the data as a CSR matrix, so sparse frames are
+    saved without densifying them and loaded back with sparse columns. The
+    mmap format stores numeric columns as memory-mapped arrays, loaded back
+    without copying them.
+
+    Args:
+        data (pd.DataFrame | pd.Series): Data to save.
+        path (str): Destination path, its extension selects the format.
+
+    Returns:
+        None
+    """
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    data = data.reset_index(drop=True)
+    storage_format = get_format(path)
+    if storage_format == "parquet":
+        data.to_parquet(path, index=False)
+    elif storage_format == "feather":
+        data.to_feather(path)
+    elif storage_format == "npy":
+        _save_npy(data, path)
+    elif storage_format == "npz":
+        _save_npz(to_csr(data), list(data.columns), path)
+    elif storage_format == "mmap":
+        _save_mmap(data, path)
+    else:
+        data.to_csv(path, index=False)
+
+
+def load_frame(path: str):
+    """
+    Load a DataFrame saved with `save_frame`.
+
+    If the file does not exist in the configured format, a CSV file with the
+    same name is read instead.
+
+    Args:
+        path (str): Path to the data file.
+
+    Returns:
+        pd.DataFrame: Loaded data.
+    """
+    storage_format = get_format(path)
+    if not Path(path).exists() and storage_format != "csv":
+        csv_path = Path(path).with_suffix(".csv")
+        if csv_path.exists():
+            return pd.read_csv(csv_path)
+    if storage_format == "parquet":
+        return pd.read_parquet(path)
+    if storage_format == "feather":
+        return pd.read_feather(path)
+    if storage_format == "npy":
+        return pd.DataFrame.from_records(np.load(path, allow_pickle=False))
+    if storage_format == "npz":
+        return _load_npz(path)
+    if storage_format == "mmap":
+        return _load_mmap(path)
+    return pd.read_csv(path)
+
+
+def _npy_header(dtype: np.dtype, length: int, header_len: int = None):
+    """
+    Build a version 2.0 .npy header for a 1-D structured array.
+
+    Args:
+        dtype (np.dtype): Record dtype of the array.
+        length (int): Number of records in the array.
+        header_len (int): Total header length to pad to, defaults to the
+            smallest 64-byte aligned length.
+
+    Returns:
+        bytes: Encoded header including the magic string.
+    """
+    header = repr(
+        {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (length,),
+        }
+    )
+    prefix_len = len(np.lib.format.MAGIC_PREFIX) + 2 + 4
+    if header_len is None:
+        header_len = -(-(prefix_len + len(header) + 1) // 64) * 64
+    header = header.ljust(header_len - prefix_len - 1) + "\n"
+    return (
+        np.lib.format.MAGIC_PREFIX
+        + bytes([2, 0])
+        + struct.pack("<I", len(header))
+        + header.encode("latin1")
+    )
+
+
+def _save_npy(data: pd.DataFrame, path: str):
+    """
+    Save a DataFrame as a .npy file of records, reserving room in the header
+    for the length of any number of appended rows.
+
+    Args:
+        data (pd.DataFrame): Data to save.
+        path (str): Destination path.
+
+    Returns:
+        None
+    """
+    records = data.to_records(index=False)
+    if records.dtype.hasobject:
+        raise ValueError("Object columns cannot be saved in the npy format")
+    header_len = len(_npy_header(records.dtype, NPY_MAX_ROWS))
+    with open(path, "wb") as file:
+        file.write(_npy_header(records.dtype, len(records), header_len))
+        file.write(records.tobytes())
+
+
+def append_frame(data, path: str):
+    """
+    Append rows to a file saved with `save_frame`, creating it if missing.
+
+    The rows are cast to the stored dtypes, except in CSV files which store
+    none. The csv, npy and mmap formats write the new rows only, the other
+    formats cannot be appended to and are rewritten with all their rows.
+
+    Args:
+        data (pd.DataFrame | pd.Series): Rows to append, with the columns of
+            the file.
+        path (str): Path to the data file.
+
+    Returns:
+        None
+    """
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    data = data.reset_index(drop=True)
+    if not Path(path).exists():
+        save_frame(data, path)
+        return
+    storage_format = get_format(path)
+    if storage_format == "mmap":
+        _append_mmap(data, path)
+    elif storage_format == "npy":
+        _append_npy(data, path)
+    elif storage_format == "csv":
+        columns = pd.read_csv(path, nrows=0).columns
+        data[columns].to_csv(path, mode="a", header=False, index=False)
+    elif storage_format == "npz":
+        stored = load_frame(path)
+        matrix = sparse.vstack([to_csr(stored), to_csr(data[stored.columns])])
+        _save_npz(matrix.tocsr(), list(stored.columns), path)
+    else:
+        stored = load_frame(path)
+        data = data[stored.columns].astype(stored.dtypes)
+        save_frame(pd.concat([stored, data], ignore_index=True), path)
+
+
+class FrameWriter:
+    """
+    Write a DataFrame to disk incrementally, one chunk at a time.
+
+    The first chunk fixes the column order and dtypes, later chunks are cast
+    to them so that the written file has a single schema. A writer closed
+    before any chunk removes the file left at its path by an earlier run, it
+    has no schema to write an empty one with.
+
+    The npz format cannot be appended to: the chunks are kept in memory as
+    CSR matrices, which hold only the non-zero one-hot entries, and stacked
+    when closing. Its peak memory is that of the whole sparse matrix, use a
+    streamed dense format for data that does not fit in memory.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize a writer for the given path.
+
+        Args:
+            path (str): Destination path, its extension selects the format.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.format = get_format(path)
+        self.dtypes = None
+        self.rows = 0
+        self._writer = None
+
+    def _open(self, data: pd.DataFrame):
+        """
+        Open the destination file using the schema of the first chunk.
+
+        Args:
+            data (pd.DataFrame): First chunk to be written.
+
+        Returns:
+            None
+        """
+        self.dtypes = data.dtypes
+        if self.format == "npz":
+            # A CSR matrix cannot be appended to, keep the chunks until closing
+            self._writer = []
+        elif self.format == "mmap":
+            # Columns are stored one after the other, write each to its own
+            # file and join them when closing
+            self.blocks = get_mmap_blocks(data.dtypes)
+            self._writer = [
+                open(f"{self.path}.{i}.part", "wb") for i in range(len(data.columns))
+            ]
+        elif self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self.schema = pa.Schema.from_pandas(data, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        elif self.format == "feather":
+            import pyarrow as pa
+
+            self.schema = pa.Schema.from_pandas(data, preserve_index=False)
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+        elif self.format == "npy":
+            self.record_dtype = data.head(0).to_records(index=False).dtype
+            self._header_len = len(_npy_header(self.record_dtype, NPY_MAX_ROWS))
+            self._writer = open(self.path, "wb")
+            self._writer.write(
+                _npy_header(self.record_dtype, NPY_MAX_ROWS, self._header_len)
+            )
+        else:
+            self._writer = open(self.path, "w", newline="")
+            data.head(0).to_csv(self._writer, index=False)
+
+    def write(self, data):
+        """
+        Append a chunk to the destination file.
+
+        Args:
+            data (pd.DataFrame | pd.Series): Chunk to append.
+
+        Returns:
+            None
+        """
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+        data = data.reset_index(drop=True)
+        if self._writer is None:
+            self._open(data)
+        data = data[self.dtypes.index]
+        if self.format == "npz":
+            self._writer.append(to_csr(data))
+            self.rows += len(data)
+            return
+        data = data.astype(self.dtypes)
+        if self.format in ("parquet", "feather"):
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(data, schema=self.schema, preserve_index=False)
+            self._writer.write_table(table)
+        elif self.format == "npy":
+            records = data.to_records(index=False).astype(self.record_dtype)
+            self._writer.write(records.tobytes())
+        elif self.format == "mmap":
+            for i, file in enumerate(self._writer):
+                np.ascontiguousarray(data.iloc[:, i].to_numpy()).tofile(file)
+        else:
+            data.to_csv(self._writer, header=False, index=False)
+        self.rows += len(data)
+
+    def close(self):
+        """
+        Finalize the destination file.
+
+        Returns:
+            None
+        """
+        if self._writer is None:
+            # Nothing was written, do not leave an earlier output to be read
+            # as this one
+            if self.dtypes is None and os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        if self.format == "npz":
+            _save_npz(
+                sparse.vstack(self._writer).tocsr(), list(self.dtypes.index), self.path
+            )
+            self._writer = None
+            return
+        if self.format == "mmap":
+            self._join_columns()
+            self._writer = None
+            return
+        if self.format == "npy":
+            self._writer.seek(0)
+            self._writer.write(
+                _npy_header(self.record_dtype, self.rows, self._header_len)
+            )
+        self._writer.close()
+        self._writer = None
+
+    def _join_columns(self):
+        """
+        Write the .mmap header and copy the column files into their blocks.
+
+        Returns:
+            None
+        """
+        header, offsets = _mmap_header(list(self.dtypes.index), self.blocks, self.rows)
+        columns = iter(self._writer)
+        with open(self.path, "wb") as file:
+            file.write(header)
+            for (_, n_columns), offset in zip(self.blocks, offsets):
+                file.seek(offset)
+                for _ in range(n_columns):
+                    part = next(columns)
+                    part.close()
+                    with open(part.name, "rb") as values:
+                        shutil.copyfileobj(values, file)
+                    os.remove(part.name)
+            file.truncate()
+
+    def __enter__(self):
+        """
+        Enter the writer context.
+
+        Returns:
+            FrameWriter: This writer.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the writer when leaving the context.
+
+        Returns:
+            None
+        """
+        self.close()
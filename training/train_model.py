@@ -1,15 +1,31 @@
+import json
+import multiprocessing
+import os
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from functools import partial
 from typing import Callable
 
 import hydra
-import joblib
+import instrument
 import numpy as np
 import pandas as pd
+import xgboost as xgb
+from cross_validation import CrossValidator
 from hydra.utils import to_absolute_path as abspath
-from hyperopt import STATUS_OK, Trials, fmin, hp, tpe
+from hyperopt import JOB_STATE_DONE, STATUS_OK, Trials, fmin, hp, space_eval, tpe
+from hyperopt.base import Domain, spec_from_misc
+from hyperopt.pyll import Apply
+from hyperopt.pyll.stochastic import sample
+from model_io import NativeModel, get_train_state_path
+from model_io import load_model as load_saved_model
+from model_io import save_model
 from omegaconf import DictConfig
 from sklearn.metrics import accuracy_score
+from storage import get_format, is_sparse_frame, load_frame, to_csr
+from trial_store import TrialStore, get_search_key
 from xgboost import XGBClassifier
 
 warnings.filterwarnings(action="ignore")
@@ -18,7 +34,11 @@ warnings.filterwarnings(action="ignore")
 This script trains an XGBoost model using hyperparameter optimization.
 """
 
+# Objective evaluated by the worker processes of the parallel search
+_worker_objective = None
 
+
+@instrument.step
 def load_data(path: DictConfig):
     """
     Load training and testing data.
@@ -30,13 +50,83 @@ def load_data(path: DictConfig):
         Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
             Training and testing data for features and labels.
     """
-    X_train = pd.read_csv(abspath(path.X_train.path))
-    X_test = pd.read_csv(abspath(path.X_test.path))
-    y_train = pd.read_csv(abspath(path.y_train.path))
-    y_test = pd.read_csv(abspath(path.y_test.path))
+    X_train = load_frame(abspath(path.X_train.path))
+    X_test = load_frame(abspath(path.X_test.path))
+    y_train = load_frame(abspath(path.y_train.path))
+    y_test = load_frame(abspath(path.y_test.path))
     return X_train, X_test, y_train, y_test
 
 
+def get_space(config: DictConfig):
+    """
+    Define the hyperparameter search space.
+
+    Parameters:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        dict: Search space, with the fixed settings of every trial.
+    """
+    return {
+        "max_depth": hp.quniform("max_depth", **config.model.max_depth),
+        "gamma": hp.uniform("gamma", **config.model.gamma),
+        "reg_alpha": hp.quniform("reg_alpha", **config.model.reg_alpha),
+        "reg_lambda": hp.uniform("reg_lambda", **config.model.reg_lambda),
+        "colsample_bytree": hp.uniform(
+            "colsample_bytree", **config.model.colsample_bytree
+        ),
+        "min_child_weight": hp.quniform(
+            "min_child_weight", **config.model.min_child_weight
+        ),
+        "n_estimators": config.model.n_estimators,
+        "seed": config.model.seed,
+        "n_jobs": get_nthread(config.model.search),
+    }
+
+
+def get_model(config: DictConfig, space: dict):
+    """
+    Create an untrained XGBoost classifier for a set of hyperparameters.
+
+    Parameters:
+        config (DictConfig): Configuration object.
+        space (dict): Hyperparameters of the trial.
+
+    Returns:
+        XGBClassifier: The untrained classifier.
+    """
+    return XGBClassifier(
+        use_label_encoder=config.model.use_label_encoder,
+        objective=config.model.objective,
+        n_estimators=space["n_estimators"],
+        max_depth=int(space["max_depth"]),
+        gamma=space["gamma"],
+        reg_alpha=int(space["reg_alpha"]),
+        min_child_weight=int(space["min_child_weight"]),
+        colsample_bytree=int(space["colsample_bytree"]),
+        random_state=space["seed"],
+        n_jobs=space["n_jobs"],
+    )
+
+
+def set_booster(model: XGBClassifier, booster: xgb.Booster, evals_result: dict):
+    """
+    Attach a booster trained with `xgb.train` to a classifier.
+
+    Parameters:
+        model (XGBClassifier): The classifier the booster was trained for.
+        booster (xgb.Booster): The trained booster.
+        evals_result (dict): Evaluation history of the training.
+
+    Returns:
+        XGBClassifier: The trained classifier.
+    """
+    model._Booster = booster
+    model.n_classes_ = 2
+    model.evals_result_ = evals_result
+    return model
+
+
 def get_objective(
     X_train: pd.DataFrame,
     y_train: pd.DataFrame,
@@ -57,21 +147,15 @@ def get_objective(
         space (dict): Hyperparameter search space.
 
     Returns:
-        dict: Dictionary with 'loss', 'status', and the best model.
+        dict: Dictionary with 'loss', 'status', the trained model and a
+            record of the trial ('params', 'accuracy', 'best_iteration'
+            and 'fit_time').
     """
-    model = XGBClassifier(
-        use_label_encoder=config.model.use_label_encoder,
-        objective=config.model.objective,
-        n_estimators=space["n_estimators"],
-        max_depth=int(space["max_depth"]),
-        gamma=space["gamma"],
-        reg_alpha=int(space["reg_alpha"]),
-        min_child_weight=int(space["min_child_weight"]),
-        colsample_bytree=int(space["colsample_bytree"]),
-    )
+    model = get_model(config, space)
 
     evaluation = [(X_train, y_train), (X_test, y_test)]
 
+    start = time.perf_counter()
     model.fit(
         X_train,
         y_train,
@@ -79,65 +163,961 @@ def get_objective(
         eval_metric=config.model.eval_metric,
         early_stopping_rounds=config.model.early_stopping_rounds,
     )
+    fit_time = time.perf_counter() - start
     prediction = model.predict(X_test.values)
     accuracy = accuracy_score(y_test, prediction)
     print("SCORE:", accuracy)
-    return {"loss": -accuracy, "status": STATUS_OK, "model": model}
+    return {
+        "loss": -accuracy,
+        "status": STATUS_OK,
+        "model": model,
+        "params": dict(space),
+        "accuracy": accuracy,
+        "best_iteration": model.best_iteration,
+        "fit_time": fit_time,
+    }
+
+
+def get_matrices(
+    X_train: pd.DataFrame,
+    y_train: pd.DataFrame,
+    X_test: pd.DataFrame,
+    y_test: pd.DataFrame,
+):
+    """
+    Build the XGBoost training and evaluation matrices.
+
+    The test matrix reuses the quantile cuts of the training matrix, so the
+    data is converted and quantized once and shared by every trial. Sparse
+    features are passed as CSR matrices, so only their non-zeros are read.
+
+    Parameters:
+        X_train (pd.DataFrame): Training data features.
+        y_train (pd.DataFrame): Training data labels.
+        X_test (pd.DataFrame): Testing data features.
+        y_test (pd.DataFrame): Testing data labels.
+
+    Returns:
+        Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]: Training and testing matrices.
+    """
+    feature_names = list(X_train.columns)
+    if is_sparse_frame(X_train):
+        X_train, X_test = to_csr(X_train), to_csr(X_test)
+    dtrain = xgb.QuantileDMatrix(X_train, y_train, feature_names=feature_names)
+    dtest = xgb.QuantileDMatrix(X_test, y_test, feature_names=feature_names, ref=dtrain)
+    return dtrain, dtest
+
+
+def get_objective_dmatrix(
+    dtrain: xgb.DMatrix,
+    dtest: xgb.DMatrix,
+    y_test: pd.DataFrame,
+    config: DictConfig,
+    space: dict,
+):
+    """
+    Define the optimization objective on prebuilt XGBoost matrices.
+
+    The booster is trained with the same parameters, evaluation sets and
+    early stopping as `get_objective` and returned inside an XGBClassifier,
+    so the saved model is the same kind of artifact.
+
+    Parameters:
+        dtrain (xgb.DMatrix): Training data matrix.
+        dtest (xgb.DMatrix): Testing data matrix.
+        y_test (pd.DataFrame): Testing data labels.
+        config (DictConfig): Configuration object.
+        space (dict): Hyperparameter search space.
+
+    Returns:
+        dict: Dictionary with 'loss', 'status', the trained model and a
+            record of the trial ('params', 'accuracy', 'best_iteration'
+            and 'fit_time').
+    """
+    model = get_model(config, space)
+    params = model.get_xgb_params()
+    params["eval_metric"] = config.model.eval_metric
+
+    start = time.perf_counter()
+    evals_result = {}
+    booster = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=model.n_estimators,
+        evals=[(dtrain, "validation_0"), (dtest, "validation_1")],
+        early_stopping_rounds=config.model.early_stopping_rounds,
+        evals_result=evals_result,
+    )
+    fit_time = time.perf_counter() - start
+    set_booster(model, booster, evals_result)
+
+    probability = booster.predict(
+        dtest, iteration_range=(0, booster.best_iteration + 1)
+    )
+    accuracy = accuracy_score(y_test, (probability > 0.5).astype(int))
+    print("SCORE:", accuracy)
+    return {
+        "loss": -accuracy,
+        "status": STATUS_OK,
+        "model": model,
+        "params": dict(space),
+        "accuracy": accuracy,
+        "best_iteration": booster.best_iteration,
+        "fit_time": fit_time,
+    }
+
+
+def get_objective_cv(validator: CrossValidator, config: DictConfig, space: dict):
+    """
+    Define the optimization objective as the mean accuracy over k folds.
+
+    Parameters:
+        validator (CrossValidator): Cross-validator running the folds.
+        config (DictConfig): Configuration object.
+        space (dict): Hyperparameter search space.
+
+    Returns:
+        dict: Dictionary with 'loss', 'status' and a record of the trial
+            ('params', the mean and standard deviation of the accuracy and
+            the accuracy, best iteration and fit time of each fold).
+    """
+    model = get_model(config, space)
+    params = model.get_xgb_params()
+    params["eval_metric"] = config.model.eval_metric
+
+    folds = validator.evaluate(
+        params, model.n_estimators, config.model.early_stopping_rounds
+    )
+    accuracies = [fold["accuracy"] for fold in folds]
+    fit_times = [fold["fit_time"] for fold in folds]
+    accuracy, accuracy_std = float(np.mean(accuracies)), float(np.std(accuracies))
+    print(f"SCORE: {accuracy} +/- {accuracy_std}")
+    print("Fold fit times:", ", ".join(f"{fit_time:.3f}s" for fit_time in fit_times))
+    return {
+        "loss": -accuracy,
+        "status": STATUS_OK,
+        "params": dict(space),
+        "accuracy": accuracy,
+        "accuracy_std": accuracy_std,
+        "fold_accuracies": accuracies,
+        "best_iteration": [fold["best_iteration"] for fold in folds],
+        "fold_fit_times": fit_times,
+        "fit_time": float(np.sum(fit_times)),
+    }
+
+
+def build_objective(
+    X_train: pd.DataFrame,
+    y_train: pd.DataFrame,
+    X_test: pd.DataFrame,
+    y_test: pd.DataFrame,
+    config: DictConfig,
+):
+    """
+    Build the optimization objective for the configured training path.
+
+    Sparse features always go through the XGBoost matrices, the scikit-learn
+    interface would densify them.
+
+    Parameters:
+        X_train (pd.DataFrame): Training data features.
+        y_train (pd.DataFrame): Training data labels.
+        X_test (pd.DataFrame): Testing data features.
+        y_test (pd.DataFrame): Testing data labels.
+        config (DictConfig): Configuration object.
+
+    Returns:
+        Callable: The optimization objective function.
+    """
+    if config.model.search.dmatrix or is_sparse_frame(X_train):
+        dtrain, dtest = get_matrices(X_train, y_train, X_test, y_test)
+        return partial(get_objective_dmatrix, dtrain, dtest, y_test, config)
+    return partial(get_objective, X_train, y_train, X_test, y_test, config)
+
+
+def load_objective(config: DictConfig):
+    """
+    Load the processed splits and build the optimization objective.
+
+    Worker processes call it to build their objective from the mmap feature
+    store, so they map the pages of one copy of the data instead of each
+    receiving a pickled copy.
+
+    Parameters:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        Callable: The optimization objective function.
+    """
+    X_train, X_test, y_train, y_test = load_data(config.processed)
+    return build_objective(X_train, y_train, X_test, y_test, config)
+
+
+def is_memory_mapped(processed: DictConfig):
+    """
+    Check whether every processed split is stored in the mmap format.
+
+    Parameters:
+        processed (DictConfig): Configuration of the processed data files.
+
+    Returns:
+        bool: Whether the splits can be mapped by each process.
+    """
+    splits = ("X_train", "X_test", "y_train", "y_test")
+    return all(get_format(processed[split].path) == "mmap" for split in splits)
+
+
+def get_accuracy(model: XGBClassifier, X: pd.DataFrame, y: pd.DataFrame):
+    """
+    Compute the accuracy of a model, passing sparse features as a CSR matrix.
+
+    Parameters:
+        model (XGBClassifier): Trained classifier.
+        X (pd.DataFrame): Features.
+        y (pd.DataFrame): Labels.
+
+    Returns:
+        float: Accuracy of the predictions.
+    """
+    return accuracy_score(y, model.predict(to_csr(X) if is_sparse_frame(X) else X))
+
+
+def save_train_state(
+    path: str,
+    train_rows: int,
+    accuracy: float,
+    reference: float,
+    splits: dict = None,
+):
+    """
+    Save the training state of a model next to it.
+
+    Parameters:
+        path (str): Path of the model.
+        train_rows (int): Number of training rows the model was trained on.
+        accuracy (float): Accuracy of the model on the test split.
+        reference (float): Accuracy of the model found by the last search.
+        splits (dict): Generation and feature columns of the splits the model
+            was trained on, see `process.load_split_state`.
+
+    Returns:
+        None
+    """
+    state = {
+        "train_rows": train_rows,
+        "accuracy": accuracy,
+        "reference": reference,
+        "splits": splits,
+    }
+    with open(get_train_state_path(path), "w") as file:
+        json.dump(state, file, indent=2)
+
+
+def load_train_state(path: str):
+    """
+    Load the training state saved with `save_train_state`.
+
+    Parameters:
+        path (str): Path of the model.
+
+    Returns:
+        dict: Training state, None if the model or its state is missing.
+    """
+    state_path = get_train_state_path(path)
+    if not (os.path.exists(path) and os.path.exists(state_path)):
+        return None
+    with open(state_path) as file:
+        return json.load(file)
+
+
+def get_best_booster(model):
+    """
+    Get the booster of a saved model without the trees after its best iteration.
+
+    Parameters:
+        model (XGBClassifier | NativeModel): Loaded model.
+
+    Returns:
+        xgb.Booster: Booster to continue training from.
+    """
+    booster = model.booster if isinstance(model, NativeModel) else model.get_booster()
+    best_iteration = booster.attributes().get("best_iteration")
+    if best_iteration is None:
+        return booster
+    return booster[: int(best_iteration) + 1]
 
 
-def optimize(objective: Callable, space: dict):
+@instrument.step
+def continue_training(
+    X_train: pd.DataFrame,
+    y_train: pd.DataFrame,
+    X_test: pd.DataFrame,
+    y_test: pd.DataFrame,
+    config: DictConfig,
+):
+    """
+    Continue boosting the saved model on the training rows appended since.
+
+    Incremental processing only appends to the splits, so the new rows are
+    the last ones of the training split. The splits must have the generation
+    and feature columns the model was trained on, a full reprocess changes
+    the generation. The saved model is boosted for a few more rounds on them
+    with the hyperparameters of the last search, so the cost is proportional
+    to the number of new rows.
+
+    Parameters:
+        X_train (pd.DataFrame): Training data features.
+        y_train (pd.DataFrame): Training data labels.
+        X_test (pd.DataFrame): Testing data features.
+        y_test (pd.DataFrame): Testing data labels.
+        config (DictConfig): Configuration object.
+
+    Returns:
+        bool: Whether the saved model is up to date, False if a new search is
+            needed because there is no saved model, the splits were rebuilt,
+            their columns changed or the accuracy dropped more than
+            `max_degradation` below the one of the last search.
+    """
+    # Imported here, the processing modules are only needed to continue training
+    from process import load_split_state
+
+    incremental = config.model.incremental
+    path = abspath(config.model.path)
+    state = load_train_state(path)
+    splits = load_split_state(abspath(config.process.incremental.dir))
+    if (
+        state is None
+        or splits is None
+        or state.get("splits") != splits
+        or splits["features"] != [str(column) for column in X_train.columns]
+        or len(X_train) < state["train_rows"]
+    ):
+        print("No saved model trained on these splits, running the search")
+        return False
+    if len(X_train) == state["train_rows"]:
+        print("No new training rows, the saved model is up to date")
+        return True
+
+    model = load_saved_model(path, model_format=config.model.format)
+    params = {
+        key: value
+        for key, value in model.get_params().items()
+        if isinstance(value, (int, float, str, bool))
+    }
+    params["n_estimators"] = incremental.boost_rounds
+    updated = XGBClassifier(**params)
+
+    X_new = X_train.iloc[state["train_rows"] :]
+    y_new = y_train.iloc[state["train_rows"] :]
+    X_eval = X_test
+    if is_sparse_frame(X_train):
+        X_new, X_eval = to_csr(X_new), to_csr(X_test)
+    updated.fit(
+        X_new,
+        y_new,
+        xgb_model=get_best_booster(model),
+        eval_set=[(X_eval, y_test)],
+        eval_metric=config.model.eval_metric,
+        early_stopping_rounds=config.model.early_stopping_rounds,
+    )
+
+    accuracy = get_accuracy(updated, X_test, y_test)
+    print(
+        f"SCORE: {accuracy} after {len(X_new)} new rows, "
+        f"{state['reference']} after the last search"
+    )
+    if accuracy < state["reference"] - incremental.max_degradation:
+        print("The accuracy degraded, running the search")
+        return False
+
+    save_model(
+        updated,
+        path,
+        config.model.format,
+        abspath(config.model.preprocessor.path),
+    )
+    save_train_state(path, len(X_train), accuracy, state["reference"], splits)
+    return True
+
+
+def get_early_stop(history: list, patience: int, maximize: bool):
+    """
+    Find where early stopping would have stopped on an evaluation history.
+
+    Parameters:
+        history (list): Metric on the validation set after each round.
+        patience (int): Rounds without improvement before stopping.
+        maximize (bool): Whether a larger metric is better.
+
+    Returns:
+        Tuple[int, bool]: Best round so far and whether training would have stopped.
+    """
+    best = 0
+    for iteration, value in enumerate(history):
+        if (value > history[best]) if maximize else (value < history[best]):
+            best = iteration
+        elif iteration - best >= patience:
+            return best, True
+    return best, False
+
+
+@instrument.step
+def successive_halving(
+    dtrain: xgb.DMatrix,
+    dtest: xgb.DMatrix,
+    y_test: pd.DataFrame,
+    config: DictConfig,
+    space: dict,
+):
+    """
+    Search hyperparameters by successive halving over boosting rounds.
+
+    `n_configs` hyperparameter sets are sampled from the space and trained
+    for `min_rounds` rounds. At each rung only the best `1 / eta` of them
+    are kept and trained further, continuing from their boosters, until the
+    rung budget reaches `n_estimators`. Early stopping is applied on the
+    whole evaluation history, so a set stops as it would in `get_objective`.
+
+    The sets are sampled from the seed of the configuration rather than
+    suggested from previous trials, and the rungs are not saved to the trial
+    store. An interrupted halving search is therefore not resumed but run
+    again, which samples the same sets.
+
+    Parameters:
+        dtrain (xgb.DMatrix): Training data matrix.
+        dtest (xgb.DMatrix): Testing data matrix.
+        y_test (pd.DataFrame): Testing data labels.
+        config (DictConfig): Configuration object.
+        space (dict): Hyperparameter search space.
+
+    Returns:
+        XGBClassifier: The best trained XGBoost model.
+    """
+    halving = config.model.search.halving
+    patience = config.model.early_stopping_rounds
+    maximize = config.model.eval_metric in ("auc", "aucpr", "map", "ndcg")
+    rng = np.random.default_rng(config.model.seed)
+
+    candidates = []
+    for _ in range(halving.n_configs):
+        trial_space = sample(space, rng=rng)
+        model = get_model(config, trial_space)
+        params = model.get_xgb_params()
+        params["eval_metric"] = config.model.eval_metric
+        candidates.append(
+            {
+                "space": trial_space,
+                "model": model,
+                "params": params,
+                "booster": None,
+                "history": {"validation_0": [], "validation_1": []},
+                "stopped": False,
+            }
+        )
+
+    budget, total_rounds = halving.min_rounds, 0
+    while True:
+        budget = min(budget, space["n_estimators"])
+        for candidate in candidates:
+            if candidate["stopped"]:
+                continue
+            trained = (
+                candidate["booster"].num_boosted_rounds() if candidate["booster"] else 0
+            )
+            evals_result = {}
+            candidate["booster"] = xgb.train(
+                candidate["params"],
+                dtrain,
+                num_boost_round=budget - trained,
+                evals=[(dtrain, "validation_0"), (dtest, "validation_1")],
+                evals_result=evals_result,
+                xgb_model=candidate["booster"],
+                verbose_eval=False,
+            )
+            total_rounds += budget - trained
+            metric = config.model.eval_metric
+            for name, history in candidate["history"].items():
+                history.extend(evals_result[name][metric])
+
+            best, candidate["stopped"] = get_early_stop(
+                candidate["history"]["validation_1"], patience, maximize
+            )
+            candidate["best_iteration"] = best
+            probability = candidate["booster"].predict(
+                dtest, iteration_range=(0, best + 1)
+            )
+            candidate["loss"] = -accuracy_score(y_test, (probability > 0.5).astype(int))
+
+        candidates.sort(key=lambda candidate: candidate["loss"])
+        print(
+            f"Rung with {budget} rounds: {len(candidates)} configurations, "
+            f"best SCORE: {-candidates[0]['loss']}"
+        )
+        if budget >= space["n_estimators"] or len(candidates) == 1:
+            break
+        candidates = candidates[: max(1, len(candidates) // halving.eta)]
+        budget *= halving.eta
+
+    print(
+        f"Successive halving trained {total_rounds} boosting rounds, "
+        f"{halving.n_configs * space['n_estimators']} at most for a full search"
+    )
+    best = candidates[0]
+    print("The best hyperparameters are : ", "\n")
+    print({key: best["space"][key] for key in space if isinstance(space[key], Apply)})
+
+    # Keep the trees up to where early stopping would have stopped
+    stop = best["best_iteration"] + patience + 1 if best["stopped"] else None
+    booster = best["booster"][:stop] if stop is not None else best["booster"]
+    booster.best_iteration = best["best_iteration"]
+    history = {
+        name: {config.model.eval_metric: values[: booster.num_boosted_rounds()]}
+        for name, values in best["history"].items()
+    }
+    return set_booster(best["model"], booster, history)
+
+
+class BestModelKeeper:
+    """
+    Keep the model of the best trial only.
+
+    Models are removed from the trial results as they arrive, so the trials
+    only hold lightweight records and memory does not grow with the number
+    of evaluations. Given a logger, the metrics of every trial are logged,
+    and the fit time and best iteration of every trial are recorded by the
+    instrumentation.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        loss: float = np.inf,
+        store: TrialStore = None,
+        logger=None,
+    ):
+        """
+        Initialize a keeper, optionally from the best model of a stored search.
+
+        Parameters:
+            model (XGBClassifier): Best model found so far.
+            loss (float): Loss of the best model found so far.
+            store (TrialStore): Store the best model is saved to when it changes.
+            logger (BaseLogger): Logger of the trial metrics.
+
+        Returns:
+            None
+        """
+        self.model = model
+        self.loss = loss
+        self.store = store
+        self.logger = logger
+        self.trials = 0
+
+    def update(self, result: dict):
+        """
+        Take the model out of a trial result, keeping it if it is the best so far.
+
+        Parameters:
+            result (dict): Result returned by the objective.
+
+        Returns:
+            dict: The result without the model.
+        """
+        model = result.pop("model", None)
+        if model is not None and result["loss"] < self.loss:
+            self.model, self.loss = model, result["loss"]
+            if self.store is not None:
+                self.store.save_model(model)
+        if self.logger is not None:
+            metrics = {
+                key: value
+                for key, value in result.items()
+                if key != "status" and isinstance(value, (int, float))
+            }
+            self.logger.log_metrics(metrics, step=self.trials)
+        instrument.record(
+            "trial",
+            fit_s=result.get("fit_time"),
+            best_iteration=result.get("best_iteration"),
+            loss=result["loss"],
+        )
+        self.trials += 1
+        return result
+
+
+def get_params_key(params: dict):
+    """
+    Build a hashable key identifying a set of hyperparameters.
+
+    The number of threads is left out since it does not change the model.
+
+    Parameters:
+        params (dict): Hyperparameters of a trial.
+
+    Returns:
+        tuple: Key of the hyperparameters.
+    """
+    return tuple(sorted((k, v) for k, v in params.items() if k != "n_jobs"))
+
+
+def get_scored(trials: Trials):
+    """
+    Index the completed trials by their hyperparameters.
+
+    Parameters:
+        trials (Trials): Trials of a search.
+
+    Returns:
+        dict: Results of the completed trials keyed by `get_params_key`.
+    """
+    return {
+        get_params_key(result["params"]): result
+        for result in trials.results
+        if result.get("status") == STATUS_OK and "params" in result
+    }
+
+
+def keep_best(
+    objective: Callable, keeper: BestModelKeeper, space: dict, scored: dict = None
+):
+    """
+    Evaluate the objective and hand its model over to the keeper.
+
+    Hyperparameters already in `scored` are not fitted again, their stored
+    result is returned instead.
+
+    Parameters:
+        objective (Callable): The optimization objective function.
+        keeper (BestModelKeeper): Keeper of the best model.
+        space (dict): Hyperparameters of the trial.
+        scored (dict): Results of the completed trials keyed by `get_params_key`.
+
+    Returns:
+        dict: Result of the objective without the model.
+    """
+    key = get_params_key(space)
+    if scored is not None and key in scored:
+        print("Skipping already scored hyperparameters")
+        return dict(scored[key])
+    result = keeper.update(objective(space))
+    if scored is not None:
+        scored[key] = result
+    return result
+
+
+def get_nthread(search: DictConfig):
+    """
+    Get the number of XGBoost threads used by each trial.
+
+    Parameters:
+        search (DictConfig): Search configuration.
+
+    Returns:
+        int: Threads per trial, None to let XGBoost use every core.
+    """
+    if search.nthread is not None:
+        return search.nthread
+    if search.mode == "parallel":
+        return max(1, (os.cpu_count() or 1) // search.n_workers)
+    return None
+
+
+def check_search(search: DictConfig):
+    """
+    Check that the search mode and objective can be combined.
+
+    Parameters:
+        search (DictConfig): Search configuration.
+
+    Returns:
+        None
+    """
+    if search.objective == "cv" and search.mode != "serial":
+        raise ValueError("The cv objective runs its folds in parallel, use mode=serial")
+
+
+def get_rstate(seed: int, trials: Trials):
+    """
+    Get the random state of the TPE suggestions, advanced past the existing trials.
+
+    Parameters:
+        seed (int): Seed of the TPE suggestions.
+        trials (Trials): Trials the search resumes from.
+
+    Returns:
+        np.random.Generator: Random state for the next suggestion.
+    """
+    rstate = np.random.default_rng(seed)
+    for _ in range(len(trials)):
+        rstate.integers(2**31 - 1)
+    return rstate
+
+
+@instrument.step
+def optimize(
+    objective: Callable,
+    space: dict,
+    max_evals: int = 100,
+    seed: int = None,
+    trials: Trials = None,
+    keeper: BestModelKeeper = None,
+    store: TrialStore = None,
+):
     """
     Perform hyperparameter optimization.
 
     Parameters:
         objective (Callable): The optimization objective function.
         space (dict): Hyperparameter search space.
+        max_evals (int): Total number of trials, including resumed ones.
+        seed (int): Seed of the TPE suggestions.
+        trials (Trials): Trials to resume from.
+        keeper (BestModelKeeper): Keeper of the best model.
+        store (TrialStore): Store the trials are saved to after every trial.
 
     Returns:
         XGBClassifier: The best trained XGBoost model.
     """
-    trials = Trials()
+    trials = Trials() if trials is None else trials
+    keeper = BestModelKeeper() if keeper is None else keeper
     best_hyperparams = fmin(
-        fn=objective,
+        fn=partial(keep_best, objective, keeper, scored=get_scored(trials)),
         space=space,
         algo=tpe.suggest,
-        max_evals=100,
+        max_evals=max_evals,
         trials=trials,
+        rstate=get_rstate(seed, trials),
+        trials_save_file=store.trials_path if store is not None else "",
     )
     print("The best hyperparameters are : ", "\n")
     print(best_hyperparams)
-    best_model = trials.results[np.argmin([r["loss"] for r in trials.results])]["model"]
-    return best_model
+    return keeper.model
+
+
+def _set_worker_objective(make_objective: Callable):
+    """
+    Build the objective once in a worker process.
+
+    Parameters:
+        make_objective (Callable): Function returning the optimization objective.
+
+    Returns:
+        None
+    """
+    global _worker_objective
+    _worker_objective = make_objective()
+
+
+def _evaluate_trial(params: dict):
+    """
+    Evaluate the objective of a worker process on one set of hyperparameters.
+
+    Parameters:
+        params (dict): Hyperparameters of the trial.
+
+    Returns:
+        dict: Result of the objective.
+    """
+    return _worker_objective(params)
+
+
+@instrument.step
+def optimize_parallel(
+    make_objective: Callable,
+    space: dict,
+    max_evals: int = 100,
+    seed: int = None,
+    n_workers: int = 4,
+    trials: Trials = None,
+    keeper: BestModelKeeper = None,
+    store: TrialStore = None,
+):
+    """
+    Perform hyperparameter optimization evaluating trials in a process pool.
+
+    Trials are suggested in batches of `n_workers` and each batch is
+    evaluated concurrently. Every batch is suggested by TPE from all the
+    completed trials, so for a given seed the search is reproducible.
+    The objective is built once in each worker by `make_objective`, so data
+    and XGBoost matrices are not sent with every trial.
+
+    Parameters:
+        make_objective (Callable): Function returning the optimization objective.
+        space (dict): Hyperparameter search space.
+        max_evals (int): Total number of trials, including resumed ones.
+        seed (int): Seed of the TPE suggestions.
+        n_workers (int): Number of worker processes.
+        trials (Trials): Trials to resume from.
+        keeper (BestModelKeeper): Keeper of the best model.
+        store (TrialStore): Store the trials are saved to after every batch.
+
+    Returns:
+        XGBClassifier: The best trained XGBoost model.
+    """
+    trials = Trials() if trials is None else trials
+    keeper = BestModelKeeper() if keeper is None else keeper
+    scored = get_scored(trials)
+    domain = Domain(_evaluate_trial, space)
+    rstate = get_rstate(seed, trials)
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(
+        n_workers,
+        mp_context=context,
+        initializer=_set_worker_objective,
+        initargs=(make_objective,),
+    ) as pool:
+        while len(trials) < max_evals:
+            tids = []
+            for _ in range(min(n_workers, max_evals - len(trials))):
+                new_ids = trials.new_trial_ids(1)
+                trials.insert_trial_docs(
+                    tpe.suggest(new_ids, domain, trials, rstate.integers(2**31 - 1))
+                )
+                trials.refresh()
+                tids.extend(new_ids)
+
+            docs = [doc for doc in trials.trials if doc["tid"] in tids]
+            params = [space_eval(space, spec_from_misc(doc["misc"])) for doc in docs]
+            new = [
+                i
+                for i, trial_params in enumerate(params)
+                if get_params_key(trial_params) not in scored
+            ]
+            results = dict(
+                zip(new, pool.map(_evaluate_trial, [params[i] for i in new]))
+            )
+            for i, doc in enumerate(docs):
+                key = get_params_key(params[i])
+                if i in results:
+                    scored[key] = keeper.update(results[i])
+                else:
+                    print("Skipping already scored hyperparameters")
+                doc["result"] = dict(scored[key])
+                doc["state"] = JOB_STATE_DONE
+            trials.refresh()
+            if store is not None:
+                store.save_trials(trials)
+
+    print("The best hyperparameters are : ", "\n")
+    print(trials.argmin)
+    return keeper.model
 
 
 @hydra.main(version_base=None, config_path="../../config", config_name="main")
+@instrument.stage
 def train(config: DictConfig):
     """Train an XGBoost model with hyperparameter optimization."""
 
     X_train, X_test, y_train, y_test = load_data(config.processed)
 
-    # Define space
-    space = {
-        "max_depth": hp.quniform("max_depth", **config.model.max_depth),
-        "gamma": hp.uniform("gamma", **config.model.gamma),
-        "reg_alpha": hp.quniform("reg_alpha", **config.model.reg_alpha),
-        "reg_lambda": hp.uniform("reg_lambda", **config.model.reg_lambda),
-        "colsample_bytree": hp.uniform(
-            "colsample_bytree", **config.model.colsample_bytree
-        ),
-        "min_child_weight": hp.quniform(
-            "min_child_weight", **config.model.min_child_weight
-        ),
-        "n_estimators": config.model.n_estimators,
-        "seed": config.model.seed,
-    }
-    objective = partial(get_objective, X_train, y_train, X_test, y_test, config)
+    # Continue training the saved model on new rows, unless it degrades
+    if config.model.incremental.enabled and continue_training(
+        X_train, y_train, X_test, y_test, config
+    ):
+        return
+
+    space = get_space(config)
+    make_objective = partial(build_objective, X_train, y_train, X_test, y_test, config)
+
+    # Resume a stored search
+    trials, keeper, store = Trials(), BestModelKeeper(), None
+    if config.model.trials.enabled and config.model.search.mode != "halving":
+        store = TrialStore(abspath(config.model.trials.dir), get_search_key(config))
+        store.prune(config.model.trials.max_searches)
+        trials = store.load_trials()
+        best_result = min(
+            get_scored(trials).values(), key=lambda r: r["loss"], default={}
+        )
+        keeper = BestModelKeeper(
+            store.load_model(), best_result.get("loss", np.inf), store
+        )
+
+    # Log the metrics of every trial. The logger is closed first, so its
+    # buffers are flushed before the run ends, also when the search fails
+    with ExitStack() as stack:
+        if config.tracking.log_trials:
+            # Imported here, MLflow and DAGsHub are slow to import and rarely needed
+            import mlflow
+            from helper import get_logger
 
-    # Find best model
-    best_model = optimize(objective, space)
+            mlflow.set_tracking_uri(config.mlflow_tracking_ui)
+            mlflow.set_experiment("clinical-cancer")
+            stack.enter_context(mlflow.start_run(run_name="search"))
+            keeper.logger = stack.enter_context(get_logger(config.tracking))
+
+        # Find best model
+        search = config.model.search
+        check_search(search)
+        if search.mode == "halving":
+            dtrain, dtest = get_matrices(X_train, y_train, X_test, y_test)
+            best_model = successive_halving(dtrain, dtest, y_test, config, space)
+        elif search.objective == "cv":
+            with CrossValidator(
+                X_train,
+                y_train,
+                search.cv.folds,
+                search.cv.n_workers,
+                config.model.seed,
+            ) as validator:
+                best_model = optimize(
+                    partial(get_objective_cv, validator, config),
+                    space,
+                    search.max_evals,
+                    config.model.seed,
+                    trials,
+                    keeper,
+                    store,
+                )
+        elif search.mode == "parallel":
+            if is_memory_mapped(config.processed):
+                make_objective = partial(load_objective, config)
+            best_model = optimize_parallel(
+                make_objective,
+                space,
+                search.max_evals,
+                config.model.seed,
+                search.n_workers,
+                trials,
+                keeper,
+                store,
+            )
+        else:
+            best_model = optimize(
+                make_objective(),
+                space,
+                search.max_evals,
+                config.model.seed,
+                trials,
+                keeper,
+                store,
+            )
+
+        if best_model is None:
+            # Cross-validation trials keep no model and a stored best model may be
+            # missing, fit the best hyperparameters once on the whole training set
+            best_params = trials.best_trial["result"]["params"]
+            objective = make_objective()
+            best_model = objective(dict(best_params, n_jobs=space["n_jobs"]))["model"]
+            if store is not None:
+                store.save_model(best_model)
 
     # Save model
-    joblib.dump(best_model, abspath(config.model.path))
+    save_model(
+        best_model,
+        abspath(config.model.path),
+        config.model.format,
+        abspath(config.model.preprocessor.path),
+    )
+    accuracy = get_accuracy(best_model, X_test, y_test)
+    splits = None
+    if config.model.incremental.enabled:
+        from process import load_split_state
+
+        splits = load_split_state(abspath(config.process.incremental.dir))
+    save_train_state(
+        abspath(config.model.path), len(X_train), accuracy, accuracy, splits
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,250 @@
+import json
+
+import numpy as np
+import xgboost as xgb
+
+"""
+This script flattens a trained booster into arrays evaluated with NumPy.
+"""
+
+
+class TreePredictor:
+    """
+    Vectorized NumPy evaluator of the trees of a binary logistic booster.
+
+    The nodes of every tree are stored in contiguous arrays (feature index,
+    threshold, left and right child, default direction and leaf value), and
+    a batch traverses all the trees at once, one tree level per step. For a
+    few rows this avoids the DMatrix construction and the thread pool of
+    XGBoost, which dominate the latency of small models.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        base_margin: float,
+        depth: int,
+        feature_names: list = None,
+        decision_threshold: float = 0.5,
+    ):
+        """
+        Initialize the predictor from flattened trees.
+
+        Args:
+            feature (np.ndarray): Feature index of each node.
+            threshold (np.ndarray): Split threshold of each node, rows with a
+                smaller value go left.
+            left (np.ndarray): Left child of each node, -1 for leaves.
+            right (np.ndarray): Right child of each node, -1 for leaves.
+            default_left (np.ndarray): Whether missing values go left.
+            value (np.ndarray): Leaf value of each node.
+            roots (np.ndarray): Root node of each tree.
+            base_margin (float): Margin added to the sum of the leaves.
+            depth (int): Maximum depth of the trees.
+            feature_names (list): Names of the feature columns.
+            decision_threshold (float): Probability above which PCR is predicted.
+
+        Returns:
+            None
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_margin = base_margin
+        self.depth = depth
+        self.feature_names_in_ = np.array(feature_names or [])
+        self.decision_threshold = decision_threshold
+        self.classes_ = np.array([0, 1])
+
+    @classmethod
+    def from_booster(
+        cls,
+        booster: xgb.Booster,
+        iteration_range: tuple = None,
+        decision_threshold: float = 0.5,
+    ):
+        """
+        Export the trees of a booster to flat arrays.
+
+        Args:
+            booster (xgb.Booster): Trained binary logistic booster.
+            iteration_range (tuple): Boosting rounds to keep, defaults to the
+                rounds up to the best iteration if early stopping ran.
+            decision_threshold (float): Probability above which PCR is predicted.
+
+        Returns:
+            TreePredictor: The compiled predictor.
+        """
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise ValueError(
+                f"Unsupported objective '{learner['objective']['name']}', "
+                "expected binary:logistic"
+            )
+        model = learner["gradient_booster"]["model"]
+        if iteration_range is None and "best_iteration" in booster.attributes():
+            iteration_range = (0, booster.best_iteration + 1)
+        trees = model["trees"]
+        if iteration_range is not None and iteration_range[1] > 0:
+            indptr = model["iteration_indptr"]
+            trees = trees[indptr[iteration_range[0]] : indptr[iteration_range[1]]]
+
+        columns = {
+            key: []
+            for key in ("feature", "threshold", "left", "right", "default", "value")
+        }
+        roots, offset, depth = [], 0, 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+            left = np.asarray(tree["left_children"], dtype=np.int32)
+            right = np.asarray(tree["right_children"], dtype=np.int32)
+            is_leaf = left == -1
+            columns["feature"].append(np.asarray(tree["split_indices"], np.int32))
+            columns["threshold"].append(
+                np.asarray(tree["split_conditions"], np.float32)
+            )
+            columns["left"].append(np.where(is_leaf, -1, left + offset))
+            columns["right"].append(np.where(is_leaf, -1, right + offset))
+            columns["default"].append(np.asarray(tree["default_left"], dtype=bool))
+            # The split condition of a leaf holds its value
+            columns["value"].append(
+                np.where(is_leaf, np.asarray(tree["split_conditions"]), 0.0)
+            )
+            roots.append(offset)
+            depth = max(depth, get_depth(left, right))
+            offset += len(left)
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        arrays = {
+            key: np.concatenate(values) if values else np.zeros(0)
+            for key, values in columns.items()
+        }
+        return cls(
+            arrays["feature"].astype(np.int32),
+            arrays["threshold"].astype(np.float32),
+            arrays["left"].astype(np.int32),
+            arrays["right"].astype(np.int32),
+            arrays["default"].astype(bool),
+            arrays["value"].astype(np.float32),
+            np.asarray(roots, dtype=np.int32),
+            float(np.log(base_score / (1 - base_score))),
+            depth,
+            booster.feature_names,
+            decision_threshold,
+        )
+
+    def predict_margin(self, X):
+        """
+        Compute the raw margin of a batch.
+
+        Sparse matrices are densified with their absent entries missing, as
+        XGBoost treats them.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features in the
+                model column order.
+
+        Returns:
+            np.ndarray: Margin of each row.
+        """
+        if hasattr(X, "tocoo"):
+            coo = X.tocoo()
+            X = np.full(coo.shape, np.nan, dtype=np.float32)
+            X[coo.row, coo.col] = coo.data
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            is_leaf = self.left[nodes] == -1
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(
+                np.isnan(values),
+                self.default_left[nodes],
+                values < self.threshold[nodes],
+            )
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            nodes = np.where(is_leaf, nodes, children)
+        return self.value[nodes].sum(axis=1, dtype=np.float32) + self.base_margin
+
+    def predict_proba(self, X):
+        """
+        Predict the probability of each class.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features in the
+                model column order.
+
+        Returns:
+            np.ndarray: Probabilities of no PCR and PCR.
+        """
+        probability = 1 / (1 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1 - probability, probability])
+
+    def predict(self, X):
+        """
+        Predict the PCR label.
+
+        Args:
+            X (pd.DataFrame | np.ndarray | sparse.csr_matrix): Features in the
+                model column order.
+
+        Returns:
+            np.ndarray: Predicted labels.
+        """
+        return (self.predict_proba(X)[:, 1] > self.decision_threshold).astype(int)
+
+    def get_params(self):
+        """
+        Get the shape of the compiled trees, in place of the hyperparameters.
+
+        Returns:
+            dict: Number of trees, maximum depth and decision threshold.
+        """
+        return {
+            "n_trees": len(self.roots),
+            "max_depth": self.depth,
+            "decision_threshold": self.decision_threshold,
+        }
+
+    def set_params(self, n_jobs: int = None):
+        """
+        Accept the thread setting of the other predictors, NumPy runs single-threaded.
+
+        Args:
+            n_jobs (int): Number of threads, ignored.
+
+        Returns:
+            TreePredictor: This predictor.
+        """
+        return self
+
+
+def get_depth(left: np.ndarray, right: np.ndarray):
+    """
+    Compute the depth of a tree from its child arrays.
+
+    Args:
+        left (np.ndarray): Left child of each node, -1 for leaves.
+        right (np.ndarray): Right child of each node, -1 for leaves.
+
+    Returns:
+        int: Number of splits on the longest path from the root to a leaf.
+    """
+    depth, level = 0, np.array([0])
+    while True:
+        level = level[left[level] != -1]
+        if not len(level):
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
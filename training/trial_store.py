@@ -0,0 +1,150 @@
+import glob
+import os
+import pickle
+
+import joblib
+from fingerprint import config_digest, file_digest, fingerprint
+from hydra.utils import to_absolute_path as abspath
+from hyperopt import Trials
+from omegaconf import DictConfig, OmegaConf
+
+"""
+This script persists hyperparameter search trials so a search can be resumed.
+"""
+
+# Model settings that do not change the result of a trial, of the search
+# settings only the objective is part of the key
+SEARCH_ONLY_KEYS = (
+    "dir",
+    "format",
+    "incremental",
+    "name",
+    "path",
+    "preprocessor",
+    "search",
+    "trials",
+)
+
+
+def get_search_key(config: DictConfig):
+    """
+    Fingerprint a search by its model configuration and processed data.
+
+    Args:
+        config (DictConfig): Configuration object.
+
+    Returns:
+        str: Key of the search.
+    """
+    data_digests = [
+        file_digest(abspath(config.processed[split].path))
+        for split in ("X_train", "X_test", "y_train", "y_test")
+    ]
+    objective = OmegaConf.masked_copy(config.model.search, ["objective", "cv"])
+    return fingerprint(
+        config_digest(config.model, exclude=SEARCH_ONLY_KEYS),
+        config_digest(objective),
+        *data_digests,
+    )
+
+
+class TrialStore:
+    """
+    Store the trials and the best model of a search on disk.
+
+    Each search is saved under its key, so runs with the same search space
+    and data resume the previous trials instead of starting from scratch.
+    """
+
+    def __init__(self, directory: str, key: str):
+        """
+        Initialize a store for one search.
+
+        Args:
+            directory (str): Directory holding the stored searches.
+            key (str): Key of the search.
+
+        Returns:
+            None
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.trials_path = os.path.join(directory, f"{key}.trials.pkl")
+        self.model_path = os.path.join(directory, f"{key}.model")
+
+    def prune(self, max_searches: int):
+        """
+        Remove the least recently saved searches, keeping `max_searches` of them.
+
+        Args:
+            max_searches (int): Number of searches kept, this one included.
+
+        Returns:
+            None
+        """
+        trials_paths = sorted(
+            glob.glob(os.path.join(self.directory, "*.trials.pkl")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for trials_path in trials_paths[max_searches:]:
+            if trials_path == self.trials_path:
+                continue
+            key = os.path.basename(trials_path)[: -len(".trials.pkl")]
+            for path in (trials_path, os.path.join(self.directory, f"{key}.model")):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def load_trials(self):
+        """
+        Load the stored trials.
+
+        Returns:
+            Trials: Stored trials, empty if the search is new.
+        """
+        if not os.path.exists(self.trials_path):
+            return Trials()
+        with open(self.trials_path, "rb") as file:
+            trials = pickle.load(file)
+        print(f"Resuming search with {len(trials)} stored trials")
+        return trials
+
+    def save_trials(self, trials: Trials):
+        """
+        Save the trials, replacing the stored ones atomically.
+
+        Args:
+            trials (Trials): Trials to save.
+
+        Returns:
+            None
+        """
+        tmp_path = f"{self.trials_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(trials, file)
+        os.replace(tmp_path, self.trials_path)
+
+    def load_model(self):
+        """
+        Load the best model stored for the search.
+
+        Returns:
+            XGBClassifier: Stored model, None if there is none.
+        """
+        if not os.path.exists(self.model_path):
+            return None
+        return joblib.load(self.model_path)
+
+    def save_model(self, model):
+        """
+        Save the best model of the search.
+
+        Args:
+            model (XGBClassifier): Model to save.
+
+        Returns:
+            None
+        """
+        tmp_path = f"{self.model_path}.tmp"
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, self.model_path)